@@ -0,0 +1,958 @@
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Hero Wars
+from herowars.registry import PlayerRegistry
+
+# Python
+import argparse
+import importlib
+import math
+import os
+import random
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+
+# ======================================================================
+# >> ALL DECLARATION
+# ======================================================================
+
+__all__ = (
+    'benchmark_registry',
+    'benchmark_load_queries',
+    'benchmark_profiles',
+    'benchmark_storage',
+    'benchmark_hero_memory',
+    'benchmark_player_hurt',
+    'benchmark_exp_table',
+    'check_group_commit',
+    'check_cooldowns',
+    'benchmarks',
+    'main'
+)
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+class _FakePlayer(object):
+    """Stand-in for a player with the keys players are looked up by."""
+
+    def __init__(self, index):
+        """Initializes a new fake player for a slot."""
+
+        self.index = index
+        self.userid = 100 + index
+        self.steamid = 'STEAM_0:1:{0}'.format(1000 + index)
+        self.team = 2 + index % 2
+
+
+class _FakeHero(object):
+    """Stand-in for a hero with the data saved by the save queue."""
+
+    def __init__(self, cls_id):
+        """Initializes a new fake hero at level zero."""
+
+        self.cls_id = cls_id
+        self.level = 0
+        self.exp = 0
+        self.skills = ()
+        self.dirty = True
+
+    def clear_dirty(self):
+        """Marks the hero as saved."""
+
+        self.dirty = False
+
+
+class _FakeHeroes(list):
+    """Stand-in for OwnedHeroes with all the heroes built."""
+
+    def built(self):
+        """Returns the heroes."""
+
+        return self
+
+
+class _FakeOwner(_FakePlayer):
+    """Stand-in for a player with the data saved by the save queue."""
+
+    def __init__(self, index, heroes=3):
+        """Initializes a new fake player owning a few heroes."""
+
+        super().__init__(index)
+        self.gold = 0
+        self.heroes = _FakeHeroes(
+            _FakeHero('BenchmarkHero{0}'.format(i)) for i in range(heroes))
+        self.hero = self.heroes[0]
+        self.dirty = True
+
+    def clear_dirty(self):
+        """Marks the player as saved."""
+
+        self.dirty = False
+
+    def gain(self, exp, gold):
+        """Gives the current hero exp and the player gold."""
+
+        self.hero.exp += exp
+        self.hero.dirty = True
+        self.gold += gold
+        self.dirty = True
+
+    def change_hero(self):
+        """Changes to the next hero and returns the previous one."""
+
+        previous = self.hero
+        self.hero = self.heroes[
+            (self.heroes.index(previous) + 1) % len(self.heroes)]
+        self.dirty = True
+        return previous
+
+
+# ======================================================================
+# >> FUNCTIONS
+# ======================================================================
+
+def benchmark_registry(slots=(64, 128), lookups=10000):
+    """Times player lookups with a list scan and with the registry.
+
+    Every lookup picks a random online player, like the event handlers
+    and menu callbacks do, so on average half the list gets scanned.
+
+    Args:
+        slots: Amounts of players to time the lookups with
+        lookups: Amount of lookups per key and slot count
+
+    Returns:
+        List of (slots, key, scan seconds, registry seconds) tuples
+    """
+
+    results = []
+    for count in slots:
+        fakes = [_FakePlayer(index) for index in range(1, count + 1)]
+        registry = PlayerRegistry()
+        for fake in fakes:
+            registry.add(fake)
+        for key in registry.keys:
+            values = [
+                getattr(random.choice(fakes), key) for i in range(lookups)]
+
+            def scan():
+                for value in values:
+                    for player in fakes:
+                        if getattr(player, key) == value:
+                            break
+
+            def lookup():
+                for value in values:
+                    registry.get(value, key)
+
+            results.append((count, key, _best(scan), _best(lookup)))
+    return results
+
+
+def benchmark_load_queries(players=64, heroes=20, skills=4):
+    """Counts and times the queries of loading players' records.
+
+    The records get loaded from a temporary SQLite database the way
+    they were before the loading was batched, with a query for each
+    hero and skill, then one player at a time with load_player() like
+    the prefetch does, and finally all at once with load_players().
+    The database module needs Source.Python, so this only runs on
+    a game server.
+
+    Args:
+        players: Amount of players to load
+        heroes: Amount of heroes owned by each player
+        skills: Amount of skills of each hero
+
+    Returns:
+        List of (path, queries per player, seconds per player) tuples
+    """
+
+    # The database module needs Source.Python, so only import it now
+    from herowars.database import SQLiteBackend
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLiteBackend(os.path.join(directory, 'load.db'))
+        try:
+            storage.setup()
+            steamids = _fill_storage(storage, players, heroes, skills)
+            connection = storage.connection
+            ids = storage.manager.steamids
+            classes = storage.manager.classes
+
+            def per_row():
+                for steamid in steamids:
+                    player_id = ids.find(connection, steamid)
+                    connection.execute(
+                        'SELECT gold, hero_id FROM players '
+                        'WHERE player_id=?', (player_id, )).fetchone()
+                    for hero_id, in connection.execute(
+                            'SELECT hero_id FROM heroes WHERE player_id=?',
+                            (player_id, )).fetchall():
+                        connection.execute(
+                            'SELECT level, exp FROM heroes '
+                            'WHERE player_id=? AND hero_id=?',
+                            (player_id, hero_id)).fetchone()
+                        hero_cls_id = classes.value(connection, hero_id)
+                        for skill in range(skills):
+                            skill_id = classes.find(connection,
+                                '{0}Skill{1}'.format(hero_cls_id, skill))
+                            connection.execute(
+                                'SELECT level FROM skills WHERE player_id=? '
+                                'AND hero_id=? AND skill_id=?',
+                                (player_id, hero_id, skill_id)).fetchone()
+
+            def one_by_one():
+                for steamid in steamids:
+                    storage.load_player(steamid)
+
+            def all_at_once():
+                storage.load_players(steamids)
+
+            results = []
+            for name, load in (
+                    ('per row', per_row),
+                    ('load_player', one_by_one),
+                    ('load_players', all_at_once)):
+                load()
+                queries = []
+                connection.set_trace_callback(lambda statement: (
+                    statement.lstrip().upper().startswith('SELECT')
+                    and queries.append(statement)))
+                load()
+                connection.set_trace_callback(None)
+                results.append((
+                    name, len(queries) / players, _best(load) / players))
+            return results
+        finally:
+            storage.close()
+
+
+def benchmark_profiles(players=64, heroes=20, skills=4, saves=50):
+    """Times saving and loading with each SQLite pragma profile.
+
+    Each profile gets its own temporary database filled with players'
+    records. A save of a single player's hero, like on spawn, and
+    a save of every player's hero in one transaction, like the round
+    end group commit, are each repeated with new exp. Finally every
+    player gets loaded one at a time. The database module needs
+    Source.Python, so this only runs on a game server.
+
+    Args:
+        players: Amount of players on the server
+        heroes: Amount of heroes owned by each player
+        skills: Amount of skills of each hero
+        saves: Amount of saves of each kind to time
+
+    Returns:
+        List of (profile, seconds per single save, seconds per group
+        save, seconds per player loaded) tuples
+    """
+
+    # The database module needs Source.Python, so only import it now
+    from herowars.configs import database_profiles
+    from herowars.database import HeroRecord
+    from herowars.database import SQLiteBackend
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in database_profiles:
+            storage = SQLiteBackend(
+                os.path.join(directory, profile + '.db'), profile)
+            try:
+                storage.setup()
+                steamids = _fill_storage(storage, players, heroes, skills)
+                gains = iter(range(1, 10 ** 9))
+
+                def single():
+                    for save in range(saves):
+                        storage.save_records(hero_records=(HeroRecord(
+                            random.choice(steamids), 'BenchmarkHero0', 10,
+                            next(gains), ()), ))
+
+                def group():
+                    for save in range(saves):
+                        exp = next(gains)
+                        storage.save_records(hero_records=[
+                            HeroRecord(steamid, 'BenchmarkHero0', 10, exp, ())
+                            for steamid in steamids
+                        ])
+
+                def load():
+                    for steamid in steamids:
+                        storage.load_player(steamid)
+
+                results.append((
+                    profile,
+                    _best(single, 3) / saves,
+                    _best(group, 3) / saves,
+                    _best(load, 3) / players
+                ))
+            finally:
+                storage.close()
+    return results
+
+
+def benchmark_storage(players=64, heroes=20, skills=4):
+    """Times the same work with every storage backend.
+
+    Each backend gets its own temporary database file and is timed
+    saving every player's records in one batch, loading each player
+    and iterating over all the players. The conformance of the
+    backends is tested by tests/test_storage.py. The database module
+    needs Source.Python, so this only runs on a game server.
+
+    Args:
+        players: Amount of players to save and load
+        heroes: Amount of heroes owned by each player
+        skills: Amount of skills of each hero
+
+    Returns:
+        List of (backend, seconds per save, seconds per player loaded,
+        seconds per player iterated) tuples
+    """
+
+    # The database module needs Source.Python, so only import it now
+    from herowars.database import backends
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, backend_cls in sorted(backends.items()):
+            storage = backend_cls(os.path.join(directory, name + '.db'))
+            try:
+                storage.setup()
+                steamids = _fill_storage(storage, players, heroes, skills)
+
+                def load():
+                    for steamid in steamids:
+                        storage.load_player(steamid)
+
+                def iterate():
+                    for records in storage.iter_players():
+                        pass
+
+                results.append((
+                    name,
+                    _best(lambda: _fill_storage(
+                        storage, players, heroes, skills), 3),
+                    _best(load, 3) / players,
+                    _best(iterate, 3) / players
+                ))
+            finally:
+                storage.close()
+    return results
+
+
+def benchmark_hero_memory(players=64, heroes=40):
+    """Measures the memory of owned heroes built and kept as records.
+
+    Every player owns the given amount of heroes, cycling through the
+    enabled hero classes, with each of their skills leveled up. Hero
+    classes need Source.Python, so this only runs on a game server.
+
+    Args:
+        players: Amount of players on the server
+        heroes: Amount of heroes owned by each player
+
+    Returns:
+        Tuple of bytes allocated for built heroes and for records
+    """
+
+    # Hero classes need Source.Python, so only import them when needed
+    from herowars.database import HeroRecord
+    from herowars.database import build_hero
+    from herowars.entities import Hero
+    import herowars.heroes
+    for name in herowars.heroes.__all__:
+        importlib.import_module('herowars.heroes.' + name)
+
+    classes = Hero.get_subclasses()
+    owned = [
+        (classes[i % len(classes)], 'STEAM_0:1:{0}'.format(player))
+        for player in range(players) for i in range(heroes)
+    ]
+
+    def records():
+        return [
+            (hero_cls, HeroRecord(
+                steamid, hero_cls.cls_id, 30, 100, tuple(
+                    (skill.cls_id, 1) for skill in hero_cls.skill_set)))
+            for hero_cls, steamid in owned
+        ]
+
+    tracemalloc.start()
+    try:
+        kept = records()
+        recorded = tracemalloc.get_traced_memory()[0]
+        del kept
+        start = tracemalloc.get_traced_memory()[0]
+        kept = [build_hero(*record) for record in records()]
+        built = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    return built, recorded
+
+
+def benchmark_player_hurt(players=64, events=10000):
+    """Times executing heroes' hooks like player_hurt does.
+
+    Every event executes a random attacker's on_attack hooks and
+    a random defender's on_defend hooks, first with heroes whose
+    passive, skills and items do have the hooks and then with heroes
+    which have none of them. Each is timed with the loop over every
+    skill that was used before the dispatch tables and with the
+    dispatch tables. The benchmark's entity classes are disabled and
+    removed from the registries afterwards. Hero classes need
+    Source.Python, so this only runs on a game server.
+
+    Args:
+        players: Amount of players on the server
+        events: Amount of events to time
+
+    Returns:
+        List of (heroes, loop seconds, dispatch seconds) tuples
+    """
+
+    registries = _copy_registries()
+    try:
+        return _time_player_hurt(players, events)
+    finally:
+        _restore_registries(registries)
+
+
+def _time_player_hurt(players, events):
+    """Times the hooks for benchmark_player_hurt()."""
+
+    # Hero classes need Source.Python, so only import them when needed
+    from herowars.entities import Hero
+    from herowars.entities import Skill
+    from herowars.entities import Item
+
+    class BenchmarkPassive(Skill):
+        enabled = False
+        def on_spawn(self, **eargs): pass
+        def on_attack(self, **eargs): pass
+
+    class BenchmarkAttack(Skill):
+        enabled = False
+        def on_attack(self, **eargs): pass
+
+    class BenchmarkDefend(Skill):
+        enabled = False
+        def on_defend(self, **eargs): pass
+
+    class BenchmarkSpawn(Skill):
+        enabled = False
+        def on_spawn(self, **eargs): pass
+
+    class BenchmarkUltimate(Skill):
+        enabled = False
+        def on_ultimate(self, **eargs): pass
+
+    class BenchmarkBoost(Item):
+        enabled = False
+        def on_spawn(self, **eargs): pass
+
+    class BenchmarkHooked(Hero):
+        enabled = False
+        passive_set = (BenchmarkPassive, )
+        skill_set = (
+            BenchmarkAttack, BenchmarkDefend, BenchmarkSpawn,
+            BenchmarkUltimate)
+
+    class BenchmarkUnhooked(Hero):
+        enabled = False
+        skill_set = (BenchmarkSpawn, BenchmarkUltimate)
+
+    def loop(hero, method_name, **eargs):
+        for passive in hero.passives:
+            passive.execute_method(method_name, **eargs)
+        for skill in hero.skills:
+            if skill.level:
+                skill.execute_method(method_name, **eargs)
+        for item in hero.items:
+            item.execute_method(method_name, **eargs)
+
+    def dispatch(hero, method_name, **eargs):
+        hero.execute_skills(method_name, **eargs)
+
+    results = []
+    for label, hero_cls in (
+            ('hooked', BenchmarkHooked), ('unhooked', BenchmarkUnhooked)):
+        heroes = []
+        for i in range(players):
+            hero = hero_cls()
+            for skill in hero.skills:
+                skill.level = 1
+            hero.items.extend((BenchmarkBoost(), BenchmarkBoost()))
+            heroes.append(hero)
+        pairs = [
+            (random.choice(heroes), random.choice(heroes))
+            for i in range(events)
+        ]
+
+        def handle(execute):
+            for attacker, defender in pairs:
+                eargs = {
+                    'attacker': attacker,
+                    'defender': defender,
+                    'damage': 25,
+                    'damage_armor': 5,
+                    'weapon': 'ak47'
+                }
+                execute(attacker, 'on_attack', player=attacker, **eargs)
+                execute(defender, 'on_defend', player=defender, **eargs)
+
+        results.append((
+            label,
+            _best(lambda: handle(loop)),
+            _best(lambda: handle(dispatch))
+        ))
+    return results
+
+
+def benchmark_exp_table(max_level=10000):
+    """Times leveling up with the exp table against the level loop.
+
+    A hero gets enough exp to reach its maximum level at once, first
+    leveling up one level at a time like heroes used to and then with
+    the exp table. The scratch hero class is removed from the entity
+    registries afterwards. Hero classes need Source.Python, so this
+    only runs on a game server. The exp table's results are tested in
+    tests/test_exp_table.py.
+
+    Args:
+        max_level: Maximum level of the hero
+
+    Returns:
+        Tuple of the loop's and the table's seconds
+    """
+
+    # Hero classes need Source.Python, so only import them when needed
+    from herowars.entities import Hero
+    from herowars.configs import exp_algorithm
+
+    def loop(level, exp):
+        while exp >= exp_algorithm(level) and level < max_level:
+            exp -= exp_algorithm(level)
+            level += 1
+        return level, exp
+
+    registries = _copy_registries()
+    try:
+        hero_cls = type('BenchmarkExpHero', (Hero, ), dict(
+            enabled=False, max_level=max_level))
+        gain = hero_cls.get_exp_table().total(max_level)
+        return (
+            _best(lambda: loop(0, gain)),
+            _best(lambda: setattr(hero_cls(), 'exp', gain))
+        )
+    finally:
+        _restore_registries(registries)
+
+
+def check_cooldowns(players=64, seconds=60, tick_rate=66):
+    """Simulates players hammering their ultimates on cooldown.
+
+    Every player has his own skill whose on_ultimate has a cooldown
+    like Noclip's, and presses it on every tick of the simulated time.
+    The cooldowns store's clock is replaced with the simulated time,
+    so each player's ultimate must get executed exactly once per
+    cooldown, no matter how many other players use the same skill.
+    The tools module needs Source.Python, so this only runs on a game
+    server.
+
+    Args:
+        players: Amount of players on the server
+        seconds: Simulated seconds
+        tick_rate: Simulated ticks per second
+
+    Raises:
+        AssertionError: If any player's ultimate isn't executed once
+            per cooldown
+
+    Returns:
+        Tuple of the amount of presses and their total seconds
+    """
+
+    # The tools module needs Source.Python, so only import it when needed
+    from herowars.cooldowns import cooldowns
+    from herowars.tools import cooldownf
+
+    class Ultimate(object):
+        name = 'Ultimate'
+
+        def __init__(self, level):
+            self.level = level
+            self.executions = 0
+
+        @cooldownf(lambda self, **eargs: 20 - self.level * 2)
+        def on_ultimate(self, **eargs):
+            self.executions += 1
+
+    now = 0
+    clock = cooldowns.clock
+    cooldowns.clock = lambda: now
+    skills = [Ultimate(1 + index % 4) for index in range(players)]
+    try:
+        start = timeit.default_timer()
+        for tick in range(seconds * tick_rate):
+            now = tick / tick_rate
+            for skill in skills:
+                skill.on_ultimate(player=skill)
+        elapsed = timeit.default_timer() - start
+    finally:
+        cooldowns.clock = clock
+        cooldowns.reset(*skills)
+
+    for skill in skills:
+        expected = math.ceil(seconds / (20 - skill.level * 2))
+        assert skill.executions == expected, (
+            skill.level, skill.executions, expected)
+    return seconds * tick_rate * players, elapsed
+
+
+def check_group_commit(players=64, rounds=10, hero_changes=16,
+        round_time=0.05):
+    """Counts the save transactions per round with and without group commit.
+
+    Simulated rounds are played through a save queue writing into
+    a temporary SQLite database. Every round all the players spawn,
+    some change their heroes and everyone gains exp and gold between
+    the changes. Without group commit spawns and hero changes save
+    like player_spawn and the hero setter do, with group commit
+    everyone is saved at once on round end. The database module needs
+    Source.Python, so this only runs on a game server.
+
+    Args:
+        players: Amount of players on the server
+        rounds: Amount of rounds to simulate
+        hero_changes: Amount of hero changes per round
+        round_time: Seconds each simulated round takes
+
+    Raises:
+        AssertionError: If group commit takes more than one
+            transaction per round
+
+    Returns:
+        Tuple of transactions per round without and with group commit
+    """
+
+    # The database module needs Source.Python, so only import it now
+    from herowars.database import close_database
+    from herowars.database import setup_database
+    from herowars.persistence import SaveQueue
+
+    class CountingQueue(SaveQueue):
+        def _write(self, records):
+            if records:
+                self.transactions += 1
+            super()._write(records)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for group_commit in (False, True):
+            path = os.path.join(
+                directory, 'group{0}.db'.format(int(group_commit)))
+            setup_database(path)
+            queue = CountingQueue(path)
+            queue.transactions = 0
+            owners = [_FakeOwner(index) for index in range(1, players + 1)]
+            queue.start()
+            try:
+                for round_number in range(rounds):
+                    if not group_commit:
+                        for owner in owners:
+                            queue.put_player(owner)
+                    for change in range(hero_changes):
+                        time.sleep(round_time / hero_changes)
+                        for owner in owners:
+                            owner.gain(10, 1)
+                        owner = random.choice(owners)
+                        previous = owner.change_hero()
+                        if not group_commit:
+                            queue.put_hero(owner.steamid, previous)
+                    if group_commit:
+                        queue.put_players(owners)
+                    queue.flush()
+            finally:
+                queue.stop()
+                close_database(path)
+            results.append(queue.transactions / rounds)
+    assert results[1] <= 1, results
+    return tuple(results)
+
+
+def _fill_storage(storage, players, heroes, skills):
+    """Saves records of players owning heroes with skills into storage.
+
+    Args:
+        storage: Storage backend to save the records into
+        players: Amount of players to save
+        heroes: Amount of heroes owned by each player
+        skills: Amount of skills of each hero
+
+    Returns:
+        List of the players' steamids
+    """
+
+    from herowars.database import PlayerRecord
+    from herowars.database import HeroRecord
+
+    steamids = ['STEAM_0:1:{0}'.format(1000 + i) for i in range(players)]
+    hero_cls_ids = ['BenchmarkHero{0}'.format(i) for i in range(heroes)]
+    storage.save_records(
+        (PlayerRecord(steamid, 100, hero_cls_ids[0]) for steamid in steamids),
+        (HeroRecord(steamid, cls_id, 10, 50, tuple(
+            ('{0}Skill{1}'.format(cls_id, skill), 1)
+            for skill in range(skills)))
+            for steamid in steamids for cls_id in hero_cls_ids)
+    )
+    return steamids
+
+
+def _copy_registries():
+    """Copies every entity registry before defining scratch classes.
+
+    Returns:
+        List of (entity class, copy of its registry) tuples
+    """
+
+    from herowars.entities import Entity
+    return [
+        (entity_cls, dict(entity_cls._registry))
+        for entity_cls in (Entity, ) + tuple(Entity._registry.values())
+    ]
+
+
+def _restore_registries(registries):
+    """Restores the entity registries copied by _copy_registries().
+
+    Unlike Entity.forget_module(), this also brings back any class
+    that a scratch class with the same class id replaced.
+
+    Args:
+        registries: Copies returned by _copy_registries()
+    """
+
+    from herowars.entities import Entity
+    for entity_cls, registry in registries:
+        entity_cls._registry.clear()
+        entity_cls._registry.update(registry)
+    Entity.invalidate_subclasses()
+
+
+def _best(function, repeat=5):
+    """Gets the fastest of a few runs of a function in seconds."""
+
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def _print_registry(args):
+    """Prints the results of benchmark_registry()."""
+
+    for count, key, scan, lookup in benchmark_registry(
+            args.slots, args.lookups):
+        print('{0:>4} slots, {1:<8} scan {2:8.2f} us, registry {3:6.2f} us,'
+            ' {4:5.1f}x'.format(count, key, scan / args.lookups * 1e6,
+                lookup / args.lookups * 1e6, scan / lookup))
+
+
+def _print_load_queries(args):
+    """Prints the results of benchmark_load_queries()."""
+
+    for name, queries, seconds in benchmark_load_queries(
+            args.players, args.heroes, args.skills):
+        print('{0:<12} {1:7.2f} queries, {2:8.1f} us per player'.format(
+            name, queries, seconds * 1e6))
+
+
+def _print_profiles(args):
+    """Prints the results of benchmark_profiles()."""
+
+    for profile, single, group, load in benchmark_profiles(
+            args.players, args.heroes, args.skills, args.saves):
+        print('{0:<9} single save {1:7.3f} ms, group save {2:7.3f} ms, '
+            'load {3:6.1f} us per player'.format(
+                profile, single * 1000, group * 1000, load * 1e6))
+
+
+def _print_storage(args):
+    """Prints the results of benchmark_storage()."""
+
+    for name, save, load, iterate in benchmark_storage(
+            args.players, args.heroes, args.skills):
+        print('{0:<7} save {1:8.2f} ms, load {2:7.1f} us, iterate {3:7.1f} '
+            'us per player'.format(name, save * 1000, load * 1e6,
+                iterate * 1e6))
+
+
+def _print_hero_memory(args):
+    """Prints the results of benchmark_hero_memory()."""
+
+    built, recorded = benchmark_hero_memory(args.players, args.heroes)
+    count = args.players * args.heroes
+    print('{0} heroes: built {1:.0f} KiB ({2:.0f} B each), records {3:.0f} '
+        'KiB ({4:.0f} B each), {5:.1f}x'.format(count, built / 1024,
+            built / count, recorded / 1024, recorded / count,
+            built / recorded))
+
+
+def _print_player_hurt(args):
+    """Prints the results of benchmark_player_hurt()."""
+
+    for heroes, loop, dispatch in benchmark_player_hurt(
+            args.players, args.events):
+        print('{0:<9} heroes: loop {1:6.2f} us, dispatch {2:6.2f} us per '
+            'event, {3:4.1f}x'.format(heroes, loop / args.events * 1e6,
+                dispatch / args.events * 1e6, loop / dispatch))
+
+
+def _print_exp_table(args):
+    """Prints the results of benchmark_exp_table()."""
+
+    loop, table = benchmark_exp_table(args.max_level)
+    print('Level 0 to {0} at once: loop {1:.2f} ms, table {2:.3f} ms, '
+        '{3:.0f}x'.format(args.max_level, loop * 1000, table * 1000,
+            loop / table))
+
+
+def _print_cooldowns(args):
+    """Prints the results of check_cooldowns()."""
+
+    presses, elapsed = check_cooldowns(
+        args.players, args.seconds, args.tick_rate)
+    print('{0} players got their ultimates once per cooldown'.format(
+        args.players))
+    print('{0} presses: {1:.3f} us each, {2:.1f} us per tick'.format(
+        presses, elapsed / presses * 1e6,
+        elapsed / (args.seconds * args.tick_rate) * 1e6))
+
+
+def _print_group_commit(args):
+    """Prints the results of check_group_commit()."""
+
+    without, with_ = check_group_commit(
+        args.players, args.rounds, args.hero_changes)
+    print('Transactions per round: {0:.1f} without group commit, {1:.1f} '
+        'with group commit'.format(without, with_))
+
+
+def main(args=None):
+    """Runs a benchmark from the command line and prints its results.
+
+    Args:
+        args: Command line arguments, None for sys.argv
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='python -m herowars.benchmarks',
+        description='Time Hero Wars hot paths without a game server.')
+    subparsers = parser.add_subparsers(dest='benchmark')
+    subparsers.required = True
+
+    registry_parser = subparsers.add_parser(
+        'registry', help='player lookups by userid, index and steamid')
+    registry_parser.add_argument('--slots', type=int, nargs='+',
+        default=[64, 128], help='amounts of players on the server')
+    registry_parser.add_argument('--lookups', type=int, default=10000,
+        help='amount of lookups per key')
+
+    load_parser = subparsers.add_parser(
+        'load', help="queries of loading players' records")
+    load_parser.add_argument('--players', type=int, default=64,
+        help='amount of players to load')
+    load_parser.add_argument('--heroes', type=int, default=20,
+        help='amount of heroes owned by each player')
+    load_parser.add_argument('--skills', type=int, default=4,
+        help='amount of skills of each hero')
+
+    profiles_parser = subparsers.add_parser(
+        'profiles', help='saving and loading with each pragma profile')
+    profiles_parser.add_argument('--players', type=int, default=64,
+        help='amount of players on the server')
+    profiles_parser.add_argument('--heroes', type=int, default=20,
+        help='amount of heroes owned by each player')
+    profiles_parser.add_argument('--skills', type=int, default=4,
+        help='amount of skills of each hero')
+    profiles_parser.add_argument('--saves', type=int, default=50,
+        help='amount of saves of each kind')
+
+    storage_parser = subparsers.add_parser(
+        'storage', help='the same work with every storage backend')
+    storage_parser.add_argument('--players', type=int, default=64,
+        help='amount of players to save and load')
+    storage_parser.add_argument('--heroes', type=int, default=20,
+        help='amount of heroes owned by each player')
+    storage_parser.add_argument('--skills', type=int, default=4,
+        help='amount of skills of each hero')
+
+    memory_parser = subparsers.add_parser(
+        'heroes', help='memory of owned heroes built and kept as records')
+    memory_parser.add_argument('--players', type=int, default=64,
+        help='amount of players on the server')
+    memory_parser.add_argument('--heroes', type=int, default=40,
+        help='amount of heroes owned by each player')
+
+    hurt_parser = subparsers.add_parser(
+        'player_hurt', help="executing heroes' hooks on player_hurt")
+    hurt_parser.add_argument('--players', type=int, default=64,
+        help='amount of players on the server')
+    hurt_parser.add_argument('--events', type=int, default=10000,
+        help='amount of events')
+
+    exp_parser = subparsers.add_parser(
+        'exp', help='leveling up with the exp tables against the loop')
+    exp_parser.add_argument('--max-level', type=int, default=10000,
+        help='maximum level of the hero')
+
+    cooldowns_parser = subparsers.add_parser(
+        'cooldowns', help='players hammering their ultimates on cooldown')
+    cooldowns_parser.add_argument('--players', type=int, default=64,
+        help='amount of players on the server')
+    cooldowns_parser.add_argument('--seconds', type=int, default=60,
+        help='simulated seconds')
+    cooldowns_parser.add_argument('--tick-rate', type=int, default=66,
+        help='simulated ticks per second')
+
+    group_parser = subparsers.add_parser(
+        'group_commit', help='save transactions per round')
+    group_parser.add_argument('--players', type=int, default=64,
+        help='amount of players on the server')
+    group_parser.add_argument('--rounds', type=int, default=10,
+        help='amount of rounds to simulate')
+    group_parser.add_argument('--hero-changes', type=int, default=16,
+        help='amount of hero changes per round')
+
+    args = parser.parse_args(args)
+    benchmarks[args.benchmark](args)
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Benchmarks runnable from the command line by name
+benchmarks = dict(
+    registry=_print_registry,
+    load=_print_load_queries,
+    profiles=_print_profiles,
+    storage=_print_storage,
+    heroes=_print_hero_memory,
+    player_hurt=_print_player_hurt,
+    exp=_print_exp_table,
+    cooldowns=_print_cooldowns,
+    group_commit=_print_group_commit,
+)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Python
+import time
+
+from collections import OrderedDict
+
+
+# ======================================================================
+# >> ALL DECLARATION
+# ======================================================================
+
+__all__ = (
+    'ReconnectCache',
+)
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+class ReconnectCache(object):
+    """Bounded cache of departed players' data keyed by steamid.
+
+    Entries get taken out of the cache when the player returns, so the
+    oldest entry is always the least recently used one. Entries older
+    than the time to live or over the maximum size get evicted from
+    the oldest end.
+
+    Attributes:
+        size: Maximum amount of entries, 0 to disable the cache
+        ttl: Seconds an entry is kept for
+        hits: Amount of entries taken
+        misses: Amount of takes that found no entry
+    """
+
+    def __init__(self, size, ttl, clock=time.monotonic):
+        """Initializes a new empty cache.
+
+        Args:
+            size: Maximum amount of entries, 0 to disable the cache
+            ttl: Seconds an entry is kept for
+            clock: Function returning the current time in seconds
+        """
+
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+
+        # (expiry time, data) tuples keyed by steamid, oldest first
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        """Returns the amount of entries, including expired ones."""
+
+        return len(self._entries)
+
+    def __contains__(self, steamid):
+        """Checks if there's an unexpired entry for a steamid."""
+
+        self._evict()
+        return steamid in self._entries
+
+    def put(self, steamid, data):
+        """Caches a departed player's data.
+
+        Args:
+            steamid: Steamid of the player
+            data: Player's data, which must match what's in the database
+        """
+
+        self._entries.pop(steamid, None)
+        if self.size > 0:
+            self._entries[steamid] = (self._clock() + self.ttl, data)
+            self._evict()
+
+    def take(self, steamid):
+        """Takes a returning player's data out of the cache.
+
+        Args:
+            steamid: Steamid of the player
+
+        Returns:
+            Player's cached data or None if there's no unexpired entry
+        """
+
+        self._evict()
+        entry = self._entries.pop(steamid, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def discard(self, steamid):
+        """Removes a player's entry, if any.
+
+        Must be called whenever the player's data changes in the
+        database while he's away.
+
+        Args:
+            steamid: Steamid of the player
+        """
+
+        self._entries.pop(steamid, None)
+
+    def clear(self):
+        """Removes all the entries."""
+
+        self._entries.clear()
+
+    def _evict(self):
+        """Evicts the expired entries and the ones over the size."""
+
+        now = self._clock()
+        entries = self._entries
+        while entries and (
+                len(entries) > self.size
+                or next(iter(entries.values()))[0] <= now):
+            entries.popitem(last=False)
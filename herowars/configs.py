@@ -22,6 +22,119 @@ chat_command_prefix = '!'
 database_path = os.path.dirname(__file__) + '/herowars.db'
 
 
+# (Relative) path to the exp and gold journal file, None to disable
+# > Journal keeps exp and gold gains safe from crashes between saves
+journal_path = os.path.dirname(__file__) + '/herowars.journal'
+
+
+# (Relative) path to the list of class ids written when Hero Wars loads
+# > Lets the maintenance tool prune without Source.Python
+class_ids_path = os.path.dirname(__file__) + '/herowars.classes'
+
+
+# Size of the journal file in bytes after which it gets compacted
+journal_compact_size = 1048576
+
+
+# (Relative) path to the compressed archive of inactive players' data
+# > Written by the offline maintenance tool: python -m herowars.maintenance
+archive_path = os.path.dirname(__file__) + '/herowars-archive.jsonl.gz'
+
+
+# Days after which inactive players get archived by the maintenance tool
+archive_after_days = 180
+
+
+# Storage backend used for players' data
+# > sqlite: SQLite database at database_path
+# > dbm: Key-value database with one record per player, stored at
+#   database_path with its extension replaced by '.dbm'
+# > memory: Nothing gets saved, meant for testing
+storage_backend = 'sqlite'
+
+
+# SQLite pragmas applied to each new database connection
+# > durable: Rollback journal with full syncing on every commit
+# > balanced: Write-ahead log, synced only on checkpoints
+# > fast: Write-ahead log with memory-mapped I/O and no syncing,
+#   a power loss may lose the latest commits
+# > shared: Rollback journal with a short busy timeout, for servers on
+#   different machines sharing the file over a network volume where
+#   the write-ahead log can't be used
+database_profiles = dict(
+    durable = dict(
+        busy_timeout = 5000,
+        journal_mode = 'DELETE',
+        synchronous = 'FULL',
+    ),
+    balanced = dict(
+        busy_timeout = 5000,
+        journal_mode = 'WAL',
+        synchronous = 'NORMAL',
+        cache_size = -8000,
+    ),
+    fast = dict(
+        busy_timeout = 5000,
+        journal_mode = 'WAL',
+        synchronous = 'OFF',
+        cache_size = -32000,
+        mmap_size = 268435456,
+        temp_store = 'MEMORY',
+    ),
+    shared = dict(
+        busy_timeout = 250,
+        journal_mode = 'DELETE',
+        synchronous = 'FULL',
+    ),
+)
+
+
+# Name of the pragma profile used for the database
+database_profile = 'balanced'
+
+
+# Save all players' data once per round in a single transaction
+# > When False, data is saved on every spawn and hero change instead
+# > Disconnecting players' data is always saved immediately
+group_commit = False
+
+
+# Departed players' data kept in memory for a quick reconnect
+# > reconnect_cache_size: Maximum amount of players kept, 0 to disable
+# > reconnect_cache_ttl: Seconds a player is kept after disconnecting
+# > Always disabled when multi_server is True, as another server could
+#   change the player's data in the meantime
+reconnect_cache_size = 64
+reconnect_cache_ttl = 600
+
+
+# Several servers share the same database file
+# > Saves get split into transactions of at most write_batch_rows rows
+# > Each server writes at most write_quota rows per second
+multi_server = False
+write_batch_rows = 500
+write_quota = 2000
+
+
+# Retries of a write transaction locked by another server and the base
+# delay of their random exponential backoff in seconds
+write_retries = 8
+write_retry_delay = 0.05
+
+
+# Saving players' data in the background
+# > save_attempts: Failed writes of the same saves before giving up on
+#   them, leaving their exp and gold for the journal to recover
+# > save_flush_timeout: Maximum seconds to wait for the saves to be
+#   written, such as before exporting or unloading
+save_attempts = 5
+save_flush_timeout = 10
+
+
+# Amount of players shown on each leaderboard
+leaderboard_size = 50
+
+
 # Amounts of experience points gained from objectives
 exp_values = dict(
 
@@ -87,6 +200,18 @@ default_item_category = 'Others'
 item_sell_value_multiplier = 0.5
 
 
+# Count heroes' used skill points from their skills on every access
+# and raise an error if the kept count doesn't match, for debugging
+validate_skill_points = False
+
+
+# Reset skills' and items' cooldowns
+# > reset_cooldowns_on_round_start: Everyone's cooldowns on round start
+# > reset_cooldowns_on_death: A dying player's cooldowns
+reset_cooldowns_on_round_start = False
+reset_cooldowns_on_death = False
+
+
 # Exp algorithm for required exp to level up
 def exp_algorithm(level):
     return 100 + level * 20
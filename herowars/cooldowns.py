@@ -0,0 +1,128 @@
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Python
+import time
+
+
+# ======================================================================
+# >> ALL DECLARATION
+# ======================================================================
+
+__all__ = (
+    'CooldownStore',
+    'cooldowns'
+)
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+class CooldownStore(object):
+    """Cooldowns of methods keyed by their owner and the method.
+
+    Each cooldown is stored as its expiry time on a monotonic clock,
+    so checking one is a single dict lookup and no timers need to run.
+    Expired cooldowns are dropped from time to time as new ones start.
+
+    Attributes:
+        clock: Function returning the current time in seconds
+    """
+
+    def __init__(self, clock=time.monotonic):
+        """Initializes a new store without any cooldowns.
+
+        Args:
+            clock: Function returning the current time in seconds
+        """
+
+        self.clock = clock
+
+        # (expiry time, duration) tuples keyed by (owner, method)
+        self._cooldowns = {}
+
+        # Amount of cooldowns after which to drop the expired ones
+        self._purge_size = 64
+
+    def __len__(self):
+        """Returns the amount of cooldowns, including expired ones."""
+
+        return len(self._cooldowns)
+
+    def start(self, owner, method, duration):
+        """Starts a cooldown.
+
+        Args:
+            owner: Owner of the cooldown, such as a skill or a player
+            method: Method on cooldown
+            duration: Duration of the cooldown in seconds
+        """
+
+        self._cooldowns[owner, method] = (self.clock() + duration, duration)
+        if len(self._cooldowns) > self._purge_size:
+            self._purge()
+
+    def remaining(self, owner, method):
+        """Gets the time left of a cooldown.
+
+        Args:
+            owner: Owner of the cooldown
+            method: Method on cooldown
+
+        Returns:
+            Seconds left of the cooldown, 0 if it's not on cooldown
+        """
+
+        cooldown = self._cooldowns.get((owner, method))
+        if cooldown is None:
+            return 0
+        return max(0, cooldown[0] - self.clock())
+
+    def limit(self, owner, method):
+        """Gets the full duration of the latest cooldown.
+
+        Args:
+            owner: Owner of the cooldown
+            method: Method on cooldown
+
+        Returns:
+            Duration of the cooldown in seconds, 0 if there's none
+        """
+
+        cooldown = self._cooldowns.get((owner, method))
+        return 0 if cooldown is None else cooldown[1]
+
+    def reset(self, *owners):
+        """Resets all the cooldowns of owners.
+
+        Args:
+            owners: Owners whose cooldowns to reset
+        """
+
+        owners = set(owners)
+        for key in [key for key in self._cooldowns if key[0] in owners]:
+            del self._cooldowns[key]
+
+    def clear(self):
+        """Resets all the cooldowns."""
+
+        self._cooldowns.clear()
+
+    def _purge(self):
+        """Drops the expired cooldowns."""
+
+        now = self.clock()
+        for key, (expiry, duration) in list(self._cooldowns.items()):
+            if expiry <= now:
+                del self._cooldowns[key]
+        self._purge_size = max(64, len(self._cooldowns) * 2)
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Cooldowns of the skills' methods decorated with cooldown(f)
+cooldowns = CooldownStore()
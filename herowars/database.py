@@ -5,10 +5,21 @@
 # Hero Wars
 from herowars.entities import Hero
 
-from herowars.tools import find_element
+from herowars.configs import storage_backend
+from herowars.configs import database_profiles
+from herowars.configs import database_profile
+
+from herowars.transactions import apply_pragmas
+from herowars.transactions import write_transaction
 
 # Python
+import dbm
+import os
 import sqlite3
+import struct
+import threading
+
+from collections import namedtuple
 
 
 # ======================================================================
@@ -16,6 +27,26 @@ import sqlite3
 # ======================================================================
 
 __all__ = (
+    'SCHEMA_VERSION',
+    'IdTable',
+    'ConnectionManager',
+    'StorageBackend',
+    'SQLiteBackend',
+    'MemoryBackend',
+    'DbmBackend',
+    'backends',
+    'open_database',
+    'close_database',
+    'get_connection',
+    'PlayerRecord',
+    'HeroRecord',
+    'player_record',
+    'hero_record',
+    'save_records',
+    'apply_deltas',
+    'fetch_player_records',
+    'apply_player_records',
+    'build_hero',
     'setup_database',
     'load_player_data',
     'save_player_data',
@@ -24,10 +55,1190 @@ __all__ = (
 )
 
 
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Storage backends of the opened database files
+_storages = {}
+
+# Layouts of the records packed by the dbm backend
+_PACKED_PLAYER = struct.Struct('<?qH')
+_PACKED_HERO = struct.Struct('<iqH')
+_PACKED_SKILL = struct.Struct('<i')
+_PACKED_LENGTH = struct.Struct('<B')
+
+# Version of the database schema, stored in the user_version pragma
+# > 0: Steamids and class ids stored as TEXT in every row
+# > 1: Steamids and class ids interned into integer ids
+# > 2: Leaderboard summary table and ranking indexes
+# > 3: Players' last seen timestamps for archiving inactive players
+SCHEMA_VERSION = 3
+
+# Steamids and class ids are stored in the dictionary tables and
+# every other table refers to them with their integer ids
+_CREATE_TABLES = """
+CREATE TABLE IF NOT EXISTS steamids (
+    id INTEGER PRIMARY KEY,
+    steamid TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS classes (
+    id INTEGER PRIMARY KEY,
+    cls_id TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    player_id INTEGER PRIMARY KEY,
+    gold INTEGER,
+    hero_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS heroes (
+    player_id INTEGER,
+    hero_id INTEGER,
+    level INTEGER,
+    exp INTEGER,
+    PRIMARY KEY (player_id, hero_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS skills (
+    player_id INTEGER,
+    hero_id INTEGER,
+    skill_id INTEGER,
+    level INTEGER,
+    PRIMARY KEY (player_id, hero_id, skill_id)
+) WITHOUT ROWID;
+"""
+
+# Migration of the TEXT keyed tables into the integer id tables
+_MIGRATE_FROM_V0 = """
+BEGIN IMMEDIATE;
+ALTER TABLE players RENAME TO players_v0;
+ALTER TABLE heroes RENAME TO heroes_v0;
+ALTER TABLE skills RENAME TO skills_v0;
+{create_tables}
+INSERT OR IGNORE INTO steamids (steamid)
+    SELECT steamid FROM players_v0
+    UNION SELECT steamid FROM heroes_v0
+    UNION SELECT steamid FROM skills_v0;
+INSERT OR IGNORE INTO classes (cls_id)
+    SELECT hero_cls_id FROM players_v0 WHERE hero_cls_id IS NOT NULL
+    UNION SELECT cls_id FROM heroes_v0
+    UNION SELECT hero_cls_id FROM skills_v0
+    UNION SELECT cls_id FROM skills_v0;
+INSERT OR REPLACE INTO players
+    SELECT s.id, p.gold, c.id FROM players_v0 p
+    JOIN steamids s ON s.steamid = p.steamid
+    LEFT JOIN classes c ON c.cls_id = p.hero_cls_id;
+INSERT OR REPLACE INTO heroes
+    SELECT s.id, c.id, h.level, h.exp FROM heroes_v0 h
+    JOIN steamids s ON s.steamid = h.steamid
+    JOIN classes c ON c.cls_id = h.cls_id;
+INSERT OR REPLACE INTO skills
+    SELECT s.id, h.id, c.id, k.level FROM skills_v0 k
+    JOIN steamids s ON s.steamid = k.steamid
+    JOIN classes h ON h.cls_id = k.hero_cls_id
+    JOIN classes c ON c.cls_id = k.cls_id;
+DROP TABLE players_v0;
+DROP TABLE heroes_v0;
+DROP TABLE skills_v0;
+PRAGMA user_version = 1;
+COMMIT;
+""".format(create_tables=_CREATE_TABLES)
+
+# Creation of a new database of schema version 1
+_CREATE_V1 = """
+PRAGMA auto_vacuum = INCREMENTAL;
+BEGIN IMMEDIATE;
+{create_tables}
+PRAGMA user_version = 1;
+COMMIT;
+""".format(create_tables=_CREATE_TABLES)
+
+# Upgrades from the previous schema version, keyed by the new version
+_UPGRADES = {
+
+    # Total levels of the players are kept up to date by the triggers,
+    # INSERT OR REPLACE doesn't fire the delete trigger as long as the
+    # recursive_triggers pragma is off. The outer statement's conflict
+    # policy overrides the triggers' own, so they must not rely on one
+    2: """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS player_levels (
+    player_id INTEGER PRIMARY KEY,
+    total_level INTEGER NOT NULL
+);
+INSERT OR REPLACE INTO player_levels
+    SELECT player_id, SUM(level) FROM heroes GROUP BY player_id;
+CREATE INDEX IF NOT EXISTS player_levels_by_level
+    ON player_levels (total_level);
+CREATE INDEX IF NOT EXISTS heroes_by_level ON heroes (hero_id, level);
+CREATE INDEX IF NOT EXISTS players_by_gold ON players (gold);
+CREATE TRIGGER IF NOT EXISTS heroes_level_insert
+BEFORE INSERT ON heroes BEGIN
+    INSERT INTO player_levels SELECT NEW.player_id, 0 WHERE NOT EXISTS (
+        SELECT 1 FROM player_levels WHERE player_id = NEW.player_id);
+    UPDATE player_levels SET total_level = total_level + NEW.level
+        - COALESCE((SELECT level FROM heroes WHERE
+            player_id = NEW.player_id AND hero_id = NEW.hero_id), 0)
+        WHERE player_id = NEW.player_id;
+END;
+CREATE TRIGGER IF NOT EXISTS heroes_level_update
+AFTER UPDATE OF level ON heroes BEGIN
+    UPDATE player_levels
+        SET total_level = total_level + NEW.level - OLD.level
+        WHERE player_id = NEW.player_id;
+END;
+CREATE TRIGGER IF NOT EXISTS heroes_level_delete
+AFTER DELETE ON heroes BEGIN
+    UPDATE player_levels SET total_level = total_level - OLD.level
+        WHERE player_id = OLD.player_id;
+END;
+PRAGMA user_version = 2;
+COMMIT;
+""",
+
+    # Existing players count as seen at the time of the upgrade
+    3: """
+BEGIN IMMEDIATE;
+ALTER TABLE players ADD COLUMN last_seen INTEGER NOT NULL DEFAULT 0;
+UPDATE players SET last_seen = CAST(strftime('%s', 'now') AS INTEGER);
+CREATE INDEX IF NOT EXISTS players_by_last_seen ON players (last_seen);
+PRAGMA user_version = 3;
+COMMIT;
+""",
+}
+
+# SQL statements are kept as constants so that each connection's
+# statement cache gets to reuse the prepared statements
+_SAVE_PLAYER = (
+    "INSERT OR REPLACE INTO players "
+    "VALUES (?, ?, ?, CAST(strftime('%s', 'now') AS INTEGER))")
+_SAVE_HERO = "INSERT OR REPLACE INTO heroes VALUES (?, ?, ?, ?)"
+_SAVE_SKILL = "INSERT OR REPLACE INTO skills VALUES (?, ?, ?, ?)"
+_LOAD_PLAYER = "SELECT gold, hero_id FROM players WHERE player_id=?"
+_LOAD_HEROES = "SELECT hero_id, level, exp FROM heroes WHERE player_id=?"
+_LOAD_HERO = "SELECT level, exp FROM heroes WHERE player_id=? AND hero_id=?"
+_LOAD_SKILLS = "SELECT hero_id, skill_id, level FROM skills WHERE player_id=?"
+_ADD_GOLD = "UPDATE players SET gold = gold + ? WHERE player_id=?"
+_INSERT_PLAYER = (
+    "INSERT OR IGNORE INTO players "
+    "VALUES (?, 0, ?, CAST(strftime('%s', 'now') AS INTEGER))")
+_LOAD_HERO_SKILLS = (
+    "SELECT skill_id, level FROM skills WHERE player_id=? AND hero_id=?")
+# Maximum amount of parameters bound to a single statement
+_MAX_PARAMETERS = 500
+
+_LOAD_PLAYERS = (
+    "SELECT player_id, gold, hero_id FROM players WHERE player_id IN ({0})")
+_LOAD_PLAYERS_HEROES = (
+    "SELECT player_id, hero_id, level, exp FROM heroes "
+    "WHERE player_id IN ({0})")
+_LOAD_PLAYERS_SKILLS = (
+    "SELECT player_id, hero_id, skill_id, level FROM skills "
+    "WHERE player_id IN ({0})")
+_ITER_PLAYERS = (
+    "SELECT steamids.id, steamids.steamid, players.gold, players.hero_id "
+    "FROM steamids LEFT JOIN players ON players.player_id = steamids.id "
+    "ORDER BY steamids.id")
+_ITER_HEROES = (
+    "SELECT player_id, hero_id, level, exp FROM heroes ORDER BY player_id")
+_ITER_SKILLS = (
+    "SELECT player_id, hero_id, skill_id, level FROM skills "
+    "ORDER BY player_id")
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+# Immutable snapshots of player's and hero's data
+PlayerRecord = namedtuple('PlayerRecord', ('steamid', 'gold', 'hero_cls_id'))
+HeroRecord = namedtuple(
+    'HeroRecord', ('steamid', 'cls_id', 'level', 'exp', 'skills'))
+
+
+class IdTable(object):
+    """Interns the strings of a dictionary table into integer ids.
+
+    Ids are cached in memory once looked up, so each string only hits
+    the database once. Missing strings get inserted in the same
+    transaction as the rows using them, but their ids only get cached
+    once the transaction has been committed, so a rolled back save can
+    never leave a cached id without its row.
+
+    Attributes:
+        table: Name of the dictionary table
+        column: Name of the table's string column
+    """
+
+    def __init__(self, table, column):
+        """Initializes a new id table.
+
+        Args:
+            table: Name of the dictionary table
+            column: Name of the table's string column
+        """
+
+        self.table = table
+        self.column = column
+        self._ids = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._select_id = 'SELECT id FROM {0} WHERE {1}=?'.format(
+            table, column)
+        self._select_value = 'SELECT {1} FROM {0} WHERE id=?'.format(
+            table, column)
+        self._insert = 'INSERT OR IGNORE INTO {0} ({1}) VALUES (?)'.format(
+            table, column)
+
+    def find(self, connection, value):
+        """Gets the id of a string without inserting it.
+
+        Args:
+            connection: Connection to the database
+            value: String whose id to get
+
+        Returns:
+            Id of the string or None if it's not in the table
+        """
+
+        id_ = self._ids.get(value)
+        if id_ is None:
+            row = connection.execute(self._select_id, (value, )).fetchone()
+            if row:
+                id_ = self._cache(value, row[0])
+        return id_
+
+    def intern(self, cursor, values):
+        """Gets the ids of strings, inserting the missing ones.
+
+        Must be called in the transaction using the ids, which must
+        pass them to remember() once it has been committed. None is
+        passed through as a None id, which gets stored as NULL.
+
+        Args:
+            cursor: Cursor of the transaction
+            values: Iterable of strings whose ids to get
+
+        Returns:
+            Dict of string -> id of the given strings
+        """
+
+        ids = {}
+        missing = []
+        for value in values:
+            id_ = self._ids.get(value)
+            if value is None:
+                ids[value] = None
+            elif id_ is None:
+                missing.append(value)
+            else:
+                ids[value] = id_
+        if missing:
+            cursor.executemany(
+                self._insert, ((value, ) for value in missing))
+            for value in missing:
+                cursor.execute(self._select_id, (value, ))
+                ids[value] = cursor.fetchone()[0]
+        return ids
+
+    def remember(self, ids):
+        """Caches the ids of a committed transaction.
+
+        Args:
+            ids: Dict of string -> id returned by intern()
+        """
+
+        for value, id_ in ids.items():
+            if value is not None:
+                self._cache(value, id_)
+
+    def value(self, connection, id_):
+        """Gets the string of an id.
+
+        Args:
+            connection: Connection to the database
+            id_: Id whose string to get
+
+        Returns:
+            String of the id or None if it's not in the table
+        """
+
+        value = self._values.get(id_)
+        if value is None and id_ is not None:
+            row = connection.execute(self._select_value, (id_, )).fetchone()
+            if row:
+                value = row[0]
+                self._cache(value, id_)
+        return value
+
+    def forget(self, values):
+        """Drops strings and their ids from the cache.
+
+        Args:
+            values: Iterable of strings to drop
+        """
+
+        with self._lock:
+            for value in values:
+                id_ = self._ids.pop(value, None)
+                self._values.pop(id_, None)
+
+    def _cache(self, value, id_):
+        """Caches a string and its id.
+
+        Returns:
+            The id
+        """
+
+        with self._lock:
+            self._ids[value] = id_
+            self._values[id_] = value
+        return id_
+
+
+class ConnectionManager(object):
+    """Manages persistent connections to a database file.
+
+    Each thread gets its own connection which stays open until the
+    manager is closed, so the connection setup and the statement
+    preparation are only paid once per thread. The manager also holds
+    the interned ids of the database's dictionary tables.
+
+    Attributes:
+        database_file: Path to the database file
+        pragmas: Dict of pragmas applied to each new connection
+        cached_statements: Amount of prepared statements to cache
+        steamids: IdTable of the players' steamids
+        classes: IdTable of the hero and skill class ids
+    """
+
+    def __init__(self, database_file, pragmas=None, cached_statements=128):
+        """Initializes a new connection manager.
+
+        Args:
+            database_file: Path to the database file
+            pragmas: Dict of pragmas applied to each new connection
+            cached_statements: Amount of prepared statements to cache
+        """
+
+        self.database_file = database_file
+        self.pragmas = pragmas or {}
+        self.cached_statements = cached_statements
+        self.steamids = IdTable('steamids', 'steamid')
+        self.classes = IdTable('classes', 'cls_id')
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        """Getter for the current thread's connection.
+
+        Opens a new connection and applies the pragmas to it
+        if the thread doesn't have one yet.
+
+        Returns:
+            Connection to the database file
+        """
+
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.database_file,
+                cached_statements=self.cached_statements,
+                check_same_thread=False
+            )
+            apply_pragmas(connection, self.pragmas)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def close(self):
+        """Closes all the connections opened by the manager."""
+
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+            self._local = threading.local()
+
+
+class StorageBackend(object):
+    """Base class for the storage backends of Hero Wars.
+
+    A storage backend stores players' data as PlayerRecords and
+    HeroRecords. Hero records may only contain the skills that have
+    changed, so backends must merge the skills of a saved hero record
+    into the previously saved ones instead of replacing them.
+
+    Attributes:
+        database_file: Path to the database file
+    """
+
+    def __init__(self, database_file):
+        """Initializes a new storage backend.
+
+        Args:
+            database_file: Path to the database file
+        """
+
+        self.database_file = database_file
+
+    def setup(self):
+        """Prepares the storage for use."""
+
+    def close(self):
+        """Closes the storage."""
+
+    def load_player(self, steamid):
+        """Loads player's records.
+
+        Args:
+            steamid: Steamid of the player whose records to load
+
+        Returns:
+            Tuple of player's PlayerRecord (or None if there's no record)
+            and a list of his HeroRecords
+        """
+
+        raise NotImplementedError
+
+    def load_players(self, steamids):
+        """Loads multiple players' records.
+
+        Args:
+            steamids: Iterable of steamids whose records to load
+
+        Returns:
+            Dict of steamid -> tuple of PlayerRecord (or None) and
+            a list of HeroRecords, for every given steamid
+        """
+
+        return {steamid: self.load_player(steamid) for steamid in steamids}
+
+    def iter_players(self):
+        """Iterates over every player's records.
+
+        Yields:
+            Tuples of PlayerRecord (or None) and a list of HeroRecords
+        """
+
+        raise NotImplementedError
+
+    def release(self, steamids):
+        """Drops anything cached about players.
+
+        Args:
+            steamids: Iterable of steamids of the players
+        """
+
+    def load_hero(self, steamid, cls_id):
+        """Loads hero's record.
+
+        Args:
+            steamid: Steamid of the hero's owner
+            cls_id: Class id of the hero
+
+        Returns:
+            HeroRecord of the hero or None if there's no record
+        """
+
+        player_rec, hero_recs = self.load_player(steamid)
+        for record in hero_recs:
+            if record.cls_id == cls_id:
+                return record
+        return None
+
+    def save_records(self, player_records=(), hero_records=()):
+        """Saves player and hero records in a single batch.
+
+        Args:
+            player_records: Iterable of PlayerRecords to save
+            hero_records: Iterable of HeroRecords to save
+        """
+
+        raise NotImplementedError
+
+    def save_player(self, player_rec, hero_recs=()):
+        """Saves player's record and his heroes' records.
+
+        Args:
+            player_rec: PlayerRecord to save
+            hero_recs: Iterable of HeroRecords to save
+        """
+
+        self.save_records((player_rec, ), hero_recs)
+
+    def save_hero(self, hero_rec):
+        """Saves hero's record.
+
+        Args:
+            hero_rec: HeroRecord to save
+        """
+
+        self.save_records(hero_records=(hero_rec, ))
+
+    def apply_deltas(self, exp_deltas, gold_deltas):
+        """Adds exp and gold on top of the saved records.
+
+        Heroes level up from the added exp just like they do in game.
+
+        Args:
+            exp_deltas: Dict of (steamid, hero's cls_id) -> exp to add
+            gold_deltas: Dict of steamid -> (gold to add, cls_id of the
+                hero used if the player isn't saved yet)
+        """
+
+        steamids = set(gold_deltas).union(
+            steamid for steamid, cls_id in exp_deltas)
+        saved = {steamid: self.load_player(steamid) for steamid in steamids}
+
+        hero_records = []
+        for (steamid, cls_id), exp in exp_deltas.items():
+            record = HeroRecord(steamid, cls_id, 0, 0, ())
+            for hero_rec in saved[steamid][1]:
+                if hero_rec.cls_id == cls_id:
+                    record = hero_rec
+            level, exp = _add_exp(cls_id, record.level, record.exp, exp)
+            hero_records.append(
+                record._replace(level=level, exp=exp, skills=()))
+
+        player_records = []
+        for steamid, (gold, cls_id) in gold_deltas.items():
+            record = saved[steamid][0] or PlayerRecord(steamid, 0, cls_id)
+            player_records.append(record._replace(gold=record.gold + gold))
+        self.save_records(player_records, hero_records)
+
+
+class SQLiteBackend(StorageBackend):
+    """Storage backend storing the records into an SQLite database.
+
+    Attributes:
+        manager: ConnectionManager of the database file
+    """
+
+    def __init__(self, database_file, profile=None):
+        """Initializes a new SQLite backend.
+
+        Args:
+            database_file: Path to the database file
+            profile: Name of the pragma profile, None for database_profile
+        """
+
+        super().__init__(database_file)
+        self.manager = ConnectionManager(
+            database_file, database_profiles[profile or database_profile])
+
+    @property
+    def connection(self):
+        """Getter for the current thread's connection.
+
+        Returns:
+            Connection to the database file
+        """
+
+        return self.manager.connection
+
+    def setup(self):
+        """Creates the HW tables into the database if they don't exist.
+
+        Upgrades the tables of an older schema version into the current
+        schema, vacuuming the database file after migrating the TEXT
+        keyed tables.
+        """
+
+        connection = self.connection
+        version = self._version()
+        migrated = False
+        if version == 0:
+            migrated = connection.execute(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type='table' AND name='players'"
+            ).fetchone() is not None
+            self._upgrade(1, _MIGRATE_FROM_V0 if migrated else _CREATE_V1)
+            version = 1
+        for version in range(version + 1, SCHEMA_VERSION + 1):
+            self._upgrade(version, _UPGRADES[version])
+        if migrated:
+            connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            connection.execute('VACUUM')
+
+    def _version(self):
+        """Gets the schema version of the database."""
+
+        return self.connection.execute('PRAGMA user_version').fetchone()[0]
+
+    def _upgrade(self, version, script):
+        """Runs a script upgrading the schema to a version.
+
+        Another server sharing the database may have run the same
+        upgrade since the version was checked, in which case the
+        script fails and gets rolled back.
+
+        Args:
+            version: Schema version the script upgrades to
+            script: SQL script of the upgrade
+        """
+
+        connection = self.connection
+        try:
+            connection.executescript(script)
+        except sqlite3.OperationalError:
+            connection.rollback()
+            if self._version() < version:
+                raise
+
+    def close(self):
+        """Closes all the connections to the database."""
+
+        self.manager.close()
+
+    def load_player(self, steamid):
+        """Loads player's records with a single query per table.
+
+        Args:
+            steamid: Steamid of the player whose records to load
+
+        Returns:
+            Tuple of player's PlayerRecord (or None if there's no record)
+            and a list of his HeroRecords
+        """
+
+        connection = self.connection
+        player_id = self.manager.steamids.find(connection, steamid)
+        if player_id is None:
+            return None, []
+        classes = self.manager.classes
+
+        cursor = connection.cursor()
+        cursor.execute(_LOAD_PLAYER, (player_id, ))
+        row = cursor.fetchone()
+        player_rec = None
+        if row:
+            player_rec = PlayerRecord(
+                steamid, row[0], classes.value(connection, row[1]))
+
+        # Group the skills by their heroes
+        skills = {}
+        cursor.execute(_LOAD_SKILLS, (player_id, ))
+        for hero_id, skill_id, level in cursor.fetchall():
+            skills.setdefault(hero_id, []).append(
+                (classes.value(connection, skill_id), level))
+
+        cursor.execute(_LOAD_HEROES, (player_id, ))
+        hero_recs = [
+            HeroRecord(steamid, classes.value(connection, hero_id), level,
+                exp, tuple(skills.get(hero_id, ())))
+            for hero_id, level, exp in cursor.fetchall()
+        ]
+        return player_rec, hero_recs
+
+    def load_players(self, steamids):
+        """Loads multiple players' records with a query per table.
+
+        Args:
+            steamids: Iterable of steamids whose records to load
+
+        Returns:
+            Dict of steamid -> tuple of PlayerRecord (or None) and
+            a list of HeroRecords, for every given steamid
+        """
+
+        connection = self.connection
+        steamid_table = self.manager.steamids
+        classes = self.manager.classes
+        records = {steamid: (None, []) for steamid in steamids}
+        ids = {}
+        for steamid in records:
+            player_id = steamid_table.find(connection, steamid)
+            if player_id is not None:
+                ids[player_id] = steamid
+
+        # Query in chunks to stay below SQLite's limit of parameters
+        cursor = connection.cursor()
+        player_ids = tuple(ids)
+        for start in range(0, len(player_ids), _MAX_PARAMETERS):
+            chunk = player_ids[start:start + _MAX_PARAMETERS]
+            params = ','.join('?' * len(chunk))
+            cursor.execute(_LOAD_PLAYERS.format(params), chunk)
+            for player_id, gold, hero_id in cursor.fetchall():
+                steamid = ids[player_id]
+                records[steamid] = (PlayerRecord(
+                    steamid, gold, classes.value(connection, hero_id)), [])
+
+            skills = {}
+            cursor.execute(_LOAD_PLAYERS_SKILLS.format(params), chunk)
+            for player_id, hero_id, skill_id, level in cursor.fetchall():
+                skills.setdefault((player_id, hero_id), []).append(
+                    (classes.value(connection, skill_id), level))
+            cursor.execute(_LOAD_PLAYERS_HEROES.format(params), chunk)
+            for player_id, hero_id, level, exp in cursor.fetchall():
+                steamid = ids[player_id]
+                records[steamid][1].append(HeroRecord(
+                    steamid, classes.value(connection, hero_id), level, exp,
+                    tuple(skills.get((player_id, hero_id), ()))))
+        return records
+
+    def iter_players(self):
+        """Iterates over every player's records in steamid id order.
+
+        Reads the tables with a cursor each in a single read
+        transaction of a separate connection, so the iteration sees
+        a consistent snapshot and only one player is held in memory
+        at a time.
+
+        Yields:
+            Tuples of PlayerRecord (or None) and a list of HeroRecords
+        """
+
+        connection = sqlite3.connect(self.database_file)
+        try:
+            connection.execute('BEGIN')
+            classes = {
+                id_: cls_id for id_, cls_id in connection.execute(
+                    'SELECT id, cls_id FROM classes')
+            }
+            heroes = _peekable(connection.execute(_ITER_HEROES))
+            skills = _peekable(connection.execute(_ITER_SKILLS))
+            for player_id, steamid, gold, hero_id in connection.execute(
+                    _ITER_PLAYERS):
+                hero_skills = {}
+                for _, hero, skill_id, level in _take_while(
+                        skills, player_id):
+                    hero_skills.setdefault(hero, []).append(
+                        (classes.get(skill_id), level))
+                hero_recs = [
+                    HeroRecord(steamid, classes.get(hero), level, exp,
+                        tuple(hero_skills.get(hero, ())))
+                    for _, hero, level, exp in _take_while(heroes, player_id)
+                ]
+                player_rec = None
+                if gold is not None:
+                    player_rec = PlayerRecord(
+                        steamid, gold, classes.get(hero_id))
+                if player_rec is not None or hero_recs:
+                    yield player_rec, hero_recs
+        finally:
+            connection.close()
+
+    def release(self, steamids):
+        """Drops the cached ids of players.
+
+        Args:
+            steamids: Iterable of steamids of the players
+        """
+
+        self.manager.steamids.forget(steamids)
+
+    def load_hero(self, steamid, cls_id):
+        """Loads hero's record with a query for the hero and its skills.
+
+        Args:
+            steamid: Steamid of the hero's owner
+            cls_id: Class id of the hero
+
+        Returns:
+            HeroRecord of the hero or None if there's no record
+        """
+
+        connection = self.connection
+        player_id = self.manager.steamids.find(connection, steamid)
+        hero_id = self.manager.classes.find(connection, cls_id)
+        cursor = connection.cursor()
+        cursor.execute(_LOAD_HERO, (player_id, hero_id))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute(_LOAD_HERO_SKILLS, (player_id, hero_id))
+        skills = tuple(
+            (self.manager.classes.value(connection, skill_id), level)
+            for skill_id, level in cursor.fetchall()
+        )
+        return HeroRecord(steamid, cls_id, row[0], row[1], skills)
+
+    def save_records(self, player_records=(), hero_records=()):
+        """Saves player and hero records in a single transaction.
+
+        Args:
+            player_records: Iterable of PlayerRecords to save
+            hero_records: Iterable of HeroRecords to save
+        """
+
+        player_records = tuple(player_records)
+        hero_records = tuple(hero_records)
+        manager = self.manager
+        steamid_values = {
+            record.steamid for record in player_records + hero_records}
+        class_values = {
+            record.hero_cls_id for record in player_records}.union(
+            (record.cls_id for record in hero_records),
+            (skill_cls_id for record in hero_records
+                for skill_cls_id, level in record.skills)
+        )
+
+        def save(cursor):
+            steamids = manager.steamids.intern(cursor, steamid_values)
+            classes = manager.classes.intern(cursor, class_values)
+            cursor.executemany(_SAVE_PLAYER, (
+                (steamids[record.steamid], record.gold,
+                    classes[record.hero_cls_id])
+                for record in player_records
+            ))
+            cursor.executemany(_SAVE_HERO, (
+                (steamids[record.steamid], classes[record.cls_id],
+                    record.level, record.exp)
+                for record in hero_records
+            ))
+            cursor.executemany(_SAVE_SKILL, (
+                (steamids[record.steamid], classes[record.cls_id],
+                    classes[skill_cls_id], level)
+                for record in hero_records
+                for skill_cls_id, level in record.skills
+            ))
+            return steamids, classes
+
+        steamids, classes = write_transaction(self.connection, save)
+        manager.steamids.remember(steamids)
+        manager.classes.remember(classes)
+
+    def apply_deltas(self, exp_deltas, gold_deltas):
+        """Adds exp and gold on top of the saved data in one transaction.
+
+        Args:
+            exp_deltas: Dict of (steamid, hero's cls_id) -> exp to add
+            gold_deltas: Dict of steamid -> (gold to add, cls_id of the
+                hero used if the player isn't saved yet)
+        """
+
+        manager = self.manager
+        steamid_values = set(gold_deltas).union(
+            steamid for steamid, cls_id in exp_deltas)
+        class_values = {cls_id for steamid, cls_id in exp_deltas}.union(
+            cls_id for gold, cls_id in gold_deltas.values())
+
+        def apply(cursor):
+            steamids = manager.steamids.intern(cursor, steamid_values)
+            classes = manager.classes.intern(cursor, class_values)
+            for (steamid, cls_id), exp in exp_deltas.items():
+                key = steamids[steamid], classes[cls_id]
+                cursor.execute(_LOAD_HERO, key)
+                level, old_exp = cursor.fetchone() or (0, 0)
+                cursor.execute(
+                    _SAVE_HERO, key + _add_exp(cls_id, level, old_exp, exp))
+            for steamid, (gold, cls_id) in gold_deltas.items():
+                player_id = steamids[steamid]
+                cursor.execute(_INSERT_PLAYER, (player_id, classes[cls_id]))
+                cursor.execute(_ADD_GOLD, (gold, player_id))
+            return steamids, classes
+
+        steamids, classes = write_transaction(self.connection, apply)
+        manager.steamids.remember(steamids)
+        manager.classes.remember(classes)
+
+
+class MemoryBackend(StorageBackend):
+    """Storage backend keeping the records in memory.
+
+    Nothing gets persisted, the backend is meant for testing and
+    benchmarking the rest of the storage layer.
+    """
+
+    def __init__(self, database_file):
+        """Initializes a new in-memory backend.
+
+        Args:
+            database_file: Path to the database file, unused
+        """
+
+        super().__init__(database_file)
+        self._players = {}
+        self._heroes = {}
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Drops all the records."""
+
+        with self._lock:
+            self._players.clear()
+            self._heroes.clear()
+
+    def load_player(self, steamid):
+        """Loads player's records.
+
+        Args:
+            steamid: Steamid of the player whose records to load
+
+        Returns:
+            Tuple of player's PlayerRecord (or None if there's no record)
+            and a list of his HeroRecords
+        """
+
+        with self._lock:
+            return (
+                self._players.get(steamid),
+                list(self._heroes.get(steamid, {}).values())
+            )
+
+    def iter_players(self):
+        """Iterates over every player's records.
+
+        Yields:
+            Tuples of PlayerRecord (or None) and a list of HeroRecords
+        """
+
+        with self._lock:
+            steamids = list(self._players.keys() | self._heroes.keys())
+        for steamid in steamids:
+            yield self.load_player(steamid)
+
+    def save_records(self, player_records=(), hero_records=()):
+        """Saves player and hero records.
+
+        Args:
+            player_records: Iterable of PlayerRecords to save
+            hero_records: Iterable of HeroRecords to save
+        """
+
+        with self._lock:
+            for record in player_records:
+                self._players[record.steamid] = record
+            for record in hero_records:
+                heroes = self._heroes.setdefault(record.steamid, {})
+                heroes[record.cls_id] = _merge_hero_record(
+                    heroes.get(record.cls_id), record)
+
+
+class DbmBackend(StorageBackend):
+    """Storage backend storing one packed record per steamid into dbm.
+
+    The dbm file is stored next to the database file, with the database
+    file's extension replaced by '.dbm'.
+
+    Attributes:
+        dbm_file: Path to the dbm file
+    """
+
+    def __init__(self, database_file):
+        """Initializes a new dbm backend.
+
+        Args:
+            database_file: Path to the database file
+        """
+
+        super().__init__(database_file)
+        self.dbm_file = os.path.splitext(database_file)[0] + '.dbm'
+        self._db = None
+        self._lock = threading.Lock()
+
+    def setup(self):
+        """Opens the dbm file, creating it if it doesn't exist."""
+
+        with self._lock:
+            if self._db is None:
+                self._db = dbm.open(self.dbm_file, 'c')
+
+    def close(self):
+        """Closes the dbm file."""
+
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def load_player(self, steamid):
+        """Loads player's records.
+
+        Args:
+            steamid: Steamid of the player whose records to load
+
+        Returns:
+            Tuple of player's PlayerRecord (or None if there's no record)
+            and a list of his HeroRecords
+        """
+
+        self.setup()
+        with self._lock:
+            data = self._db.get(steamid.encode())
+        if data is None:
+            return None, []
+        return _unpack_player(steamid, data)
+
+    def iter_players(self):
+        """Iterates over every player's records.
+
+        The keys get listed up front, the records are read one by one.
+
+        Yields:
+            Tuples of PlayerRecord (or None) and a list of HeroRecords
+        """
+
+        self.setup()
+        with self._lock:
+            keys = self._db.keys()
+        for key in keys:
+            with self._lock:
+                data = self._db.get(key)
+            if data is not None:
+                yield _unpack_player(key.decode(), data)
+
+    def save_records(self, player_records=(), hero_records=()):
+        """Saves player and hero records, one write per steamid.
+
+        Every record gets packed before anything is written, so records
+        that can't be packed don't leave the others half saved.
+
+        Args:
+            player_records: Iterable of PlayerRecords to save
+            hero_records: Iterable of HeroRecords to save
+
+        Raises:
+            ValueError: If a class id is over 255 bytes
+        """
+
+        # Group the records by their steamids
+        changes = {}
+        for record in player_records:
+            changes.setdefault(record.steamid, [None, []])[0] = record
+        for record in hero_records:
+            changes.setdefault(record.steamid, [None, []])[1].append(record)
+
+        self.setup()
+        with self._lock:
+            packed = {}
+            for steamid, (player_rec, new_heroes) in changes.items():
+                key = steamid.encode()
+                data = self._db.get(key)
+                old_player, old_heroes = (
+                    _unpack_player(steamid, data) if data else (None, []))
+                heroes = {record.cls_id: record for record in old_heroes}
+                for record in new_heroes:
+                    heroes[record.cls_id] = _merge_hero_record(
+                        heroes.get(record.cls_id), record)
+                packed[key] = _pack_player(
+                    player_rec or old_player, heroes.values())
+            for key, data in packed.items():
+                self._db[key] = data
+            if hasattr(self._db, 'sync'):
+                self._db.sync()
+
+
+# Storage backends selectable with the storage_backend config
+backends = dict(
+    sqlite = SQLiteBackend,
+    memory = MemoryBackend,
+    dbm = DbmBackend,
+)
+
+
 # ======================================================================
 # >> FUNCTIONS
 # ======================================================================
 
+def open_database(database_file, backend=None, **options):
+    """Opens a storage backend for a database file.
+
+    Args:
+        database_file: Path to the database file
+        backend: Name of the backend in backends, None for storage_backend
+        options: Additional keyword arguments for the backend
+
+    Returns:
+        Storage backend of the database file
+    """
+
+    storage = _storages.get(database_file)
+    if storage is None:
+        backend_cls = backends[backend or storage_backend]
+        storage = _storages[database_file] = backend_cls(
+            database_file, **options)
+    return storage
+
+
+def close_database(database_file):
+    """Closes the storage backend of a database file.
+
+    Args:
+        database_file: Path to the database file
+    """
+
+    storage = _storages.pop(database_file, None)
+    if storage is not None:
+        storage.close()
+
+
+def get_connection(database_file):
+    """Gets the current thread's connection to a database file.
+
+    Only available with the SQLite backend.
+
+    Args:
+        database_file: Path to the database file
+
+    Returns:
+        Connection to the database file
+    """
+
+    return open_database(database_file).connection
+
+
+def player_record(player, changed_only=False):
+    """Takes a snapshot of player's data and marks it as saved.
+
+    Args:
+        player: Player whose data to snapshot
+        changed_only: Skip the snapshot if player's row hasn't changed
+
+    Returns:
+        PlayerRecord of the player or None if skipped
+    """
+
+    if changed_only and not player.dirty:
+        return None
+    player.clear_dirty()
+    return PlayerRecord(player.steamid, player.gold, player.hero.cls_id)
+
+
+def hero_record(steamid, hero, changed_only=False):
+    """Takes a snapshot of hero's data and marks it as saved.
+
+    Args:
+        steamid: Steamid of the hero's owner
+        hero: Hero whose data to snapshot
+        changed_only: Only include the skills that have changed and
+            skip the snapshot if neither the hero nor its skills have
+
+    Returns:
+        HeroRecord of the hero, skills as (cls_id, level) pairs,
+        or None if skipped
+    """
+
+    skills = tuple(
+        skill for skill in hero.skills if skill.dirty or not changed_only)
+    if changed_only and not hero.dirty and not skills:
+        return None
+    hero.clear_dirty()
+    for skill in skills:
+        skill.clear_dirty()
+    return HeroRecord(
+        steamid, hero.cls_id, hero.level, hero.exp,
+        tuple((skill.cls_id, skill.level) for skill in skills)
+    )
+
+
+def save_records(database_file, player_records=(), hero_records=()):
+    """Saves player and hero records into the database.
+
+    All the records are written in a single batch.
+
+    Args:
+        database_file: Path to the database file
+        player_records: Iterable of PlayerRecords to save
+        hero_records: Iterable of HeroRecords to save
+    """
+
+    open_database(database_file).save_records(player_records, hero_records)
+
+
 def setup_database(database_file):
     """Creates the HW tables into the database if they don't exist.
 
@@ -35,27 +1246,7 @@ def setup_database(database_file):
         database_file: Path to the database file
     """
 
-    with sqlite3.connect(database_file) as connection:
-        cursor = connection.cursor()
-        cursor.execute("""CREATE TABLE IF NOT EXISTS players (
-            steamid TEXT PRIMARY KEY,
-            gold INTEGER,
-            hero_cls_id TEXT
-        )""")
-        cursor.execute("""CREATE TABLE IF NOT EXISTS heroes (
-            steamid TEXT,
-            cls_id TEXT,
-            level INTEGER,
-            exp INTEGER,
-            PRIMARY KEY (steamid, cls_id)
-        )""")
-        cursor.execute("""CREATE TABLE IF NOT EXISTS skills (
-            steamid TEXT,
-            hero_cls_id TEXT,
-            cls_id TEXT,
-            level INTEGER,
-            PRIMARY KEY (steamid, hero_cls_id, cls_id)
-        )""")
+    open_database(database_file).setup()
 
 
 def save_player_data(database_file, player):
@@ -66,13 +1257,8 @@ def save_player_data(database_file, player):
         player: Player whose data to save
     """
 
-    with sqlite3.connect(database_file) as connection:
-        cursor = connection.cursor()
-        cursor.execute(
-            "INSERT OR REPLACE INTO players VALUES (?, ?, ?)",
-            (player.steamid, player.gold, player.hero.cls_id)
-        )
-    save_hero_data(database_file, player.steamid, player.hero)
+    open_database(database_file).save_player(
+        player_record(player), (hero_record(player.steamid, player.hero), ))
 
 
 def save_hero_data(database_file, steamid, hero):
@@ -84,17 +1270,37 @@ def save_hero_data(database_file, steamid, hero):
         hero: Hero whose data to save
     """
 
-    with sqlite3.connect(database_file) as connection:
-        cursor = connection.cursor()
-        cursor.execute(
-            "INSERT OR REPLACE INTO heroes VALUES (?, ?, ?, ?)",
-            (steamid, hero.cls_id, hero.level, hero.exp)
-        )
-        for skill in hero.skills:
-            cursor.execute(
-                "INSERT OR REPLACE INTO skills VALUES (?, ?, ?, ?)",
-                (steamid, hero.cls_id, skill.cls_id, skill.level)
-            )
+    open_database(database_file).save_hero(hero_record(steamid, hero))
+
+
+def apply_deltas(database_file, exp_deltas, gold_deltas):
+    """Adds exp and gold on top of the saved data.
+
+    Heroes level up from the added exp just like they do in game.
+
+    Args:
+        database_file: Path to the database file
+        exp_deltas: Dict of (steamid, hero's cls_id) -> exp to add
+        gold_deltas: Dict of steamid -> (gold to add, cls_id of the
+            hero used if the player isn't saved yet)
+    """
+
+    open_database(database_file).apply_deltas(exp_deltas, gold_deltas)
+
+
+def fetch_player_records(database_file, steamid):
+    """Fetches player's records from the database.
+
+    Args:
+        database_file: Path to the database file
+        steamid: Steamid of the player whose records to fetch
+
+    Returns:
+        Tuple of player's PlayerRecord (or None if there's no record)
+        and a list of his HeroRecords
+    """
+
+    return open_database(database_file).load_player(steamid)
 
 
 def load_player_data(database_file, player):
@@ -105,29 +1311,50 @@ def load_player_data(database_file, player):
         player: Player whose data to load
     """
 
-    heroes = Hero.get_subclasses()
-    with sqlite3.connect(database_file) as connection:
-        cursor = connection.cursor()
-        cursor.execute(
-            "SELECT gold, hero_cls_id FROM players WHERE steamid=?",
-            (player.steamid, )
-        )
-        gold, current_hero_cls_id = cursor.fetchone() or (0, None)
-        player.gold = gold
+    apply_player_records(
+        player, *fetch_player_records(database_file, player.steamid))
 
-        # Load player's heroes
-        cursor.execute(
-            "SELECT cls_id, level, exp FROM heroes WHERE steamid=?",
-            (player.steamid, )
-        )
-        for cls_id, level, exp in cursor.fetchall():
-            hero_cls = find_element(heroes, 'cls_id', cls_id)
-            if hero_cls: 
-                hero = hero_cls(level, exp)
-                load_hero_data(database_file, player.steamid, hero)
-                player.heroes.append(hero)
-                if cls_id == current_hero_cls_id:
-                    player.hero = hero
+
+def apply_player_records(player, player_rec, hero_recs):
+    """Sets player's data from records fetched from the database.
+
+    Args:
+        player: Player whose data to set
+        player_rec: Player's PlayerRecord or None
+        hero_recs: Iterable of player's HeroRecords
+    """
+
+    gold, current_hero_cls_id = player_rec[1:] if player_rec else (0, None)
+    player.gold = gold
+
+    # Keep player's heroes as records, only building the current one
+    for record in hero_recs:
+        hero_cls = Hero.find(record.cls_id)
+        if hero_cls:
+            player.heroes.add_record(hero_cls, record)
+    hero = player.heroes.get(current_hero_cls_id)
+    if hero:
+        player.hero = hero
+
+    # Player's row is only up to date if it was found
+    if player_rec:
+        player.clear_dirty()
+
+
+def build_hero(hero_cls, record):
+    """Builds a hero from a record fetched from the database.
+
+    Args:
+        hero_cls: Class of the hero to build
+        record: HeroRecord to take the hero's data from
+
+    Returns:
+        New hero with the record's level, exp and skill levels
+    """
+
+    hero = hero_cls()
+    _apply_hero_record(hero, record)
+    return hero
 
 
 def load_hero_data(database_file, steamid, hero):
@@ -139,26 +1366,174 @@ def load_hero_data(database_file, steamid, hero):
         hero: Hero whose data to load
     """
 
-    with sqlite3.connect(database_file) as connection:
-        cursor = connection.cursor()
-        cursor.execute(
-            "SELECT level, exp FROM heroes WHERE steamid=? AND cls_id=?",
-            (steamid, hero.cls_id)
-        )
-        level, exp = cursor.fetchone() or (0, 0)
-        if level > hero.max_level:
-            hero.level = hero.max._level
-        else:
-            hero.level = level
-        hero.exp = exp
-
-        # Load hero's skills
-        for skill in hero.skills:
-            cursor.execute(
-                "SELECT level FROM skills "
-                "WHERE steamid=? AND hero_cls_id=? AND cls_id=?",
-                (steamid, hero.cls_id, skill.cls_id)
-            )
-            data = cursor.fetchone()
-            if data:
-                skill.level = data[0]
+    record = open_database(database_file).load_hero(steamid, hero.cls_id)
+    _apply_hero_record(
+        hero, record or HeroRecord(steamid, hero.cls_id, 0, 0, ()))
+
+
+def _apply_hero_record(hero, record):
+    """Sets hero's level, exp and skill levels from a record.
+
+    Args:
+        hero: Hero whose data to set
+        record: HeroRecord to take the data from
+    """
+
+    hero.level = min(record.level, hero.max_level)
+    hero.exp = record.exp
+
+    # Set hero's skills' levels
+    skill_levels = dict(record.skills)
+    for skill in hero.skills:
+        if skill.cls_id in skill_levels:
+            skill.level = skill_levels[skill.cls_id]
+            skill.clear_dirty()
+    hero.clear_dirty()
+
+
+def _add_exp(cls_id, level, exp, gain):
+    """Adds exp to a hero's level and exp like the Hero class does.
+
+    Args:
+        cls_id: Class id of the hero
+        level: Hero's current level
+        exp: Hero's current exp
+        gain: Amount of exp to add
+
+    Returns:
+        Tuple of hero's new level and exp
+    """
+
+    hero_cls = Hero.find(cls_id)
+    if hero_cls is None:
+        return level, exp + gain
+    hero = hero_cls(min(level, hero_cls.max_level), exp)
+    hero.exp += gain
+    return hero.level, hero.exp
+
+
+def _merge_hero_record(old, new):
+    """Merges a hero record with only its changed skills into an older.
+
+    Args:
+        old: Previously saved HeroRecord or None
+        new: HeroRecord to merge
+
+    Returns:
+        HeroRecord with the new record's data and all the skills
+    """
+
+    if old is None:
+        return new
+    return new._replace(skills=tuple(dict(old.skills + new.skills).items()))
+
+
+def _pack_string(value):
+    """Packs a string with its length.
+
+    Raises:
+        ValueError: If the string is too long for its packed length
+    """
+
+    data = value.encode()
+    if len(data) >= 1 << 8 * _PACKED_LENGTH.size:
+        raise ValueError('String too long for the dbm backend: {0!r}'.format(
+            value))
+    return _PACKED_LENGTH.pack(len(data)) + data
+
+
+def _unpack_string(data, offset):
+    """Unpacks a string packed with _pack_string().
+
+    Returns:
+        Tuple of the string and the offset after it
+    """
+
+    length, = _PACKED_LENGTH.unpack_from(data, offset)
+    offset += _PACKED_LENGTH.size
+    return data[offset:offset + length].decode(), offset + length
+
+
+def _pack_player(player_rec, hero_recs):
+    """Packs player's records into bytes.
+
+    Args:
+        player_rec: Player's PlayerRecord or None
+        hero_recs: Iterable of player's HeroRecords
+
+    Returns:
+        The packed records
+    """
+
+    hero_recs = tuple(hero_recs)
+    buffer = [_PACKED_PLAYER.pack(
+        player_rec is not None, player_rec.gold if player_rec else 0,
+        len(hero_recs))]
+    buffer.append(_pack_string(player_rec and player_rec.hero_cls_id or ''))
+    for record in hero_recs:
+        buffer.append(_pack_string(record.cls_id))
+        buffer.append(_PACKED_HERO.pack(
+            record.level, record.exp, len(record.skills)))
+        for skill_cls_id, level in record.skills:
+            buffer.append(_pack_string(skill_cls_id))
+            buffer.append(_PACKED_SKILL.pack(level))
+    return b''.join(buffer)
+
+
+def _unpack_player(steamid, data):
+    """Unpacks player's records packed with _pack_player().
+
+    Args:
+        steamid: Steamid of the player
+        data: The packed records
+
+    Returns:
+        Tuple of player's PlayerRecord (or None if there's no record)
+        and a list of his HeroRecords
+    """
+
+    has_player, gold, hero_count = _PACKED_PLAYER.unpack_from(data)
+    hero_cls_id, offset = _unpack_string(data, _PACKED_PLAYER.size)
+    player_rec = None
+    if has_player:
+        player_rec = PlayerRecord(steamid, gold, hero_cls_id or None)
+    hero_recs = []
+    for _ in range(hero_count):
+        cls_id, offset = _unpack_string(data, offset)
+        level, exp, skill_count = _PACKED_HERO.unpack_from(data, offset)
+        offset += _PACKED_HERO.size
+        skills = []
+        for _ in range(skill_count):
+            skill_cls_id, offset = _unpack_string(data, offset)
+            skill_level, = _PACKED_SKILL.unpack_from(data, offset)
+            offset += _PACKED_SKILL.size
+            skills.append((skill_cls_id, skill_level))
+        hero_recs.append(
+            HeroRecord(steamid, cls_id, level, exp, tuple(skills)))
+    return player_rec, hero_recs
+
+
+def _peekable(iterator):
+    """Wraps an iterator into a list of [next item, iterator].
+
+    Used with _take_while() for merge joining sorted cursors.
+    """
+
+    return [next(iterator, None), iterator]
+
+
+def _take_while(peekable, key):
+    """Takes the items whose first value is at most key from a peekable.
+
+    Items with a smaller key are orphans of the merge join and
+    get skipped.
+
+    Yields:
+        Items whose first value equals key
+    """
+
+    while peekable[0] is not None and peekable[0][0] <= key:
+        item = peekable[0]
+        peekable[0] = next(peekable[1], None)
+        if item[0] == key:
+            yield item
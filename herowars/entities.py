@@ -3,19 +3,21 @@
 # ======================================================================
 
 # Hero Wars
-from herowars.tools import get_subclasses
 from herowars.tools import classproperty
 from herowars.tools import Event
+from herowars.tools import WatchedList
 
 from herowars.configs import default_hero_category
 from herowars.configs import default_item_category
 from herowars.configs import item_sell_value_multiplier
-from herowars.configs import exp_algorithm
+from herowars.configs import validate_skill_points
 
 from herowars.translations import get_translation
 
-# Source.Python
-from listeners.tick.repeat import TickRepeat
+import herowars.configs as configs
+
+# Python
+from bisect import bisect_right
 
 
 # ======================================================================
@@ -23,6 +25,7 @@ from listeners.tick.repeat import TickRepeat
 # ======================================================================
 
 __all___ = (
+    'ExpTable',
     'Entity',
     'Hero',
     'Skill',
@@ -31,10 +34,85 @@ __all___ = (
 )
 
 
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Enabled subclasses of the entity classes sorted by their names and
+# grouped by their categories, built when first needed
+_sorted_subclasses = {}
+_categories = {}
+
+# Names of the entity classes' event hooks, found when first needed
+_hooks = {}
+
+# Cumulative exp tables of the hero classes, built when first needed
+_exp_tables = {}
+
+
 # ======================================================================
 # >> CLASSES
 # ======================================================================
 
+class ExpTable(object):
+    """Total exp required to reach each level from level zero.
+
+    The totals get computed from an exp algorithm as far as they're
+    needed, so that the level reached with any amount of exp can be
+    bisected from them instead of leveling up one level at a time.
+    The algorithm must never return a negative amount of exp.
+
+    Attributes:
+        algorithm: Function returning the exp required to level up
+            from a level
+        max_level: Maximum level of the table
+    """
+
+    def __init__(self, algorithm, max_level):
+        """Initializes a new exp table.
+
+        Args:
+            algorithm: Function returning the exp required to level up
+                from a level
+            max_level: Maximum level of the table
+        """
+
+        self.algorithm = algorithm
+        self.max_level = max_level
+        self._totals = [0]
+
+    def total(self, level):
+        """Gets the total exp required to reach a level.
+
+        Args:
+            level: Level to reach, at most max_level
+
+        Returns:
+            Total exp required to reach the level from level zero
+        """
+
+        totals = self._totals
+        while len(totals) <= level:
+            totals.append(totals[-1] + self.algorithm(len(totals) - 1))
+        return totals[level]
+
+    def level_of(self, total):
+        """Gets the level reached with a total amount of exp.
+
+        Args:
+            total: Total amount of exp gained from level zero
+
+        Returns:
+            Tuple of the level reached and the exp left over from it
+        """
+
+        totals = self._totals
+        while totals[-1] <= total and len(totals) <= self.max_level:
+            totals.append(totals[-1] + self.algorithm(len(totals) - 1))
+        level = bisect_right(totals, total) - 1
+        return level, total - totals[level]
+
+
 class Entity(object):
     """The base element of Hero Wars.
 
@@ -42,8 +120,16 @@ class Entity(object):
     It implements common properties like name and description, as well
     as common behavior and methods for most objects in Hero Wars.
 
+    Every entity class registers itself into its base classes'
+    registries when it's created, so the subclasses never have to be
+    searched for. Hero registries are keyed by class id, which must be
+    unique among heroes. Other registries are keyed by the module and
+    qualified name, as skills and items of different heroes may share
+    their class ids.
+
     Attributes:
         level: Entity's Hero Wars level
+        dirty: Has the entity changed since it was last saved
 
     Class Attributes:
         name: Entity's name
@@ -65,6 +151,29 @@ class Entity(object):
     enabled = True
     allowed_users = tuple()
 
+    # Subclasses keyed by their class ids or qualified names
+    _registry = {}
+
+    # Are the subclasses keyed by their class ids
+    _unique_cls_id = False
+
+    def __init_subclass__(cls, **kwargs):
+        """Registers a new entity class into its bases' registries.
+
+        A class with the same key as an already registered one, such
+        as one from a reloaded module, replaces the old class.
+        """
+
+        super().__init_subclass__(**kwargs)
+        cls._registry = {}
+        qualified_name = '{0}.{1}'.format(cls.__module__, cls.__qualname__)
+        for base in cls.__mro__[1:]:
+            registry = base.__dict__.get('_registry')
+            if registry is not None:
+                key = cls.cls_id if base._unique_cls_id else qualified_name
+                registry[key] = cls
+        Entity.invalidate_subclasses()
+
     @classproperty
     def cls_id(cls):
         """Gets the class' id.
@@ -86,6 +195,22 @@ class Entity(object):
         """
 
         self._level = level
+        self._dirty = True
+
+    @property
+    def dirty(self):
+        """Getter for entity's dirty flag.
+
+        Returns:
+            True if the entity has changed since it was last saved
+        """
+
+        return self._dirty
+
+    def clear_dirty(self):
+        """Marks the entity as saved."""
+
+        self._dirty = False
 
     @property
     def level(self):
@@ -111,24 +236,124 @@ class Entity(object):
         elif level > self.max_level:
             raise ValueError(
                 'Attempt to set an entity\'s level over it\'s maximum level.')
+        if level != self._level:
+            self._dirty = True
         self._level = level
 
     @classmethod
     def get_subclasses(cls):
-        """Gets a list of the enabled subclasses.
+        """Gets the enabled subclasses.
+
+        The subclasses are sorted by their names once and reused until
+        the registries change or get invalidated.
+
+        Returns:
+            Tuple of enabled entity class' subclasses sorted by name
+        """
+
+        subclasses = _sorted_subclasses.get(cls)
+        if subclasses is None:
+            subclasses = _sorted_subclasses[cls] = tuple(sorted(
+                (subcls for subcls in cls._registry.values()
+                    if subcls.enabled),
+                key=lambda subcls: subcls.name
+            ))
+        return subclasses
+
+    @classmethod
+    def find(cls, cls_id):
+        """Finds an enabled subclass by its class id.
+
+        Subclasses in registries not keyed by class id are searched
+        for, returning the first one with the class id.
+
+        Args:
+            cls_id: Class id of the subclass
+
+        Returns:
+            Subclass with the class id or None if there's no such
+            enabled subclass
+        """
+
+        if cls._unique_cls_id:
+            subcls = cls._registry.get(cls_id)
+            if subcls is not None and subcls.enabled:
+                return subcls
+            return None
+        for subcls in cls._registry.values():
+            if subcls.cls_id == cls_id and subcls.enabled:
+                return subcls
+        return None
 
-        Loops through all the subclasses of an entity class, adding the
-        ones that have 'enabled' set to True to a list and returns
-        the list of all the subclasses, sorted by the class's name.
+    @classmethod
+    def get_categories(cls):
+        """Gets the enabled subclasses grouped by their categories.
+
+        Returns:
+            Dict of category -> tuple of subclasses sorted by name
+        """
+
+        categories = _categories.get(cls)
+        if categories is None:
+            categories = {}
+            for subcls in cls.get_subclasses():
+                category = getattr(subcls, 'category', None)
+                categories.setdefault(category, []).append(subcls)
+            categories = _categories[cls] = {
+                category: tuple(subclasses)
+                for category, subclasses in categories.items()
+            }
+        return categories
+
+    @classmethod
+    def get_hooks(cls):
+        """Gets the names of the class' event hooks.
+
+        Event hooks are the methods whose names start with 'on_', such
+        as on_spawn and on_attack.
 
         Returns:
-            List of enabled entity class' subclasses
+            Tuple of the hooks' names
         """
 
-        return sorted(
-            (subcls for subcls in get_subclasses(cls) if subcls.enabled),
-            key=lambda subcls: subcls.name
-        )
+        hooks = _hooks.get(cls)
+        if hooks is None:
+            hooks = _hooks[cls] = tuple(
+                name for name in dir(cls)
+                if name.startswith('on_') and callable(getattr(cls, name))
+            )
+        return hooks
+
+    @staticmethod
+    def invalidate_subclasses():
+        """Clears the sorted and grouped subclasses.
+
+        Must be called after changing an entity class' name, category
+        or enabled attribute, so that they get sorted and grouped again.
+        """
+
+        _sorted_subclasses.clear()
+        _categories.clear()
+        _hooks.clear()
+        _exp_tables.clear()
+
+    @staticmethod
+    def forget_module(module_name):
+        """Removes the entity classes of a module from the registries.
+
+        Must be called before reloading or unloading a module, so that
+        classes removed from the module don't stay registered.
+
+        Args:
+            module_name: Name of the module, such as 'herowars.heroes.test'
+        """
+
+        for entity_cls in (Entity, ) + tuple(Entity._registry.values()):
+            registry = entity_cls._registry
+            for key, subcls in tuple(registry.items()):
+                if subcls.__module__ == module_name:
+                    del registry[key]
+        Entity.invalidate_subclasses()
 
 
 class Hero(Entity):
@@ -142,8 +367,16 @@ class Hero(Entity):
     enemies and planting bombs.
     After leveling up, player can upgrade the hero's skills a little.
 
+    Hero executes its passives', leveled skills' and items' event
+    hooks through a dispatch table of hook names and bound methods,
+    which gets rebuilt only after the passives, skills or items change
+    or a skill gets leveled up from or reset to zero. The skill points
+    used by the skills are counted as their levels change.
+
     Attributes:
         skills: List of hero object's skills
+        passives: List of hero object's passive skills
+        items: List of hero object's items
         exp: Hero's experience points for gradually leveling up
         required_exp: Experience points required for hero to level up
 
@@ -163,6 +396,9 @@ class Hero(Entity):
     cost = 20
     category = default_hero_category
 
+    # Heroes are keyed by their class ids, which are saved and shown
+    _unique_cls_id = True
+
     def __init__(self, level=0, exp=0):
         """Initializes a new Hero Wars hero.
 
@@ -173,13 +409,16 @@ class Hero(Entity):
 
         super().__init__(level)
         self._exp = exp
-        self.skills = [
+        self._dispatch = None
+        self._used_points = 0
+        self.skills = WatchedList(self._skills_changed, (
             skill() for skill in self.skill_set if skill.enabled
-        ]
-        self.passives = [
+        ))
+        self._skills_changed()
+        self.passives = WatchedList(self.invalidate_dispatch, (
             passive() for passive in self.passive_set if passive.enabled
-        ]
-        self.items = []
+        ))
+        self.items = WatchedList(self.invalidate_dispatch)
         self.e_level_up = Event()
 
     @property
@@ -192,7 +431,7 @@ class Hero(Entity):
         
         if self.level >= self.max_level:
             return 0
-        return exp_algorithm(self.level)
+        return configs.exp_algorithm(self.level)
 
     @Entity.level.setter
     def level(self, level):
@@ -206,6 +445,8 @@ class Hero(Entity):
             level: Level to set the hero to
         """
 
+        if self._exp:
+            self._dirty = True
         self._exp = 0
         Entity.level.fset(self, level)  # Call to Entity's level setter
 
@@ -224,7 +465,10 @@ class Hero(Entity):
         """Setter for hero's experience points.
 
         Sets hero's exp, increases hero's level as his experience points
-        reach their maximum.
+        reach their maximum. The new level is bisected from the hero
+        class' exp table, so large amounts of exp level up the hero
+        just as fast as small ones, and the level up event is fired
+        once with the total gain.
 
         Raises:
             ValueError: If attempting to set exp to a negative value
@@ -236,21 +480,20 @@ class Hero(Entity):
 
         # Make sure hero is not already maxed out
         if self.level >= self.max_level:
+            if self._exp:
+                self._dirty = True
             self._exp = 0
             return
 
         # If exp differs from current exp
         if exp != self._exp:
 
-            # Set the new exp and get old level
-            self._exp = exp
+            # Get old level and bisect the new level from the total exp
+            self._dirty = True
             old_lvl = self.level
-
-            # Increase levels while necessary
-            while (self.exp >= self.required_exp
-                    and self.level < self.max_level):
-                self._exp -= self.required_exp
-                self._level += 1
+            table = self.get_exp_table()
+            self._level, self._exp = table.level_of(
+                table.total(old_lvl) + exp)
 
             # Make sure the hero's level is not over the maximum level
             if self.level >= self.max_level:
@@ -261,6 +504,25 @@ class Hero(Entity):
             if self.level > old_lvl:
                 self.e_level_up.fire(self, self.level - old_lvl)
 
+    @classmethod
+    def get_exp_table(cls):
+        """Gets the hero class' cumulative exp table.
+
+        The table gets built again if the configured exp algorithm or
+        the class' maximum level has changed, as the algorithm is read
+        from the configs on every call.
+
+        Returns:
+            ExpTable of the hero class
+        """
+
+        exp_algorithm = configs.exp_algorithm
+        table = _exp_tables.get(cls)
+        if (table is None or table.algorithm is not exp_algorithm
+                or table.max_level != cls.max_level):
+            table = _exp_tables[cls] = ExpTable(exp_algorithm, cls.max_level)
+        return table
+
     @property
     def skill_points(self):
         """Gets the amount of hero's unused skill points.
@@ -269,27 +531,93 @@ class Hero(Entity):
             Unused skill points
         """
 
-        used_points = sum(skill.level * skill.cost for skill in self.skills)
+        used_points = self._used_points
+        if validate_skill_points:
+            counted = self.count_used_skill_points()
+            if counted != used_points:
+                raise RuntimeError(
+                    'Hero {cls_id} has {used} used skill points counted, '
+                    'but its skills use {counted}.'.format(
+                        cls_id=self.cls_id, used=used_points,
+                        counted=counted))
         return self._level - used_points
 
+    def count_used_skill_points(self):
+        """Counts the skill points used by the skills from their levels.
+
+        This is the slow path used for validating the kept count.
+
+        Returns:
+            Skill points used by the skills
+        """
+
+        return sum(skill.level * skill.cost for skill in self.skills)
+
+    def skill_level_changed(self, skill, old_level):
+        """Updates the hero after one of his skills' level has changed.
+
+        Args:
+            skill: Skill whose level has changed
+            old_level: Skill's previous level
+        """
+
+        self._used_points += (skill.level - old_level) * skill.cost
+        if bool(skill.level) != bool(old_level):
+            self.invalidate_dispatch()
+
+    def _skills_changed(self):
+        """Takes ownership of the skills and counts their skill points."""
+
+        for skill in self.skills:
+            skill.owner = self
+        self._used_points = self.count_used_skill_points()
+        self.invalidate_dispatch()
+
     def execute_skills(self, method_name, **eargs):
-        """Executes hero's skills and passives.
+        """Executes hero's skills, passives and items.
 
-        Calls each of hero's skills' and passives' execute() method with
-        the given eargs.
+        Calls the method of each of hero's passives, leveled skills and
+        items that has one with the given eargs. When none of them has
+        the method, this is a single dict lookup.
 
         Args:
             method_name: Name of the method to execute
             eargs: Additional information of the event
         """
 
-        for passive in self.passives:
-            passive.execute_method(method_name, **eargs)
-        for skill in self.skills:
-            if skill.level:
-                skill.execute_method(method_name, **eargs)
-        for item in self.items:
-            item.execute_method(method_name, **eargs)
+        dispatch = self._dispatch
+        if dispatch is None:
+            dispatch = self._dispatch = self._build_dispatch()
+        for method in dispatch.get(method_name, ()):
+            method(**eargs)
+
+    def invalidate_dispatch(self):
+        """Makes the dispatch table get rebuilt before its next use.
+
+        Called automatically when the passives, skills or items change
+        and when a skill gets leveled up from or reset to zero.
+        """
+
+        self._dispatch = None
+
+    def _build_dispatch(self):
+        """Builds the dispatch table of the hero's event hooks.
+
+        Returns:
+            Dict of hook name -> tuple of bound methods, in the order
+            of passives, skills and items
+        """
+
+        dispatch = {}
+        for entities in (
+                self.passives,
+                [skill for skill in self.skills if skill.level],
+                self.items):
+            for entity in entities:
+                for name in entity.get_hooks():
+                    dispatch.setdefault(name, []).append(
+                        getattr(entity, name))
+        return {name: tuple(methods) for name, methods in dispatch.items()}
 
     @classmethod
     def skill(cls, skill_class):
@@ -344,6 +672,25 @@ class Skill(Entity):
     max_level = 6
     required_level = 0
 
+    # Hero notified of the skill's level changes, if any
+    owner = None
+
+    @Entity.level.setter
+    def level(self, level):
+        """Level setter for skill.
+
+        Notifies the owning hero of the change, so that he can keep his
+        used skill points and dispatch table up to date.
+
+        Args:
+            level: Level to set the skill to
+        """
+
+        old_level = self._level
+        Entity.level.fset(self, level)  # Call to Entity's level setter
+        if self.owner is not None and self._level != old_level:
+            self.owner.skill_level_changed(self, old_level)
+
     def execute_method(self, method_name, **eargs):
         """Executes skill's method.
 
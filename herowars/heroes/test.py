@@ -8,13 +8,10 @@ from herowars.entities import Hero, Skill
 from herowars.tools import chance, chancef
 from herowars.tools import cooldown, cooldownf
 
-from herowars.player import get_player
+from herowars.player import get_enemies
 
 import herowars.commandlib as cmdlib
 
-# Source.Python
-from filters.players import PlayerIter
-
 
 # ======================================================================
 # >> Test Hero #1
@@ -59,13 +56,9 @@ class Ignite(Skill):
     max_level = 2
 
     def on_spawn(self, player, **eargs):
-        target_team = player.team == 2 and 'ct' or 't'
-        for userid in PlayerIter(
-                is_filters=('alive', target_team), return_types='userid'):
-            target = get_player(userid)
-            if target:
-                cmdlib.burn(target, 2 + self.level)
-                cmdlib.tell(target, 'You were burned!')
+        for target in get_enemies(player, alive=True):
+            cmdlib.burn(target, 2 + self.level)
+            cmdlib.tell(target, 'You were burned!')
         cmdlib.tell(player, 'You burned your enemies!')
 
 
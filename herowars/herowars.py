@@ -4,16 +4,37 @@
 
 # Hero Wars
 from herowars.player import get_player
+from herowars.player import get_teammates
 from herowars.player import create_player
 from herowars.player import remove_player
+from herowars.player import prefetch_player
+from herowars.player import discard_prefetch
+from herowars.player import clear_prefetches
+from herowars.player import active_steamids
+from herowars.player import reconnect_cache
 from herowars.player import players
 
+from herowars.database import open_database
+from herowars.database import close_database
 from herowars.database import setup_database
-from herowars.database import save_player_data
 
-from herowars.entities import Hero
+from herowars.persistence import save_queue
+
+from herowars.journal import journal
+
+from herowars.subscriptions import hook_events
+from herowars.subscriptions import update_subscriptions
+
+from herowars.cooldowns import cooldowns
 
-from herowars.tools import find_element
+from herowars.leaderboards import leaderboard_cache
+
+from herowars.transfer import export_players
+from herowars.transfer import import_players
+
+from herowars.maintenance import write_class_ids
+
+from herowars.entities import Hero
 
 from herowars.configs import database_path
 from herowars.configs import exp_values
@@ -21,6 +42,9 @@ from herowars.configs import gold_values
 from herowars.configs import show_gold_messages
 from herowars.configs import chat_command_prefix
 from herowars.configs import starting_heroes
+from herowars.configs import group_commit
+from herowars.configs import reset_cooldowns_on_round_start
+from herowars.configs import reset_cooldowns_on_death
 
 from herowars.translations import get_translation
 
@@ -31,10 +55,17 @@ from herowars.items import *
 
 import herowars.commandlib as cmdlib
 
+# Python
+import threading
+import time
+import traceback
+
+from itertools import chain
+
 # Source.Python 
 from events import Event
 
-from filters.players import PlayerIter
+from commands.server import ServerCommand
 
 from engines.server import engine_server
 
@@ -63,6 +94,14 @@ info.convar = PublicConVar(
 )
 
 
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Steamids skipped by the running import, None when not importing
+_import_excluded = None
+
+
 # ======================================================================
 # >> FUNCTIONS
 # ======================================================================
@@ -71,7 +110,12 @@ def load():
     """Setups the database upon Hero Wars loading.
 
     Makes sure there are heroes on the server, restarts the game
-    and setups the database file.
+    opens and setups the database file, replays any exp and gold left
+    unsaved in the journal by a crash and starts the save queue.
+    Writes the class ids of the heroes, skills and items for the
+    maintenance tool.
+    Only subscribes to the skill events some enabled skill or item
+    has hooks for.
 
     Raises:
         NotImplementedError: When there are no heroes
@@ -83,17 +127,40 @@ def load():
     if not starting_heroes:
         raise NotImplementedError('No starting heroes set.')
     for cls_id in starting_heroes:
-        if not find_element(heroes, 'cls_id', cls_id):
+        if not Hero.find(cls_id):
             raise ValueError('Invalid starting hero: {0}'.format(cls_id))
+    write_class_ids()
+    open_database(database_path)
     setup_database(database_path)
+    journal.replay(database_path)
+    journal.open()
+    save_queue.start()
+    update_subscriptions()
     engine_server.server_command('mp_restartgame 3\n')
 
 
 def unload():
-    """Save all unsaved data into database."""
+    """Save all unsaved data into database and close the database.
+
+    All players get snapshotted at once and enqueued as a single batch,
+    which the save queue writes in one transaction before stopping.
+    The time taken is reported in the server log.
+    """
 
-    for player in players:
-        save_player_data(database_path, player)
+    start = time.perf_counter()
+    hook_events.clear()
+    clear_prefetches()
+    reconnect_cache.clear()
+    cooldowns.clear()
+    leaderboard_cache.clear()
+    stats = save_queue.put_players(players)
+    save_queue.stop()
+    journal.close()
+    close_database(database_path)
+    engine_server.log_print(
+        'Hero Wars saved {players} players ({rows} rows) in {ms:.1f} ms.\n'
+        .format(players=len(players), rows=stats.written,
+            ms=(time.perf_counter() - start) * 1000))
 
 
 def give_gold(player, gold_key):
@@ -109,6 +176,7 @@ def give_gold(player, gold_key):
     gold = gold_values.get(gold_key, 0)
     if gold > 0:
         player.gold += gold
+        journal.record(player.steamid, player.hero.cls_id, gold=gold)
         translation = get_translation(player.lang_key, 'gold', gold_key)
         cmdlib.tell(player, translation.format(gold=gold))
 
@@ -124,6 +192,7 @@ def give_exp(player, exp_key):
     exp = exp_values.get(exp_key, 0)
     if exp > 0:
         player.hero.exp += exp
+        journal.record(player.steamid, player.hero.cls_id, exp=exp)
         translation = get_translation(player.lang_key, 'exp', exp_key)
         cmdlib.tell(player, translation.format(exp=exp))
 
@@ -137,29 +206,52 @@ def give_team_exp(player, exp_key):
     """
 
     # Give all his teammates exp
-    team = player.team == 2 and 't' or 'ct'
-    for userid in PlayerIter(is_filters=team, return_types='userid'):
-        if userid != player.userid:
-            teammate = get_player(userid)
-            give_exp(teammate, exp_key)
+    for teammate in get_teammates(player):
+        give_exp(teammate, exp_key)
 
 
 # ======================================================================
 # >> GAME EVENTS
 # ======================================================================
 
+@Event
+def player_connect(game_event):
+    """Starts loading player's data as soon as he connects."""
+
+    steamid = game_event.get_string('networkid')
+    if steamid != 'BOT':
+        if _import_excluded is not None:
+            _import_excluded.add(steamid)
+        prefetch_player(steamid)
+
+
 @Event
 def player_disconnect(game_event):
     """Removes a player and saves his data upon disconnection."""
 
     userid = game_event.get_int('userid')
+    discard_prefetch(game_event.get_string('networkid'))
     remove_player(userid)
 
 
+@Event
+def player_team(game_event):
+    """Moves a player to his new team in the players registry.
+
+    Changing team kills the player, he's alive again once he spawns.
+    """
+
+    player = get_player(game_event.get_int('userid'))
+    if player:
+        players.set_team(player, game_event.get_int('team'))
+        players.set_alive(player, False)
+
+
 @Event
 def player_spawn(game_event):
     """Creates new players and saves existing players' data.
 
+    Saving is skipped when the data is saved by the group commit.
     Also executes spawn skills and shows current exp/level progress.
     """
 
@@ -170,8 +262,9 @@ def player_spawn(game_event):
     # If the player was found
     if player:
 
-        # Save his data
-        save_player_data(database_path, player)
+        # Queue his data to be saved
+        if not group_commit:
+            save_queue.put_player(player)
 
     # If the player wasn't found
     else:
@@ -179,6 +272,10 @@ def player_spawn(game_event):
         # Create a new player
         player = create_player(userid)
 
+    # Only players on a playing team are alive after spawning
+    players.set_team(player, player.team)
+    players.set_alive(player, player.team > 1)
+
     # Show current exp and level
     translation = get_translation(player.lang_key, 'other', 'hero_status')
     cmdlib.tell(player, translation.format(
@@ -200,6 +297,7 @@ def player_death(game_event):
     defender = get_player(game_event.get_int('userid'))
     attacker = get_player(game_event.get_int('attacker'))
     assister = get_player(game_event.get_int('assister'))
+    players.set_alive(defender, False)
 
     # Create the event arguments dict
     eargs = {
@@ -243,15 +341,23 @@ def player_death(game_event):
         give_exp(assister, 'assist')
         give_gold(assister, 'assist')
 
+    # Reset defender's cooldowns
+    if reset_cooldowns_on_death:
+        hero = defender.hero
+        cooldowns.reset(*chain(hero.passives, hero.skills, hero.items))
+
     # Finally, remove defender's items
     for item in defender.hero.items:
         if not item.permanent:
             defender.hero.items.remove(item)
 
 
-@Event
+@hook_events.handler('on_attack', 'on_defend')
 def player_hurt(game_event):
-    """Executes attack and defend skills."""
+    """Executes attack and defend skills.
+
+    Only subscribed to when some skill or item has either hook.
+    """
 
     # Get defender and attacker
     defender = get_player(game_event.get_int('userid'))
@@ -271,9 +377,12 @@ def player_hurt(game_event):
     defender.hero.execute_skills('on_defend', player=defender, **eargs)
 
 
-@Event
+@hook_events.handler('on_jump')
 def player_jump(game_event):
-    """Executes jump skills."""
+    """Executes jump skills.
+
+    Only subscribed to when some skill or item has the hook.
+    """
 
     player = get_player(game_event.get_int('userid'))
     player.hero.execute_skills('on_jump', player=player)
@@ -306,28 +415,49 @@ def player_say(game_event):
     player.hero.execute_skills('on_say', player=player, text=text)
         
 
+@Event
+def round_start(game_event):
+    """Marks the playing teams alive and resets cooldowns when enabled.
+
+    Everyone on a playing team spawns as the round starts, but their
+    player_spawn events might not have fired yet when the first skills
+    look for the enemies alive.
+    """
+
+    for team in (2, 3):
+        for player in players.team(team):
+            players.set_alive(player, True)
+
+    if reset_cooldowns_on_round_start:
+        cooldowns.clear()
+
+
 @Event
 def round_end(game_event):
-    """Give exp from round win and loss."""
+    """Give exp from round win and loss.
+
+    Also saves all the players' data when group commit is enabled and
+    starts reloading the leaderboards in the background.
+    """
 
     # Get the winning team
     winner = game_event.get_int('winner')
 
-    # Loop through all the players' userids
-    for userid in PlayerIter(is_filters=('ct', 't'), return_types='userid'):
+    # Loop through both teams' players
+    for team in (2, 3):
 
-        # Get the player
-        player = get_player(userid)
+        # Give the winners win exp and gold, the others loss exp and gold
+        key = 'round_win' if team == winner else 'round_loss'
+        for player in players.team(team):
+            give_exp(player, key)
+            give_gold(player, key)
 
-        # Give player win exp and gold
-        if player.get_team() == winner:
-            give_exp(player, 'round_win')
-            give_gold(player, 'round_win')
+    # Save everyone's data in a single transaction
+    if group_commit:
+        save_queue.put_players(players)
 
-        # Or loss exp and gold
-        else:
-            give_exp(player, 'round_loss')
-            give_gold(player, 'round_loss')
+    # Refresh the leaderboards once per round
+    leaderboard_cache.refresh()
 
 
 @Event
@@ -373,3 +503,84 @@ def hostage_rescued(game_event):
     player = get_player(game_event.get_int('userid'))
     give_exp(player, 'hostage_rescue')
     give_team_exp(player, 'hostage_rescue_team')
+
+
+# ======================================================================
+# >> SERVER COMMANDS
+# ======================================================================
+
+@ServerCommand('hw_export')
+def hw_export(command):
+    """Exports every player's data into a file.
+
+    Usage: hw_export <path>
+    Online players' data gets saved first. Waiting for the save and
+    the export run in a background thread, so a locked database never
+    blocks the server.
+    """
+
+    if command.get_arg_count() < 2:
+        engine_server.log_print('Usage: hw_export <path>\n')
+        return
+    path = command.get_arg(1)
+    save_queue.put_players(players)
+
+    def export():
+        flushed = save_queue.flush()
+        return 'Exported {0} players{1}.'.format(
+            export_players(database_path, path),
+            '' if flushed else ', some without their latest changes')
+
+    _run_in_background(export)
+
+
+@ServerCommand('hw_import')
+def hw_import(command):
+    """Imports players' data from a file written by hw_export.
+
+    Usage: hw_import <path> [overwrite|keep_higher|sum_gold]
+    Players whose data is in use are skipped, including the ones who
+    connect while the import runs, as their data would overwrite the
+    imported data once saved. Departed players' cached data could get
+    outdated, so the reconnect cache is cleared. The import runs in
+    a background thread.
+    """
+
+    global _import_excluded
+    if command.get_arg_count() < 2:
+        engine_server.log_print(
+            'Usage: hw_import <path> [overwrite|keep_higher|sum_gold]\n')
+        return
+    if _import_excluded is not None:
+        engine_server.log_print('Hero Wars is already importing.\n')
+        return
+    path = command.get_arg(1)
+    policy = 'keep_higher'
+    if command.get_arg_count() > 2:
+        policy = command.get_arg(2)
+    reconnect_cache.clear()
+    excluded = _import_excluded = active_steamids()
+
+    def import_():
+        global _import_excluded
+        try:
+            return 'Imported {0} players, skipped {1}.'.format(
+                *import_players(database_path, path, policy, exclude=excluded))
+        finally:
+            _import_excluded = None
+
+    _run_in_background(import_)
+
+
+def _run_in_background(task):
+    """Runs a task in a thread and logs its result or traceback."""
+
+    def run():
+        try:
+            engine_server.log_print(task() + '\n')
+        except Exception:
+            engine_server.log_print(traceback.format_exc())
+
+    thread = threading.Thread(
+        target=run, name='herowars-transfer', daemon=True)
+    thread.start()
@@ -0,0 +1,321 @@
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Hero Wars
+from herowars.database import apply_deltas
+
+from herowars.configs import journal_path
+from herowars.configs import journal_compact_size
+
+# Python
+import os
+import struct
+import threading
+import time
+
+from collections import namedtuple
+
+
+# ======================================================================
+# >> ALL DECLARATION
+# ======================================================================
+
+__all__ = (
+    'JournalRecord',
+    'Journal',
+    'journal'
+)
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Record kinds
+_DELTA = b'D'
+_CHECKPOINT = b'C'
+
+# Record layout: kind, seq, steamid length, cls_id length, steamid,
+# cls_id and for deltas: exp delta, gold delta, timestamp
+_HEADER = struct.Struct('<cQBB')
+_DELTA_BODY = struct.Struct('<qqd')
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+# A single record read from the journal
+JournalRecord = namedtuple('JournalRecord', (
+    'kind', 'seq', 'steamid', 'cls_id', 'exp', 'gold', 'timestamp'))
+
+
+class Journal(object):
+    """Append-only journal of players' exp and gold changes.
+
+    Every exp and gold gain is appended into the journal as a small
+    binary delta record, which is much cheaper than saving the player.
+    Once a player's data has been saved into the database, a checkpoint
+    record marks his deltas up to that point as saved. After a crash
+    the unsaved deltas get replayed into the database.
+
+    Exp deltas are checkpointed per (steamid, hero cls_id) and gold
+    deltas per (steamid, '') as that's how they're saved.
+
+    Attributes:
+        path: Path to the journal file, None to disable the journal
+        compact_size: File size in bytes after which to compact
+        seq: Sequence number of the latest record
+    """
+
+    def __init__(self, path, compact_size=journal_compact_size):
+        """Initializes a new journal.
+
+        Args:
+            path: Path to the journal file, None to disable the journal
+            compact_size: File size in bytes after which to compact
+        """
+
+        self.path = path
+        self.compact_size = compact_size
+        self.seq = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+        # Held while compacting, so compactions never overlap
+        self._compact_lock = threading.Lock()
+
+    def open(self):
+        """Opens the journal file for appending."""
+
+        if self.path is None or self._file is not None:
+            return
+        for record in self.read():
+            self.seq = max(self.seq, record.seq)
+        self._file = open(self.path, 'ab')
+
+    def close(self):
+        """Compacts and closes the journal file."""
+
+        if self._file is None:
+            return
+        self.compact()
+        with self._lock:
+            self._file.close()
+            self._file = None
+
+    def record(self, steamid, cls_id, exp=0, gold=0):
+        """Appends an exp and gold delta into the journal.
+
+        Does nothing while the journal is closed.
+
+        Args:
+            steamid: Steamid of the player
+            cls_id: Class id of the player's current hero
+            exp: Amount of exp gained by the hero
+            gold: Amount of gold gained by the player
+        """
+
+        if self._file is None:
+            return
+        with self._lock:
+            self.seq += 1
+            self._write(_DELTA, self.seq, steamid, cls_id,
+                _DELTA_BODY.pack(exp, gold, time.time()))
+            self._file.flush()
+
+    def checkpoint(self, checkpoints):
+        """Marks deltas as saved into the database.
+
+        Compacts the journal if it has grown too big.
+
+        Args:
+            checkpoints: Iterable of (steamid, cls_id, seq) tuples,
+                cls_id being '' for player's gold
+        """
+
+        if self._file is None:
+            return
+        with self._lock:
+            for steamid, cls_id, seq in checkpoints:
+                self._write(_CHECKPOINT, seq, steamid, cls_id)
+            self._file.flush()
+            size = self._file.tell()
+        if size >= self.compact_size:
+            self.compact()
+
+    def read(self):
+        """Reads the records from the journal file.
+
+        Stops at the first incomplete record, which may have been left
+        by a crash in the middle of a write.
+
+        Yields:
+            JournalRecords in the order they were written
+        """
+
+        if self.path is None or not os.path.isfile(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        yield from _read_records(data)
+
+    def unsaved_deltas(self):
+        """Gets the deltas which haven't been checkpointed.
+
+        Returns:
+            List of delta JournalRecords with their already saved
+            exp or gold zeroed
+        """
+
+        return _unsaved_deltas(list(self.read()))
+
+    def replay(self, database_file):
+        """Replays the unsaved deltas into the database.
+
+        Must be called before opening the journal. Empties the journal
+        file once the deltas have been saved.
+
+        Args:
+            database_file: Path to the database file
+        """
+
+        exp_deltas = {}
+        gold_deltas = {}
+        for record in self.unsaved_deltas():
+            if record.exp:
+                key = record.steamid, record.cls_id
+                exp_deltas[key] = exp_deltas.get(key, 0) + record.exp
+            if record.gold:
+                gold, _ = gold_deltas.get(record.steamid, (0, None))
+                gold_deltas[record.steamid] = (
+                    gold + record.gold, record.cls_id)
+        if exp_deltas or gold_deltas:
+            apply_deltas(database_file, exp_deltas, gold_deltas)
+        if self.path is not None and os.path.isfile(self.path):
+            open(self.path, 'wb').close()
+
+    def compact(self):
+        """Rewrites the journal file without any saved deltas.
+
+        The file gets read and its unsaved deltas written into a new
+        file without holding the lock, so record() never waits for it.
+        The lock is only held to copy whatever got written meanwhile
+        into the new file and to swap it in.
+        """
+
+        with self._compact_lock:
+            with self._lock:
+                if self._file is None:
+                    return
+                self._file.flush()
+                size = self._file.tell()
+            with open(self.path, 'rb') as f:
+                data = f.read(size)
+            with open(self.path + '.tmp', 'wb') as f:
+                for record in _unsaved_deltas(list(_read_records(data))):
+                    f.write(_pack(_DELTA, record.seq, record.steamid,
+                        record.cls_id, _DELTA_BODY.pack(
+                            record.exp, record.gold, record.timestamp)))
+                with self._lock:
+                    self._file.flush()
+                    with open(self.path, 'rb') as old:
+                        old.seek(size)
+                        f.write(old.read())
+                    f.close()
+                    self._file.close()
+                    os.replace(self.path + '.tmp', self.path)
+                    self._file = open(self.path, 'ab')
+
+    def _write(self, kind, seq, steamid, cls_id, body=b''):
+        """Writes a record into the journal file.
+
+        Must be called while holding the lock.
+        """
+
+        self._file.write(_pack(kind, seq, steamid, cls_id, body))
+
+
+# ======================================================================
+# >> FUNCTIONS
+# ======================================================================
+
+def _read_records(data):
+    """Reads the records from the contents of a journal file.
+
+    Stops at the first incomplete record.
+
+    Args:
+        data: Bytes read from the journal file
+
+    Yields:
+        JournalRecords in the order they were written
+    """
+
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        kind, seq, steamid_len, cls_id_len = _HEADER.unpack_from(
+            data, offset)
+        offset += _HEADER.size
+        body_size = _DELTA_BODY.size if kind == _DELTA else 0
+        end = offset + steamid_len + cls_id_len + body_size
+        if end > len(data):
+            return
+        steamid = data[offset:offset + steamid_len].decode()
+        offset += steamid_len
+        cls_id = data[offset:offset + cls_id_len].decode()
+        offset += cls_id_len
+        exp = gold = timestamp = 0
+        if kind == _DELTA:
+            exp, gold, timestamp = _DELTA_BODY.unpack_from(data, offset)
+        offset = end
+        yield JournalRecord(
+            kind, seq, steamid, cls_id, exp, gold, timestamp)
+
+
+def _unsaved_deltas(records):
+    """Gets the deltas of records which haven't been checkpointed.
+
+    Args:
+        records: List of JournalRecords
+
+    Returns:
+        List of delta JournalRecords with their already saved
+        exp or gold zeroed
+    """
+
+    saved = {}
+    for record in records:
+        if record.kind == _CHECKPOINT:
+            key = record.steamid, record.cls_id
+            saved[key] = max(saved.get(key, 0), record.seq)
+    deltas = []
+    for record in records:
+        if record.kind != _DELTA:
+            continue
+        if record.seq <= saved.get((record.steamid, record.cls_id), 0):
+            record = record._replace(exp=0)
+        if record.seq <= saved.get((record.steamid, ''), 0):
+            record = record._replace(gold=0)
+        if record.exp or record.gold:
+            deltas.append(record)
+    return deltas
+
+
+def _pack(kind, seq, steamid, cls_id, body=b''):
+    """Packs a record into bytes."""
+
+    steamid = steamid.encode()
+    cls_id = cls_id.encode()
+    return b''.join((
+        _HEADER.pack(kind, seq, len(steamid), len(cls_id)),
+        steamid, cls_id, body
+    ))
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+journal = Journal(journal_path)
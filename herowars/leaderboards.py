@@ -0,0 +1,274 @@
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Hero Wars
+from herowars.database import SQLiteBackend
+from herowars.database import open_database
+
+from herowars.configs import database_path
+from herowars.configs import leaderboard_size
+
+# Python
+from concurrent.futures import ThreadPoolExecutor
+
+
+# ======================================================================
+# >> ALL DECLARATION
+# ======================================================================
+
+__all__ = (
+    'Leaderboard',
+    'LeaderboardCache',
+    'total_level_board',
+    'gold_board',
+    'hero_level_board',
+    'leaderboards',
+    'leaderboard_cache'
+)
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+class Leaderboard(object):
+    """Ranking of players by a score stored in the database.
+
+    The scores are read from indexed columns which the database keeps
+    up to date on every save, so top-N and rank queries never have to
+    scan or sort all the players. Only the saved data gets ranked,
+    changes still waiting in the save queue show up once written.
+
+    Leaderboards are only available with the SQLite backend, other
+    backends have nothing to rank.
+
+    Attributes:
+        name: Name of the leaderboard, also its translation key
+        table: Table holding the scores
+        column: Column of the scores
+        per_hero: Are the scores ranked per hero class
+    """
+
+    def __init__(self, name, table, column, per_hero=False):
+        """Initializes a new leaderboard.
+
+        Args:
+            name: Name of the leaderboard, also its translation key
+            table: Table holding the scores
+            column: Column of the scores
+            per_hero: Are the scores ranked per hero class
+        """
+
+        self.name = name
+        self.table = table
+        self.column = column
+        self.per_hero = per_hero
+        where = 'WHERE hero_id=?' if per_hero else ''
+        self._top = (
+            'SELECT steamids.steamid, {1} FROM {0} '
+            'JOIN steamids ON steamids.id={0}.player_id {2} '
+            'ORDER BY {1} DESC, player_id LIMIT ? OFFSET ?'
+        ).format(table, column, where)
+        self._score = 'SELECT {1} FROM {0} WHERE player_id=? {2}'.format(
+            table, column, 'AND hero_id=?' if per_hero else '')
+        self._rank = 'SELECT COUNT(*) FROM {0} WHERE {1}>? {2}'.format(
+            table, column, 'AND hero_id=?' if per_hero else '')
+
+    def top(self, database_file, limit=10, offset=0, cls_id=None):
+        """Gets the players with the highest scores.
+
+        Args:
+            database_file: Path to the database file
+            limit: Maximum amount of players to get
+            offset: Amount of top players to skip
+            cls_id: Class id of the hero to rank, for per hero boards
+
+        Returns:
+            List of (steamid, score) tuples, highest score first
+        """
+
+        storage = open_database(database_file)
+        if not isinstance(storage, SQLiteBackend):
+            return []
+        connection = storage.connection
+        params = (limit, offset)
+        if self.per_hero:
+            hero_id = storage.manager.classes.find(connection, cls_id)
+            if hero_id is None:
+                return []
+            params = (hero_id, ) + params
+        return connection.execute(self._top, params).fetchall()
+
+    def rank(self, database_file, steamid, cls_id=None):
+        """Gets a player's rank on the leaderboard.
+
+        Players with equal scores share the same rank.
+
+        Args:
+            database_file: Path to the database file
+            steamid: Steamid of the player
+            cls_id: Class id of the hero to rank, for per hero boards
+
+        Returns:
+            Tuple of (rank, score) or None if the player isn't ranked
+        """
+
+        storage = open_database(database_file)
+        if not isinstance(storage, SQLiteBackend):
+            return None
+        connection = storage.connection
+        manager = storage.manager
+        params = (manager.steamids.find(connection, steamid), )
+        if params[0] is None:
+            return None
+        if self.per_hero:
+            params += (manager.classes.find(connection, cls_id), )
+            if params[1] is None:
+                return None
+        row = connection.execute(self._score, params).fetchone()
+        if row is None:
+            return None
+        score = row[0]
+        higher = connection.execute(
+            self._rank, (score, ) + params[1:]).fetchone()[0]
+        return higher + 1, score
+
+
+class LeaderboardCache(object):
+    """Leaderboards' top players and ranks loaded in the background.
+
+    The queries never run on the game thread, where they could block
+    on a database locked by another server. The first request of a top
+    list or a rank starts loading it in a background thread and returns
+    None, later requests return the loaded result. Once per round the
+    loaded top lists get reloaded in the background, the old lists
+    being returned until then, and the ranks get dropped.
+
+    Attributes:
+        database_file: Path to the database file
+        size: Amount of players loaded per top list
+    """
+
+    def __init__(self, database_file, size):
+        """Initializes a new empty cache.
+
+        Args:
+            database_file: Path to the database file
+            size: Amount of players loaded per top list
+        """
+
+        self.database_file = database_file
+        self.size = size
+
+        # Results, pending loads and (function, args) tuples of the
+        # loads, keyed by ('top', board name, cls_id) and
+        # ('rank', board name, cls_id, steamid) tuples
+        self._results = {}
+        self._futures = {}
+        self._loads = {}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    @property
+    def available(self):
+        """Returns True if the storage backend has leaderboards."""
+
+        return isinstance(open_database(self.database_file), SQLiteBackend)
+
+    def top(self, board, cls_id=None):
+        """Gets the players with the highest scores on a leaderboard.
+
+        Args:
+            board: Leaderboard to get the players of
+            cls_id: Class id of the hero to rank, for per hero boards
+
+        Returns:
+            List of (steamid, score) tuples or None while loading
+        """
+
+        return self._get(
+            ('top', board.name, cls_id),
+            board.top, self.database_file, self.size, 0, cls_id)
+
+    def rank(self, board, steamid, cls_id=None):
+        """Gets a player's rank on a leaderboard.
+
+        Args:
+            board: Leaderboard to get the rank from
+            steamid: Steamid of the player
+            cls_id: Class id of the hero to rank, for per hero boards
+
+        Returns:
+            Tuple of (rank, score) or None if the player isn't ranked
+            or it's still loading
+        """
+
+        return self._get(
+            ('rank', board.name, cls_id, steamid),
+            board.rank, self.database_file, steamid, cls_id)
+
+    def refresh(self):
+        """Starts reloading the loaded top lists and drops the ranks."""
+
+        for key in tuple(self._loads):
+            if key[0] == 'rank':
+                self._discard(key)
+            elif key not in self._futures:
+                function, args = self._loads[key]
+                self._futures[key] = self._executor.submit(function, *args)
+
+    def clear(self):
+        """Drops all the results and pending loads."""
+
+        for key in tuple(self._loads):
+            self._discard(key)
+
+    def _get(self, key, function, *args):
+        """Gets a loaded result, starting to load it if needed.
+
+        Args:
+            key: Key of the result
+            function: Function loading the result
+            args: Arguments for the function
+
+        Returns:
+            The result or None while loading
+        """
+
+        future = self._futures.get(key)
+        if future is not None and future.done():
+            del self._futures[key]
+            if not future.cancelled() and future.exception() is None:
+                self._results[key] = future.result()
+        if key in self._results:
+            return self._results[key]
+        if key not in self._futures:
+            self._loads[key] = (function, args)
+            self._futures[key] = self._executor.submit(function, *args)
+        return None
+
+    def _discard(self, key):
+        """Drops a result and cancels its pending load."""
+
+        future = self._futures.pop(key, None)
+        if future is not None:
+            future.cancel()
+        self._results.pop(key, None)
+        self._loads.pop(key, None)
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+total_level_board = Leaderboard(
+    'leaderboard_total_level', 'player_levels', 'total_level')
+gold_board = Leaderboard('leaderboard_gold', 'players', 'gold')
+hero_level_board = Leaderboard(
+    'leaderboard_hero', 'heroes', 'level', per_hero=True)
+
+# Leaderboards shown in the leaderboards menu
+leaderboards = (total_level_board, gold_board, hero_level_board)
+
+# Leaderboards' results shown in the menus
+leaderboard_cache = LeaderboardCache(database_path, leaderboard_size)
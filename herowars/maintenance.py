@@ -0,0 +1,521 @@
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Hero Wars
+from herowars.configs import database_path
+from herowars.configs import archive_path
+from herowars.configs import archive_after_days
+from herowars.configs import class_ids_path
+
+# Python
+import argparse
+import gzip
+import importlib
+import json
+import os
+import sqlite3
+import time
+
+from collections import namedtuple
+
+
+# ======================================================================
+# >> ALL DECLARATION
+# ======================================================================
+
+__all__ = (
+    'MaintenanceReport',
+    'find_class_ids',
+    'write_class_ids',
+    'database_size',
+    'backup_database',
+    'time_queries',
+    'archive_players',
+    'prune_orphans',
+    'vacuum',
+    'run_maintenance',
+    'main'
+)
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Oldest schema version with the players' last seen timestamps,
+# the maintenance tool never upgrades the schema by itself
+_REQUIRED_VERSION = 3
+
+# Packages whose modules define the entity classes on the server
+_ENTITY_PACKAGES = ('herowars.heroes', 'herowars.items')
+
+# Queries timed before and after the maintenance
+_TIMED_QUERIES = (
+    ('load_heroes', "SELECT hero_id, level, exp FROM heroes "
+        "WHERE player_id=(SELECT MAX(player_id) FROM players)"),
+    ('load_skills', "SELECT hero_id, skill_id, level FROM skills "
+        "WHERE player_id=(SELECT MAX(player_id) FROM players)"),
+    ('top_levels', "SELECT player_id, total_level FROM player_levels "
+        "ORDER BY total_level DESC LIMIT 10"),
+    ('count_heroes', "SELECT COUNT(*) FROM heroes"),
+)
+
+_SELECT_INACTIVE = """
+INSERT INTO temp.archived
+    SELECT player_id FROM players WHERE last_seen < ?
+"""
+
+_ARCHIVE_PLAYERS = """
+SELECT players.player_id, steamids.steamid, players.gold, classes.cls_id,
+    players.last_seen
+FROM temp.archived
+JOIN players ON players.player_id = temp.archived.player_id
+JOIN steamids ON steamids.id = players.player_id
+LEFT JOIN classes ON classes.id = players.hero_id
+"""
+
+_ARCHIVE_HEROES = """
+SELECT heroes.player_id, classes.cls_id, heroes.level, heroes.exp
+FROM temp.archived
+JOIN heroes ON heroes.player_id = temp.archived.player_id
+JOIN classes ON classes.id = heroes.hero_id
+"""
+
+_ARCHIVE_SKILLS = """
+SELECT skills.player_id, heroes.cls_id, skill.cls_id, skills.level
+FROM temp.archived
+JOIN skills ON skills.player_id = temp.archived.player_id
+JOIN classes AS heroes ON heroes.id = skills.hero_id
+JOIN classes AS skill ON skill.id = skills.skill_id
+"""
+
+_DELETE_ARCHIVED = (
+    "DELETE FROM skills WHERE player_id IN temp.archived",
+    "DELETE FROM heroes WHERE player_id IN temp.archived",
+    "DELETE FROM player_levels WHERE player_id IN temp.archived",
+    "DELETE FROM players WHERE player_id IN temp.archived",
+)
+
+_PRUNE_HEROES = """
+DELETE FROM heroes WHERE hero_id NOT IN (
+    SELECT id FROM classes WHERE cls_id IN temp.valid_classes)
+"""
+
+# Also prunes the skills of heroes that have no row of their own
+_PRUNE_SKILLS = """
+DELETE FROM skills WHERE skill_id NOT IN (
+    SELECT id FROM classes WHERE cls_id IN temp.valid_classes)
+OR NOT EXISTS (
+    SELECT 1 FROM heroes WHERE heroes.player_id = skills.player_id
+        AND heroes.hero_id = skills.hero_id)
+"""
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+# Results of a maintenance run
+# > Sizes are in bytes, timings in seconds per step or per query
+# > backup: Path to the backup taken before any deletes or None
+MaintenanceReport = namedtuple('MaintenanceReport', (
+    'size_before', 'size_after', 'archived', 'pruned_heroes',
+    'pruned_skills', 'timings', 'queries_before', 'queries_after',
+    'backup'))
+
+
+# ======================================================================
+# >> FUNCTIONS
+# ======================================================================
+
+def find_class_ids(
+        class_ids_file=class_ids_path, packages=_ENTITY_PACKAGES):
+    """Finds the class ids of the entities on the server.
+
+    When Source.Python is available, the hero and item modules get
+    imported like the plugin imports them, and every entity class
+    registered by then counts, whatever its module or bases. Otherwise
+    the class ids are read from the list written by write_class_ids()
+    when Hero Wars last loaded. Disabled classes count too, so
+    disabling a hero never gets its players' rows pruned.
+
+    Args:
+        class_ids_file: Path to the list of class ids
+        packages: Names of the packages whose modules to import
+
+    Raises:
+        RuntimeError: If the modules can't be imported and there's no
+            list of class ids either
+
+    Returns:
+        Set of the class ids
+    """
+
+    try:
+        return _registered_class_ids(packages)
+    except ImportError as error:
+        if not os.path.isfile(class_ids_file):
+            raise RuntimeError(
+                "Can't import the heroes ({0}) and there's no {1}, load "
+                'Hero Wars once or run with --no-prune.'.format(
+                    error, class_ids_file)) from error
+    with open(class_ids_file, encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def write_class_ids(class_ids_file=class_ids_path):
+    """Writes the class ids of the registered entities into a list.
+
+    Called by Hero Wars when it loads, so the maintenance tool can
+    find the class ids without Source.Python.
+
+    Args:
+        class_ids_file: Path to the list of class ids
+    """
+
+    with open(class_ids_file + '.tmp', 'w', encoding='utf-8') as f:
+        for cls_id in sorted(_registered_class_ids(())):
+            f.write(cls_id + '\n')
+    os.replace(class_ids_file + '.tmp', class_ids_file)
+
+
+def _registered_class_ids(packages):
+    """Imports entity modules and gets the registered class ids.
+
+    Args:
+        packages: Names of the packages whose modules to import
+
+    Raises:
+        ImportError: If Source.Python isn't available
+
+    Returns:
+        Set of the class ids
+    """
+
+    for package_name in packages:
+        package = importlib.import_module(package_name)
+        for name in package.__all__:
+            importlib.import_module(package_name + '.' + name)
+    from herowars.entities import Entity
+    return {entity_cls.cls_id for entity_cls in Entity._registry.values()}
+
+
+def database_size(database_file):
+    """Gets the size of a database file and its write-ahead log.
+
+    Args:
+        database_file: Path to the database file
+
+    Returns:
+        Size in bytes
+    """
+
+    return sum(
+        os.path.getsize(path)
+        for path in (database_file, database_file + '-wal')
+        if os.path.isfile(path)
+    )
+
+
+def backup_database(connection, backup_file):
+    """Copies a database into a backup file.
+
+    Args:
+        connection: Connection to the database
+        backup_file: Path to the backup file, overwritten if it exists
+    """
+
+    backup = sqlite3.connect(backup_file)
+    try:
+        connection.backup(backup)
+    finally:
+        backup.close()
+
+
+def time_queries(connection, repeat=100):
+    """Times the representative queries of the plugin.
+
+    Args:
+        connection: Connection to the database
+        repeat: Times to run each query
+
+    Returns:
+        Dict of query name -> average seconds per query
+    """
+
+    timings = {}
+    for name, query in _TIMED_QUERIES:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            connection.execute(query).fetchall()
+        timings[name] = (time.perf_counter() - start) / repeat
+    return timings
+
+
+def archive_players(connection, archive_file, before, dry_run=False):
+    """Moves inactive players' data into a compressed archive.
+
+    Each player is appended into the archive as a line of JSON before
+    his rows get deleted, all while holding the database's write lock.
+
+    Args:
+        connection: Connection to the database in autocommit mode
+        archive_file: Path to the gzipped archive file
+        before: Timestamp before which players count as inactive
+        dry_run: Only count the players, changing nothing
+
+    Returns:
+        Amount of players archived, or that would be archived
+    """
+
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        connection.execute(
+            'CREATE TEMP TABLE archived (player_id INTEGER PRIMARY KEY)')
+        connection.execute(_SELECT_INACTIVE, (int(before), ))
+        players = {}
+        for player_id, steamid, gold, hero, last_seen in connection.execute(
+                _ARCHIVE_PLAYERS):
+            players[player_id] = dict(steamid=steamid, gold=gold, hero=hero,
+                last_seen=last_seen, heroes={})
+        for player_id, cls_id, level, exp in connection.execute(
+                _ARCHIVE_HEROES):
+            players[player_id]['heroes'][cls_id] = dict(
+                level=level, exp=exp, skills={})
+        for player_id, hero, cls_id, level in connection.execute(
+                _ARCHIVE_SKILLS):
+            heroes = players[player_id]['heroes']
+            if hero in heroes:
+                heroes[hero]['skills'][cls_id] = level
+
+        if dry_run:
+            connection.execute('ROLLBACK')
+            return len(players)
+        if players:
+            archived = int(time.time())
+            with gzip.open(archive_file, 'at', encoding='utf-8') as f:
+                for player in players.values():
+                    player['archived'] = archived
+                    f.write(json.dumps(player, sort_keys=True) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            for statement in _DELETE_ARCHIVED:
+                connection.execute(statement)
+        connection.execute('DROP TABLE temp.archived')
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+    return len(players)
+
+
+def prune_orphans(connection, cls_ids, dry_run=False):
+    """Deletes hero and skill rows of classes that no longer exist.
+
+    Args:
+        connection: Connection to the database in autocommit mode
+        cls_ids: Class ids of the existing heroes and skills
+        dry_run: Only count the rows, deleting nothing
+
+    Raises:
+        ValueError: If no class ids are given
+
+    Returns:
+        Tuple of the amounts of hero and skill rows deleted, or that
+        would be deleted
+    """
+
+    if not cls_ids:
+        raise ValueError('No heroes found, refusing to prune every row.')
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        connection.execute(
+            'CREATE TEMP TABLE valid_classes (cls_id TEXT PRIMARY KEY)')
+        connection.executemany(
+            'INSERT INTO temp.valid_classes VALUES (?)',
+            ((cls_id, ) for cls_id in cls_ids))
+        heroes = connection.execute(_PRUNE_HEROES).rowcount
+        skills = connection.execute(_PRUNE_SKILLS).rowcount
+
+        # Counting the rows the deletes see is exact, so undo them
+        if dry_run:
+            connection.execute('ROLLBACK')
+            return heroes, skills
+        connection.execute('DROP TABLE temp.valid_classes')
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+    return heroes, skills
+
+
+def vacuum(connection, full=False):
+    """Returns the database's free pages to the file system.
+
+    The first vacuum of a database without incremental auto vacuum
+    is always a full one, as that's when auto vacuum gets enabled.
+
+    Args:
+        connection: Connection to the database in autocommit mode
+        full: Rebuild the whole file to also defragment it
+    """
+
+    incremental = connection.execute('PRAGMA auto_vacuum').fetchone()[0]
+    if incremental != 2:
+        connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    if full or incremental != 2:
+        connection.execute('VACUUM')
+    else:
+        connection.execute('PRAGMA incremental_vacuum').fetchall()
+    connection.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    connection.execute('PRAGMA optimize')
+
+
+def run_maintenance(
+        database_file=database_path, archive_file=archive_path,
+        days=archive_after_days, prune=True, full_vacuum=False,
+        dry_run=False, backup_file='', class_ids_file=class_ids_path):
+    """Archives, prunes and vacuums a database.
+
+    Before anything gets deleted the database is copied into a backup
+    file, so a bad archive or prune can be undone by restoring it.
+
+    Args:
+        database_file: Path to the database file
+        archive_file: Path to the archive file, None to skip archiving
+        days: Days of inactivity after which players get archived
+        prune: Prune the rows of heroes and skills that no longer exist
+        full_vacuum: Rebuild the whole file instead of only truncating
+        dry_run: Only count what would be archived and pruned, without
+            backing up, deleting or vacuuming anything
+        backup_file: Path to the backup file, None to skip the backup
+            and an empty string for the database's path with ".bak"
+        class_ids_file: Path to the list of class ids used for pruning
+            without Source.Python
+
+    Raises:
+        RuntimeError: If the database's schema is too old or missing,
+            or if the existing heroes can't be found for pruning
+
+    Returns:
+        MaintenanceReport of the run
+    """
+
+    if not os.path.isfile(database_file):
+        raise RuntimeError('No database at {0}.'.format(database_file))
+    size_before = database_size(database_file)
+    connection = sqlite3.connect(
+        database_file, timeout=5, isolation_level=None)
+    try:
+        version = connection.execute('PRAGMA user_version').fetchone()[0]
+        if version < _REQUIRED_VERSION:
+            raise RuntimeError(
+                'Database schema version {0} is older than {1}, load Hero '
+                'Wars once to upgrade it.'.format(version, _REQUIRED_VERSION))
+        # Find the heroes before touching anything, in case it fails
+        cls_ids = find_class_ids(class_ids_file) if prune else None
+        queries_before = time_queries(connection)
+        timings = {}
+        archived = pruned_heroes = pruned_skills = 0
+
+        if dry_run or (archive_file is None and not prune):
+            backup_file = None
+        elif backup_file == '':
+            backup_file = database_file + '.bak'
+        if backup_file is not None:
+            start = time.perf_counter()
+            backup_database(connection, backup_file)
+            timings['backup'] = time.perf_counter() - start
+        if archive_file is not None:
+            start = time.perf_counter()
+            archived = archive_players(
+                connection, archive_file, time.time() - days * 86400,
+                dry_run)
+            timings['archive'] = time.perf_counter() - start
+        if prune:
+            start = time.perf_counter()
+            pruned_heroes, pruned_skills = prune_orphans(
+                connection, cls_ids, dry_run)
+            timings['prune'] = time.perf_counter() - start
+        if not dry_run:
+            start = time.perf_counter()
+            vacuum(connection, full_vacuum)
+            timings['vacuum'] = time.perf_counter() - start
+
+        queries_after = time_queries(connection)
+    finally:
+        connection.close()
+    return MaintenanceReport(
+        size_before, database_size(database_file), archived, pruned_heroes,
+        pruned_skills, timings, queries_before, queries_after,
+        backup_file)
+
+
+def main(args=None):
+    """Runs the maintenance from the command line and prints a report.
+
+    Args:
+        args: Command line arguments, None for sys.argv
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='python -m herowars.maintenance',
+        description='Archive, prune and compact the Hero Wars database.')
+    parser.add_argument('--database', default=database_path,
+        help='path to the database file')
+    parser.add_argument('--archive', default=archive_path,
+        help='path to the gzipped archive of inactive players')
+    parser.add_argument('--classes', default=class_ids_path,
+        help='path to the class ids written when Hero Wars loads, used '
+            'for pruning without Source.Python')
+    parser.add_argument('--days', type=int, default=archive_after_days,
+        help='days of inactivity after which players get archived')
+    parser.add_argument('--no-archive', action='store_true',
+        help="don't archive inactive players")
+    parser.add_argument('--no-prune', action='store_true',
+        help="don't prune heroes and skills that no longer exist")
+    parser.add_argument('--full-vacuum', action='store_true',
+        help='rebuild the whole database file')
+    parser.add_argument('--dry-run', action='store_true',
+        help='only print what would be archived and pruned')
+    parser.add_argument('--backup', default='',
+        help='path to the backup taken before deleting anything '
+            '(default: the database path with ".bak")')
+    parser.add_argument('--no-backup', action='store_true',
+        help="don't back up the database before deleting anything")
+    args = parser.parse_args(args)
+    archive_file = None if args.no_archive else args.archive
+    prune = not args.no_prune
+
+    # Always show what's about to go before anything gets deleted
+    counts = run_maintenance(
+        args.database, archive_file, args.days, prune, dry_run=True,
+        class_ids_file=args.classes)
+    print('Players to archive: {0}'.format(counts.archived))
+    print('Rows to prune: {0} heroes, {1} skills'.format(
+        counts.pruned_heroes, counts.pruned_skills))
+    if args.dry_run:
+        return
+
+    report = run_maintenance(
+        args.database, archive_file, args.days, prune, args.full_vacuum,
+        backup_file=None if args.no_backup else args.backup,
+        class_ids_file=args.classes)
+    if report.backup is not None:
+        print('Backup: {0}'.format(report.backup))
+    print('Size: {0} -> {1} bytes'.format(
+        report.size_before, report.size_after))
+    print('Archived players: {0}'.format(report.archived))
+    print('Pruned rows: {0} heroes, {1} skills'.format(
+        report.pruned_heroes, report.pruned_skills))
+    for step, seconds in report.timings.items():
+        print('{0}: {1:.3f} s'.format(step.capitalize(), seconds))
+    for name, _ in _TIMED_QUERIES:
+        print('Query {0}: {1:.3f} -> {2:.3f} ms'.format(
+            name, report.queries_before[name] * 1000,
+            report.queries_after[name] * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,9 @@ from herowars.entities import Item
 
 from herowars.player import get_player
 
-from herowars.tools import find_element
+from herowars.leaderboards import leaderboards
+from herowars.leaderboards import leaderboard_cache
+
 from herowars.tools import find_elements
 
 from herowars.translations import get_translation
@@ -27,8 +29,6 @@ from menus import Text
 
 from menus.base import _translate_text
 
-from players.helpers import userid_from_index
-
 
 # ======================================================================
 # >> CLASSES
@@ -160,7 +160,7 @@ class HwPagedMenu(PagedMenu):
 def main_menu(ply_index):
     """Main menu for navigating between other Hero Wars menus."""
 
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
 
     menu = SimpleMenu()
     menu.select_callback = _main_menu_callback
@@ -172,8 +172,13 @@ def main_menu(ply_index):
         Option(get_translation(player.lang_key, 'menus', 'current_hero'), 3),
         Option(get_translation(player.lang_key, 'menus', 'buy_items'), 4),
         Option(get_translation(player.lang_key, 'menus', 'sell_items'), 5),
-        Text('0. Close')
     ])
+
+    # Only the SQLite backend has leaderboards
+    if leaderboard_cache.available:
+        menu.append(Option(
+            get_translation(player.lang_key, 'menus', 'leaderboards'), 6))
+    menu.append(Text('0. Close'))
     return menu
 
 
@@ -191,6 +196,8 @@ def _main_menu_callback(menu, ply_index, choice):
         item_categories_menu(ply_index).send(ply_index)
     elif choice.value == 5:
         sell_items_menu(ply_index).send(ply_index)
+    elif choice.value == 6:
+        leaderboards_menu(ply_index).send(ply_index)
 
 
 # ======================================================================
@@ -205,7 +212,7 @@ def buy_hero_menu(ply_index):
     about the skills and a buy option.
     """
 
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     menu = HwPagedMenu(
         title=get_translation(player.lang_key, 'menus', 'buy_heroes'), 
         select_callback=_buy_hero_menu_callback
@@ -215,7 +222,7 @@ def buy_hero_menu(ply_index):
     # Get all heroes not owned by player
     heroes = (
         hero_cls for hero_cls in Hero.get_subclasses()
-        if not find_element(player.heroes, 'cls_id', hero_cls.cls_id)
+        if hero_cls.cls_id not in player.heroes
     )
 
     for hero_cls in heroes:
@@ -256,28 +263,24 @@ def item_categories_menu(ply_index):
     Choosing a category will open a new menu
     with items of chosen category in it.
     """
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     menu = HwPagedMenu(
         title=get_translation(player.lang_key, 'menus', 'item_categories'), 
         select_callback=_item_categories_menu_callback
     )
     menu.option8 = Option('Back', main_menu)
 
-    items = (
-        item for item in Item.get_subclasses()
-        if (len(tuple(find_elements(player.hero.items, 'cls_id', item.cls_id))) 
-            < item.limit) or item.limit <= 0
-    )
-    categories = set()
-    for item in items:
-        # Check if player can use the item
-        if item.allowed_users and player.steamid not in item.allowed_users:
-            continue
-        if item.category not in categories:
-            categories.add(item.category)
-
-    for category in categories:
-        menu.append(Option(category, category))
+    for category, items in Item.get_categories().items():
+        for item in items:
+            # Check if player can buy and use the item
+            owned = len(tuple(
+                find_elements(player.hero.items, 'cls_id', item.cls_id)))
+            if 0 < item.limit <= owned:
+                continue
+            if item.allowed_users and player.steamid not in item.allowed_users:
+                continue
+            menu.append(Option(category, category))
+            break
 
     if not menu:
         cmdlib.tell(player, get_translation(
@@ -291,7 +294,7 @@ def _item_categories_menu_callback(menu, ply_index, choice):
 
     Sends player a menu of items in chosen category
     """
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     buy_items_menu(ply_index, choice.value).send(ply_index)
 
 
@@ -305,7 +308,7 @@ def buy_items_menu(ply_index, chosen_category='Default'):
     will immediately buy it.
     """
 
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     menu = HwPagedMenu(
         title=get_translation(player.lang_key, 'menus', 'buy_items'), 
         select_callback=_buy_items_menu_callback
@@ -314,7 +317,7 @@ def buy_items_menu(ply_index, chosen_category='Default'):
     menu.chosen_category = chosen_category
 
     items = (
-        item for item in Item.get_subclasses()
+        item for item in Item.get_categories().get(chosen_category, ())
         if (len(tuple(find_elements(player.hero.items, 'cls_id', item.cls_id))) 
             < item.limit) or item.limit <= 0
     )
@@ -323,13 +326,12 @@ def buy_items_menu(ply_index, chosen_category='Default'):
         # Check if player can use the item
         if item.allowed_users and player.steamid not in item.allowed_users:
             continue
-        if item.category == chosen_category:
-            menu.append(Option('{name} (buy ${cost})\n{description})'.format(
-                name=item.name, 
-                cost=item.cost, 
-                description=item.description), 
-                item
-            ))
+        menu.append(Option('{name} (buy ${cost})\n{description})'.format(
+            name=item.name, 
+            cost=item.cost, 
+            description=item.description), 
+            item
+        ))
 
     if not menu:
         cmdlib.tell(player, get_translation(
@@ -345,7 +347,7 @@ def _buy_items_menu_callback(menu, ply_index, choice):
     Buys the selected item and adds it to player's hero's inventory.
     """
 
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     item_cls = choice.value
     chosen_category = menu.chosen_category
 
@@ -390,22 +392,22 @@ def owned_heroes_menu(ply_index):
     in new Hero Info -menu with option to change the hero as active one.
     """
 
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     menu = HwPagedMenu(
         title=get_translation(player.lang_key, 'menus', 'owned_heroes'), 
         select_callback=_owned_heroes_menu_callback
     )
     menu.option8 = Option('Back', main_menu)
 
-    # Add all player's heroes to the menu
-    for hero in player.heroes:
+    # Add all player's heroes to the menu without building them
+    for hero_cls, level in player.heroes.levels():
         menu.append(
             Option('{name} ({current_level}/{max_level})'.format(
-                    name=hero.name, 
-                    current_level=hero.level,
-                    max_level=hero.max_level
+                    name=hero_cls.name, 
+                    current_level=level,
+                    max_level=hero_cls.max_level
                 ), 
-                hero
+                hero_cls
             )
         )
 
@@ -423,7 +425,9 @@ def _owned_heroes_menu_callback(menu, ply_index, choice):
     Sends the Hero Info -menu instance of selected hero to the player.
     """
 
-    owned_hero_info_menu(ply_index, choice.value).send(ply_index)
+    player = get_player(ply_index, 'index')
+    hero = player.heroes.get(choice.value.cls_id)
+    owned_hero_info_menu(ply_index, hero).send(ply_index)
 
 
 # ======================================================================
@@ -437,7 +441,7 @@ def sell_items_menu(ply_index):
     Choosing an item will immediately sell it.
     """
 
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     menu = HwPagedMenu(
         title=get_translation(player.lang_key, 'menus', 'sell_items'), 
         select_callback=_sell_items_menu_callback
@@ -467,7 +471,7 @@ def _sell_items_menu_callback(menu, ply_index, choice):
     Sells the selected item.
     """
 
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     item = choice.value
     player.hero.items.remove(item)
     player.cash += item.sell_value
@@ -497,7 +501,7 @@ def hero_info_menu(ply_index, hero_cls=None):
     hero active for the player.
     """
 
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     menu = HwPagedMenu(select_callback=_hero_info_menu_callback)
     menu.title = '{name}\n{description}\n{seperator}Price: {price}\n'.format(
         name=hero_cls.name, 
@@ -539,7 +543,7 @@ def _buy_hero(menu, ply_index, choice):
     If option 7 (slot 7) was selected then buy and change to the hero.
     """
 
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     hero = menu.selected_hero
 
     # Check if player can buy the hero
@@ -558,7 +562,7 @@ def _buy_hero(menu, ply_index, choice):
     # Buy the hero
     hero = hero()
     player.gold -= hero.cost
-    player.heroes.append(hero)
+    player.heroes.add(hero)
 
     # Change the hero automatically
     player.hero = hero
@@ -591,7 +595,7 @@ def owned_hero_info_menu(ply_index, hero=None):
     Selecting option 7 will set the selected hero active for the player.
     """
 
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     menu = HwPagedMenu(select_callback=_owned_hero_info_menu_callback)
     menu.title = '{name}\n{description}\n{seperator}Level: {level}\n'.format(
         name=hero.name, 
@@ -636,7 +640,7 @@ def _change_hero(menu, ply_index, choice):
 
     If option 7 was selected, then change to the hero.
     """ 
-    player = get_player(userid_from_index(ply_index)) 
+    player = get_player(ply_index, 'index') 
     hero = menu.selected_hero
     player.hero = hero
     translation = get_translation(
@@ -667,7 +671,7 @@ def current_hero_info_menu(ply_index):
     Selecting option 7 resets the skill points.
     """
 
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     hero = player.hero
     menu = HwPagedMenu(select_callback=_current_hero_info_menu_callback)
     menu.title = '{name}\n{seperator}Level: {level}\n'.format(
@@ -712,7 +716,7 @@ def _reset_skill_points(menu, ply_index, choice):
 
     If option 7 was selected, reset skill points and refresh the menu.
     """
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     hero = player.hero
     cmdlib.tell(player, get_translation(
         player.lang_key, 'menu_messages', 'skill_points_reset'))
@@ -730,7 +734,7 @@ def _current_hero_info_menu_callback(menu, ply_index, choice):
     If there are available skill points, level up the 
     selected skill and refresh the menu.
     """
-    player = get_player(userid_from_index(ply_index))
+    player = get_player(ply_index, 'index')
     hero = player.hero
     skill = choice.value
 
@@ -764,3 +768,101 @@ def _current_hero_info_menu_callback(menu, ply_index, choice):
     # Refresh
     menu.close()
     current_hero_info_menu(ply_index).send(ply_index)
+
+
+# ======================================================================
+# >> LEADERBOARDS -MENU
+# ======================================================================
+
+def leaderboards_menu(ply_index):
+    """Leaderboards menu.
+
+    Displays all the leaderboards, per hero leaderboards once for
+    every hero. Choosing a leaderboard opens it in a new menu.
+    """
+
+    player = get_player(ply_index, 'index')
+    menu = HwPagedMenu(
+        title=get_translation(player.lang_key, 'menus', 'leaderboards'),
+        select_callback=_leaderboards_menu_callback
+    )
+    menu.option8 = Option('Back', main_menu)
+
+    for board in leaderboards:
+        translation = get_translation(player.lang_key, 'menus', board.name)
+        if not board.per_hero:
+            menu.append(Option(translation, (board, None)))
+            continue
+        for hero_cls in Hero.get_subclasses():
+            menu.append(Option(
+                translation.format(name=hero_cls.name),
+                (board, hero_cls)
+            ))
+
+    return menu
+
+
+def _leaderboards_menu_callback(menu, ply_index, choice):
+    """Leaderboards menu callback.
+
+    Sends the chosen Leaderboard -menu instance to the player.
+    """
+
+    board, hero_cls = choice.value
+    leaderboard_menu(ply_index, board, hero_cls).send(ply_index)
+
+
+def leaderboard_menu(ply_index, board, hero_cls=None):
+    """Leaderboard menu.
+
+    Displays the top players of a leaderboard with their scores and
+    the player's own rank in the description. The results come from
+    the leaderboard cache, if they're still loading the player is told
+    to try again.
+    """
+
+    player = get_player(ply_index, 'index')
+    cls_id = hero_cls.cls_id if hero_cls is not None else None
+    translation = get_translation(player.lang_key, 'menus', board.name)
+    menu = HwPagedMenu(
+        title=translation.format(
+            name=hero_cls.name if hero_cls is not None else ''),
+        select_callback=_leaderboard_menu_callback
+    )
+    menu.option8 = Option('Back', leaderboards_menu)
+
+    # Show player's own rank
+    rank = leaderboard_cache.rank(board, player.steamid, cls_id)
+    if rank is not None:
+        translation = get_translation(player.lang_key, 'menus', 'your_rank')
+        menu.description = translation.format(rank=rank[0], score=rank[1])
+
+    # Add the top players, using online players' current names
+    top = leaderboard_cache.top(board, cls_id)
+    for position, (steamid, score) in enumerate(top or (), 1):
+        ranked = get_player(steamid, 'steamid')
+        menu.append(Option('#{position} {name} ({score})'.format(
+            position=position,
+            name=ranked.name if ranked is not None else steamid,
+            score=score
+            ),
+            None,  # No value needed for now
+            highlight=False
+        ))
+
+    if not menu:
+        cmdlib.tell(player, get_translation(
+            player.lang_key, 'menu_messages',
+            'leaderboard_loading' if top is None else 'leaderboard_empty'))
+        menu = menu.option8.value(ply_index)  # Refresh
+
+    return menu
+
+
+def _leaderboard_menu_callback(menu, ply_index, choice):
+    """Leaderboard menu callback.
+
+    Pressing the players does nothing at the moment.
+    """
+
+    pass
@@ -0,0 +1,507 @@
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Hero Wars
+from herowars.database import player_record
+from herowars.database import hero_record
+from herowars.database import save_records
+
+from herowars.journal import journal
+
+from herowars.transactions import WriteQuota
+
+from herowars.configs import database_path
+from herowars.configs import multi_server
+from herowars.configs import write_batch_rows
+from herowars.configs import write_quota
+from herowars.configs import save_attempts
+from herowars.configs import save_flush_timeout
+
+# Python
+import threading
+import traceback
+
+from collections import namedtuple
+
+# Source.Python
+from engines.server import engine_server
+
+
+# ======================================================================
+# >> ALL DECLARATION
+# ======================================================================
+
+__all__ = (
+    'SaveStats',
+    'SaveQueue',
+    'save_queue'
+)
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+# Amount of rows written and skipped by a save
+# > ticket: Sequence number to check the save with SaveQueue.saved()
+SaveStats = namedtuple('SaveStats', ('written', 'skipped', 'ticket'))
+
+
+class SaveQueue(object):
+    """Write-behind queue for saving players' data into the database.
+
+    The game thread only takes immutable snapshots of the data and
+    enqueues them, while a background worker thread writes them into
+    the database. Snapshots are coalesced per steamid so that only the
+    newest player and hero records get written, all of them in a single
+    transaction per batch. Only the rows that have changed since they
+    were last saved get snapshotted at all.
+
+    Each snapshot remembers the journal's sequence number at the time
+    it was taken, and once it has been written the journal gets
+    checkpointed up to that number.
+
+    When several servers share the database, the worker writes at most
+    max_rows rows per transaction and waits for the write quota before
+    each one, so no server holds the write lock for long.
+
+    Failed writes get retried, but after max_attempts failures in a row
+    the records are set aside as dropped. Dropped records get merged
+    back under the records of the next save, so they're written along
+    with it, and their exp and gold deltas stay in the journal until
+    then. Waiting for the writes is always bounded, so a locked or
+    broken database never blocks the game thread for good.
+
+    Attributes:
+        database_file: Path to the database file
+        journal: Journal to checkpoint after writes or None
+        retry_delay: Seconds to wait before retrying a failed write
+        max_attempts: Failed writes in a row before dropping the records
+        flush_timeout: Maximum seconds flush() and stop() wait for
+        max_rows: Maximum rows written per transaction, 0 for no limit
+        quota: WriteQuota limiting the rows written per second
+        rows_written: Total amount of changed rows enqueued
+        rows_skipped: Total amount of unchanged rows skipped
+        drops: Amount of times records have been dropped
+    """
+
+    def __init__(
+            self, database_file, journal=None, retry_delay=1.0,
+            max_rows=0, quota=0, max_attempts=save_attempts,
+            flush_timeout=save_flush_timeout):
+        """Initializes a new save queue.
+
+        Args:
+            database_file: Path to the database file
+            journal: Journal to checkpoint after writes or None
+            retry_delay: Seconds to wait before retrying a failed write
+            max_rows: Maximum rows written per transaction, 0 for no limit
+            quota: Maximum rows written per second, 0 for no limit
+            max_attempts: Failed writes in a row before dropping records
+            flush_timeout: Maximum seconds flush() and stop() wait for
+        """
+
+        self.database_file = database_file
+        self.journal = journal
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.flush_timeout = flush_timeout
+        self.max_rows = max_rows
+        self.quota = WriteQuota(quota)
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._enqueued = 0
+        self._written = 0
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.drops = 0
+
+        # Records dropped and steamids whose records haven't been
+        # written since they were dropped
+        self._dropped = {}
+        self._lost = set()
+
+    @property
+    def running(self):
+        """Returns True if the worker thread is running."""
+
+        return self._running
+
+    def start(self):
+        """Starts the worker thread."""
+
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name='herowars-save-queue', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Flushes the queue and stops the worker thread.
+
+        Waits at most flush_timeout for the flush and the worker each.
+        Records still failing to write after that get dropped.
+
+        Returns:
+            True if everything got written, False otherwise
+        """
+
+        flushed = self.flush()
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(self.flush_timeout)
+            self._thread = None
+        return flushed
+
+    def put_player(self, player):
+        """Enqueues the changes of player's and all his heroes' data.
+
+        Args:
+            player: Player whose data to save
+
+        Returns:
+            SaveStats of the rows enqueued and skipped
+        """
+
+        return self.put_players((player, ))
+
+    def put_players(self, players):
+        """Enqueues the changes of multiple players' data as one batch.
+
+        The changes get enqueued at once, so they're all written
+        into the database in the same transaction.
+
+        Args:
+            players: Players whose data to save
+
+        Returns:
+            SaveStats of the rows enqueued and skipped
+        """
+
+        return self._put([
+            (
+                player.steamid,
+                player_record(player, changed_only=True),
+                _hero_records(player.steamid, player.heroes.built()),
+                1 + _count_rows(player.heroes.built())
+            )
+            for player in players
+        ])
+
+    def put_hero(self, steamid, hero):
+        """Enqueues the changes of hero's data.
+
+        Args:
+            steamid: Steamid of the hero's owner
+            hero: Hero whose data to save
+
+        Returns:
+            SaveStats of the rows enqueued and skipped
+        """
+
+        return self._put([(
+            steamid, None, _hero_records(steamid, (hero, )),
+            _count_rows((hero, ))
+        )])
+
+    def flush(self, timeout=None):
+        """Waits until everything enqueued so far has been written.
+
+        If the worker thread is not running, the pending records get
+        written in the calling thread instead.
+
+        Args:
+            timeout: Maximum time to wait in seconds, None for
+                the queue's flush_timeout
+
+        Returns:
+            True if everything got written, False on timeout or if
+            any records got dropped meanwhile
+        """
+
+        if timeout is None:
+            timeout = self.flush_timeout
+        with self._condition:
+            if not self._running:
+                self._restore(self._dropped)
+                self._dropped = {}
+                sequence = None
+                while sequence is None:
+                    records, sequence = self._take()
+                    self._write(records)
+                    self._lost.difference_update(records)
+                self._written = sequence
+                return True
+            target = self._enqueued
+            drops = self.drops
+            self._condition.notify_all()
+            return self._condition.wait_for(
+                lambda: self._written >= target, timeout
+            ) and self.drops == drops
+
+    def saved(self, steamid, ticket):
+        """Checks if a player's save has been written.
+
+        Args:
+            steamid: Steamid of the saved player
+            ticket: Ticket of the SaveStats returned by the save
+
+        Returns:
+            True if it's been written, False if any of the player's
+            records have been dropped and not written since or None
+            if it's still pending
+        """
+
+        with self._condition:
+            if steamid in self._lost:
+                return False
+            if self._written >= ticket:
+                return True
+            return None
+
+    def _put(self, snapshots):
+        """Enqueues records, merging them with older pending records.
+
+        Any dropped records get enqueued again under the new records.
+
+        Args:
+            snapshots: Iterable of (steamid, PlayerRecord or None,
+                HeroRecords, total amount of rows) tuples
+
+        Returns:
+            SaveStats of the rows enqueued and skipped
+        """
+
+        seq = self.journal.seq if self.journal is not None else 0
+        written = skipped = 0
+        with self._condition:
+            retried = bool(self._dropped)
+            self._restore(self._dropped)
+            self._dropped = {}
+            for steamid, player_rec, hero_recs, rows in snapshots:
+                count = (player_rec is not None) + sum(
+                    1 + len(hero_rec.skills) for hero_rec in hero_recs)
+                written += count
+                skipped += rows - count
+                if player_rec is not None:
+                    self._merge(steamid, player_rec, None, seq, newer=True)
+                for hero_rec in hero_recs:
+                    self._merge(steamid, None, hero_rec, seq, newer=True)
+            self.rows_written += written
+            self.rows_skipped += skipped
+            if written or retried:
+                self._enqueued += 1
+                self._condition.notify_all()
+            ticket = self._enqueued
+        return SaveStats(written, skipped, ticket)
+
+    def _merge(
+            self, steamid, player_rec, hero_rec, seq, newer, pending=None):
+        """Merges records into the pending records.
+
+        Hero records only contain their changed skills, so the skills
+        of a merged hero record are combined from both records.
+        Must be called while holding the condition.
+
+        Args:
+            steamid: Steamid of the records' owner
+            player_rec: PlayerRecord to merge or None
+            hero_rec: HeroRecord to merge or None
+            seq: Journal's sequence number when the records were taken
+            newer: Are the records newer than the pending ones
+            pending: Records to merge into, None for the queue's
+        """
+
+        if pending is None:
+            pending = self._pending
+        entry = pending.setdefault(steamid, [None, {}, {}])
+        seqs = entry[2]
+        if player_rec is not None and (newer or entry[0] is None):
+            entry[0] = player_rec
+            seqs[''] = seq
+        if hero_rec is not None:
+            if newer or hero_rec.cls_id not in seqs:
+                seqs[hero_rec.cls_id] = seq
+            pending = entry[1].get(hero_rec.cls_id)
+            if pending is not None:
+                old, new = pending, hero_rec
+                if not newer:
+                    old, new = new, old
+                hero_rec = new._replace(
+                    skills=tuple(dict(old.skills + new.skills).items()))
+            entry[1][hero_rec.cls_id] = hero_rec
+
+    def _take(self):
+        """Takes the pending records out of the queue.
+
+        Takes whole players' records until max_rows is reached, but
+        always at least one player's. Must be called while holding
+        the condition.
+
+        Returns:
+            Tuple of the taken records and the current sequence number,
+            or None as the sequence number if records were left pending
+        """
+
+        if not self.max_rows:
+            records, self._pending = self._pending, {}
+            return records, self._enqueued
+        records = {}
+        rows = 0
+        for steamid in list(self._pending):
+            if records and rows >= self.max_rows:
+                break
+            entry = records[steamid] = self._pending.pop(steamid)
+            rows += _entry_rows(entry)
+        return records, None if self._pending else self._enqueued
+
+    def _restore(self, records, pending=None):
+        """Puts records back to the queue under any newer ones.
+
+        Must be called while holding the condition.
+
+        Args:
+            records: Records taken from the queue with _take()
+            pending: Records to put them into, None for the queue's
+        """
+
+        for steamid, (player_rec, hero_recs, seqs) in records.items():
+            if player_rec is not None:
+                self._merge(steamid, player_rec, None, seqs[''],
+                    newer=False, pending=pending)
+            for cls_id, hero_rec in hero_recs.items():
+                self._merge(steamid, None, hero_rec, seqs[cls_id],
+                    newer=False, pending=pending)
+
+    def _drop(self, records):
+        """Sets aside records that have failed to write.
+
+        Their rows' dirty flags were cleared when they were taken, so
+        they're kept until the next save instead of getting lost. The
+        journal isn't checkpointed, so it keeps the records' exp and
+        gold meanwhile. Must be called while holding the condition.
+
+        Args:
+            records: Records taken from the queue with _take()
+        """
+
+        dropped, self._dropped = self._dropped, records
+        self._restore(dropped, self._dropped)
+        self._lost.update(records)
+        self.drops += 1
+        engine_server.log_print(
+            'Hero Wars failed to save {0} players, retrying with the next '
+            'save.\n'.format(len(records)))
+
+    def _write(self, records):
+        """Writes the records into the database in one transaction.
+
+        Checkpoints the journal after the records have been written.
+
+        Args:
+            records: Records taken from the queue with _take()
+        """
+
+        if not records:
+            return
+        save_records(
+            self.database_file,
+            (entry[0] for entry in records.values() if entry[0]),
+            (record for entry in records.values()
+                for record in entry[1].values())
+        )
+        if self.journal is not None:
+            self.journal.checkpoint(
+                (steamid, cls_id, seq)
+                for steamid, entry in records.items()
+                for cls_id, seq in entry[2].items()
+            )
+
+    def _run(self):
+        """Worker thread's loop writing the pending records.
+
+        Failed writes get retried until max_attempts failures in a row,
+        or no more once the queue is being stopped.
+        """
+
+        failures = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._pending or not self._running)
+                if not self._running and not self._pending:
+                    return
+                records, sequence = self._take()
+            try:
+                self.quota.acquire(
+                    sum(_entry_rows(entry) for entry in records.values()))
+                self._write(records)
+            except Exception:
+                engine_server.log_print(traceback.format_exc())
+                failures += 1
+                with self._condition:
+                    if self._running and failures < self.max_attempts:
+                        self._restore(records)
+                        self._condition.wait(self.retry_delay)
+                        continue
+                    self._drop(records)
+            else:
+                with self._condition:
+                    self._lost.difference_update(records)
+            failures = 0
+            with self._condition:
+                if sequence is not None:
+                    self._written = sequence
+                    self._condition.notify_all()
+
+
+# ======================================================================
+# >> FUNCTIONS
+# ======================================================================
+
+def _hero_records(steamid, heroes):
+    """Takes snapshots of the heroes that have changes.
+
+    Args:
+        steamid: Steamid of the heroes' owner
+        heroes: Heroes whose changes to snapshot
+
+    Returns:
+        List of HeroRecords with changes
+    """
+
+    records = (
+        hero_record(steamid, hero, changed_only=True) for hero in heroes)
+    return [record for record in records if record is not None]
+
+
+def _entry_rows(entry):
+    """Counts the database rows of a pending entry's records."""
+
+    player_rec, hero_recs, seqs = entry
+    return (player_rec is not None) + sum(
+        1 + len(hero_rec.skills) for hero_rec in hero_recs.values())
+
+
+def _count_rows(heroes):
+    """Counts the database rows of heroes and their skills."""
+
+    return sum(1 + len(hero.skills) for hero in heroes)
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+save_queue = SaveQueue(
+    database_path, journal,
+    max_rows=write_batch_rows if multi_server else 0,
+    quota=write_quota if multi_server else 0
+)
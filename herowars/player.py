@@ -3,16 +3,23 @@
 # ======================================================================
 
 # Hero Wars
-from herowars.database import load_player_data
-from herowars.database import save_player_data
-from herowars.database import load_hero_data
-from herowars.database import save_hero_data
+from herowars.database import fetch_player_records
+from herowars.database import apply_player_records
+from herowars.database import build_hero
+
+from herowars.persistence import save_queue
 
 from herowars.entities import Hero
 
-from herowars.tools import find_element
+from herowars.registry import PlayerRegistry
+
+from herowars.cache import ReconnectCache
 
 from herowars.configs import database_path
+from herowars.configs import group_commit
+from herowars.configs import multi_server
+from herowars.configs import reconnect_cache_size
+from herowars.configs import reconnect_cache_ttl
 from herowars.configs import starting_heroes
 from herowars.configs import default_lang_key
 
@@ -25,14 +32,25 @@ from players.helpers import index_from_userid
 
 from messages import SayText2
 
+# Python
+from concurrent.futures import ThreadPoolExecutor
+
 
 # ======================================================================
 # >> ALL DECLARATION
 # ======================================================================
 
 __all__ = (
+    'OwnedHeroes',
     'player',
+    'reconnect_cache',
     'get_player',
+    'get_teammates',
+    'get_enemies',
+    'prefetch_player',
+    'discard_prefetch',
+    'clear_prefetches',
+    'active_steamids',
     'create_player',
     'remove_player'
 )
@@ -42,7 +60,21 @@ __all__ = (
 # >> GLOBALS
 # ======================================================================
 
-players = []
+# Players on the server, indexed by userid, index and steamid,
+# except for the steamid shared by every bot
+players = PlayerRegistry(shared_values=dict(steamid=('BOT', )))
+
+# Departed players' saved data, taken back if they reconnect in time
+reconnect_cache = ReconnectCache(
+    0 if multi_server else reconnect_cache_size, reconnect_cache_ttl)
+
+# Departed players' (save ticket, data) tuples keyed by steamid, kept
+# until their data has been written and can go to the reconnect cache
+_departing = {}
+
+# Pending background loads of players' records keyed by steamid
+_prefetches = {}
+_prefetch_executor = ThreadPoolExecutor(max_workers=1)
 
 
 # ======================================================================
@@ -52,8 +84,8 @@ players = []
 def get_player(value, key='userid'):
     """Gets a player with matching key.
 
-    Loops through the players list and returns a player with matching
-    key to the provided parameter value.
+    Userid, index and steamid are looked up from the registry's
+    indexes, any other key loops through the players.
 
     Args:
         value: Value of the player's key to look for
@@ -63,41 +95,154 @@ def get_player(value, key='userid'):
         Player with matching key or None
     """
 
-    return find_element(players, key, value)
+    return players.get(value, key)
+
+
+def get_teammates(player, alive=False):
+    """Gets the other players on a player's team.
+
+    Args:
+        player: Player whose teammates to get
+        alive: Only get the teammates who are alive
+
+    Returns:
+        List of the player's teammates
+    """
+
+    return players.teammates(player, alive)
+
+
+def get_enemies(player, alive=False):
+    """Gets the players on a player's enemy team.
+
+    Args:
+        player: Player whose enemies to get
+        alive: Only get the enemies who are alive
+
+    Returns:
+        List of the player's enemies
+    """
+
+    return players.enemies(player, alive)
+
+
+def prefetch_player(steamid):
+    """Starts loading player's records from the database.
+
+    The records get loaded in a background thread and are adopted by
+    create_player() once the player spawns. Nothing gets loaded for
+    players whose data is still being saved or in the reconnect cache.
+
+    Args:
+        steamid: Steamid of the player whose records to load
+    """
+
+    discard_prefetch(steamid)
+    _cache_saved_players()
+    if steamid in _departing or steamid in reconnect_cache:
+        return
+    _prefetches[steamid] = _prefetch_executor.submit(
+        fetch_player_records, database_path, steamid)
+
+
+def discard_prefetch(steamid):
+    """Discards player's pending background load.
+
+    Args:
+        steamid: Steamid of the player whose load to discard
+    """
+
+    future = _prefetches.pop(steamid, None)
+    if future is not None:
+        future.cancel()
+
+
+def clear_prefetches():
+    """Discards all the pending background loads."""
+
+    for steamid in tuple(_prefetches):
+        discard_prefetch(steamid)
+
+
+def active_steamids():
+    """Gets the steamids of the players whose data is in use.
+
+    Returns:
+        Set of the steamids of the players on the server, the ones
+        being loaded as they connect and the departed ones whose data
+        is still being saved
+    """
+
+    _cache_saved_players()
+    return {player.steamid for player in players}.union(
+        _prefetches, _departing)
+
+
+def _take_prefetch(steamid):
+    """Takes player's prefetched records if they're ready.
+
+    Args:
+        steamid: Steamid of the player whose records to take
+
+    Returns:
+        Tuple of PlayerRecord and HeroRecords, or None if not ready
+    """
+
+    future = _prefetches.pop(steamid, None)
+    if future is None:
+        return None
+    if not future.done():
+        future.cancel()
+        return None
+    if future.cancelled() or future.exception() is not None:
+        return None
+    return future.result()
 
 
 def create_player(userid):
     """Creates a new player, fetching his data from the database.
 
-    Creates a new player object, loads any saved data from the database
-    based on SteamID, makes sure the player gets the starting heroes
+    Creates a new player object, takes his data from when he left if
+    it's still being saved or in the reconnect cache,
+    or loads any saved data from the database based on SteamID
+    (or adopts the data prefetched when the player connected),
+    makes sure the player gets the starting heroes
     and has a current hero set. Finally returns the player after adding
-    him to the global players list.
+    him to the global players registry.
 
     Args:
         userid: Userid of the player to create
 
     Returns:
-        New player who's been added to the players list
+        New player who's been added to the players registry
     """
 
-    # Create a new player and load his data from the database (if any)
+    # Create a new player and restore his data if he just left
     player = _Player(index_from_userid(userid))
-    load_player_data(database_path, player)
+    departed = _take_departed(player.steamid)
+    if departed is not None:
+        discard_prefetch(player.steamid)
+        _restore_player(player, *departed)
+
+    # Otherwise load his data from the database (if any)
+    else:
+        records = _take_prefetch(player.steamid)
+        if records is None:
+            records = fetch_player_records(database_path, player.steamid)
+        apply_player_records(player, *records)
 
     # Make sure player gets the starting hero(es)
-    heroes = Hero.get_subclasses()
     for cls_id in starting_heroes:
-        hero_cls = find_element(heroes, 'cls_id', cls_id)
-        if hero_cls and not find_element(player.heroes, 'cls_id', cls_id):
-            player.heroes.append(hero_cls())
+        hero_cls = Hero.find(cls_id)
+        if hero_cls and cls_id not in player.heroes:
+            player.heroes.add(hero_cls())
 
     # Make sure the player has a current hero
     if not player.hero and player.heroes:
-        player.hero = player.heroes[0]
+        player.hero = player.heroes.get(player.heroes.classes()[0].cls_id)
 
-    # Add the player to the global list and return the player
-    players.append(player)
+    # Add the player to the global registry and return the player
+    players.add(player)
     return player
 
 
@@ -105,7 +250,9 @@ def remove_player(userid):
     """Removes a player, inserting his data into the database.
 
     Finds a player with given userid, saving his data into the database
-    and removing him from the global players list.
+    and removing him from the global players registry. The save isn't
+    waited for, his data only goes into the reconnect cache once the
+    save queue has written it and it matches the database.
 
     Args:
         userid: Userid of the player to remove
@@ -115,15 +262,199 @@ def remove_player(userid):
     player = get_player(userid)
     if player:
 
-        # Save player's data and remove him
-        save_player_data(database_path, player)
+        # Save player's data and remove him, always including his row
+        # as saving it stamps his last seen time for archiving
+        player._dirty = True
+        stats = save_queue.put_player(player)
         players.remove(player)
+        _departing[player.steamid] = (stats.ticket, _departed_data(player))
+        _cache_saved_players()
+
+
+def _departed_data(player):
+    """Takes a removed player's data for restoring it later.
+
+    Items aren't saved into the database, so they're dropped just like
+    they would be when loading the player from the database.
+
+    Args:
+        player: Removed player whose data to take
+
+    Returns:
+        Tuple of arguments for _restore_player() after the player
+    """
+
+    hero = player.hero
+    if hero:
+        hero.e_level_up -= player._send_level_up_message
+    for owned in player.heroes.built():
+        owned.items.clear()
+    return player.gold, player.heroes, hero.cls_id if hero else None
+
+
+def _cache_saved_players():
+    """Moves departed players' data into the reconnect cache.
+
+    Only data that has been written is moved, data which the save
+    queue has given up on gets forgotten instead.
+    """
+
+    for steamid, (ticket, data) in tuple(_departing.items()):
+        saved = save_queue.saved(steamid, ticket)
+        if saved is None:
+            continue
+        del _departing[steamid]
+        if saved:
+            reconnect_cache.put(steamid, data)
+
+
+def _take_departed(steamid):
+    """Takes a returning player's data from when he left.
+
+    Data still being saved is newer than what's in the database, so
+    it's taken even though it's not in the reconnect cache yet.
+
+    Args:
+        steamid: Steamid of the returning player
+
+    Returns:
+        Tuple of arguments for _restore_player() or None
+    """
+
+    _cache_saved_players()
+    departing = _departing.pop(steamid, None)
+    if departing is not None:
+        return departing[1]
+    return reconnect_cache.take(steamid)
+
+
+def _restore_player(player, gold, heroes, hero_cls_id):
+    """Sets a returning player's data from the reconnect cache.
+
+    Args:
+        player: New player whose data to set
+        gold: Player's gold
+        heroes: Player's OwnedHeroes
+        hero_cls_id: Class id of player's current hero or None
+    """
+
+    player.gold = gold
+    player.heroes = heroes
+    hero = heroes.get(hero_cls_id)
+    if hero:
+        player.hero = hero
+    player.clear_dirty()
 
 
 # ======================================================================
 # >> CLASSES
 # ======================================================================
 
+class OwnedHeroes(object):
+    """Heroes owned by a player, built only once they're needed.
+
+    Heroes loaded from the database are kept as their HeroRecords,
+    which are much lighter than heroes with their skills, passives and
+    events. A hero gets built from its record the first time it's
+    needed, such as when it's activated or its info is shown, and
+    stays built so that its changes get saved. Heroes still kept as
+    records have no unsaved changes.
+    """
+
+    def __init__(self):
+        """Initializes a new collection without any heroes."""
+
+        # Heroes or (hero class, HeroRecord) tuples keyed by class id
+        self._heroes = {}
+
+    def __len__(self):
+        """Returns the amount of owned heroes."""
+
+        return len(self._heroes)
+
+    def __contains__(self, hero):
+        """Checks if a hero or a hero with a class id is owned."""
+
+        if isinstance(hero, str):
+            return hero in self._heroes
+        return self._heroes.get(hero.cls_id) is hero
+
+    def __iter__(self):
+        """Iterates over all the heroes, building each one of them.
+
+        Use classes(), levels() or built() to avoid the building.
+        """
+
+        return iter([self.get(cls_id) for cls_id in tuple(self._heroes)])
+
+    def add(self, hero):
+        """Adds a built hero.
+
+        Args:
+            hero: Hero to add
+        """
+
+        self._heroes[hero.cls_id] = hero
+
+    def add_record(self, hero_cls, record):
+        """Adds a hero to be built from its record once needed.
+
+        Args:
+            hero_cls: Class of the hero
+            record: HeroRecord fetched from the database
+        """
+
+        self._heroes[hero_cls.cls_id] = (hero_cls, record)
+
+    def get(self, cls_id):
+        """Gets a hero, building it from its record if necessary.
+
+        Args:
+            cls_id: Class id of the hero to get
+
+        Returns:
+            Hero with the class id or None if it's not owned
+        """
+
+        hero = self._heroes.get(cls_id)
+        if isinstance(hero, tuple):
+            hero = self._heroes[cls_id] = build_hero(*hero)
+        return hero
+
+    def classes(self):
+        """Gets the classes of the owned heroes without building them.
+
+        Returns:
+            List of hero classes in the order they were added
+        """
+
+        return [hero[0] if isinstance(hero, tuple) else type(hero)
+            for hero in self._heroes.values()]
+
+    def levels(self):
+        """Gets the levels of the owned heroes without building them.
+
+        Returns:
+            List of (hero class, level) tuples
+        """
+
+        return [
+            (hero[0], hero[1].level) if isinstance(hero, tuple)
+            else (type(hero), hero.level)
+            for hero in self._heroes.values()
+        ]
+
+    def built(self):
+        """Gets the heroes that have been built.
+
+        Returns:
+            List of built heroes
+        """
+
+        return [hero for hero in self._heroes.values()
+            if not isinstance(hero, tuple)]
+
+
 class _Player(PlayerEntity):
     """Player class for Hero Wars related activity.
 
@@ -134,8 +465,9 @@ class _Player(PlayerEntity):
     Attributes:
         gold: Player's Hero Wars gold, used to purchase heroes and items
         hero: Player's hero currently in use
-        heroes: List of owned heroes
+        heroes: OwnedHeroes of the player
         lang_key: Language key used to display messages and menus
+        dirty: Has player's row changed since it was last saved
     """
 
     def __new__(cls, index, gold=0, lang_key=default_lang_key):
@@ -150,10 +482,26 @@ class _Player(PlayerEntity):
         self = super().__new__(cls, index)
         self._gold = gold
         self._hero = None
-        self.heroes = []
+        self._dirty = True
+        self.heroes = OwnedHeroes()
         self.lang_key = lang_key
         return self
 
+    @property
+    def dirty(self):
+        """Getter for player's dirty flag.
+
+        Returns:
+            True if player's gold or hero has changed since last save
+        """
+
+        return self._dirty
+
+    def clear_dirty(self):
+        """Marks the player's row as saved."""
+
+        self._dirty = False
+
     @property
     def gold(self):
         """Getter for player's Hero Wars gold.
@@ -174,6 +522,8 @@ class _Player(PlayerEntity):
 
         if gold < 0:
             raise ValueError('Attempt to set negative gold for a player.')
+        if gold != self._gold:
+            self._dirty = True
         self._gold = gold
 
     @property
@@ -190,8 +540,9 @@ class _Player(PlayerEntity):
     def hero(self, hero):
         """Setter for player's current hero.
 
-        Makes sure player owns the hero and saves his current hero to
-        the database before switching to the new one.
+        Makes sure player owns the hero and queues his current hero to
+        be saved into the database before switching to the new one,
+        unless the saving is left for the group commit.
 
         Args:
             hero: Hero to switch to
@@ -210,7 +561,8 @@ class _Player(PlayerEntity):
         if self.hero:
 
             # Save current hero's data
-            save_hero_data(database_path, self.steamid, self.hero)
+            if not group_commit:
+                save_queue.put_hero(self.steamid, self.hero)
 
             # Destroy current hero's items
             for item in self.hero.items:
@@ -221,6 +573,8 @@ class _Player(PlayerEntity):
             self.hero.e_level_up -= self._send_level_up_message
 
         # Change to the new hero and listen to its level up event
+        if hero is not self._hero:
+            self._dirty = True
         self._hero = hero
         hero.e_level_up += self._send_level_up_message
 
@@ -235,6 +589,7 @@ class _Player(PlayerEntity):
         """Sets player's Counter-Strike team."""
 
         self.team = ['un', 'spec', 't', 'ct'].index(value)
+        players.set_team(self, self.team)
 
     def _send_level_up_message(self, sender, *args):
         """Event listener for hero's level up event."""
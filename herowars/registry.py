@@ -0,0 +1,242 @@
+# ======================================================================
+# >> ALL DECLARATION
+# ======================================================================
+
+__all__ = (
+    'PlayerRegistry',
+)
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Enemy team of each playing team
+_ENEMY_TEAMS = {2: 3, 3: 2}
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+class PlayerRegistry(object):
+    """Collection of players indexed by their keys.
+
+    Players can be looked up by any of the indexed keys with a single
+    dict lookup, instead of looping through all the players. The keys
+    are read once when a player gets added, so a player can still be
+    removed after his entity is gone. Other keys can still be used,
+    but they fall back to looping through the players. So do values
+    shared by many players, such as the steamid 'BOT' of every bot,
+    which are left out of their key's index.
+
+    Iterating over the registry yields the players in the order they
+    were added, just like the plain list of players it replaces.
+
+    Players are also kept in sets by their team and whether they're
+    alive, which the game events keep up to date through set_team()
+    and set_alive(). Queries of teammates and enemies only go through
+    the players of the team in question.
+
+    Attributes:
+        keys: Names of the indexed keys
+        shared_values: Sets of the values left out of each key's index
+    """
+
+    def __init__(
+            self, keys=('userid', 'index', 'steamid'), shared_values=None):
+        """Initializes a new empty registry.
+
+        Args:
+            keys: Names of the keys to index the players by
+            shared_values: Dict of key -> values many players can have,
+                which aren't indexed
+        """
+
+        self.keys = tuple(keys)
+        self.shared_values = {
+            key: frozenset(values)
+            for key, values in (shared_values or {}).items()}
+        self._indexes = {key: {} for key in self.keys}
+        self._players = {}
+
+        # Players keyed by their ids, per team and the ones alive
+        self._teams = {}
+        self._alive = {}
+
+        # Teams of the players keyed by the players' ids
+        self._team_of = {}
+
+    def __iter__(self):
+        """Iterates over the players in the order they were added."""
+
+        return iter([player for player, values in self._players.values()])
+
+    def __len__(self):
+        """Returns the amount of players."""
+
+        return len(self._players)
+
+    def __contains__(self, player):
+        """Checks if a player is in the registry."""
+
+        return id(player) in self._players
+
+    def add(self, player):
+        """Adds a player to the registry.
+
+        A player already registered with any of the same keys gets
+        removed first, so the indexes never point to a stale player.
+        Shared values don't count, as they aren't indexed.
+
+        Args:
+            player: Player to add
+        """
+
+        values = tuple(getattr(player, key) for key in self.keys)
+        indexed = [
+            (key, value) for key, value in zip(self.keys, values)
+            if value not in self.shared_values.get(key, ())]
+        for key, value in indexed:
+            old = self._indexes[key].get(value)
+            if old is not None:
+                self.remove(old)
+        for key, value in indexed:
+            self._indexes[key][value] = player
+        self._players[id(player)] = (player, values)
+        self.set_team(player, player.team)
+
+    def remove(self, player):
+        """Removes a player from the registry.
+
+        Args:
+            player: Player to remove
+
+        Raises:
+            ValueError: If the player isn't in the registry
+        """
+
+        try:
+            player, values = self._players.pop(id(player))
+        except KeyError:
+            raise ValueError('Player not in the registry.') from None
+        for key, value in zip(self.keys, values):
+            index = self._indexes[key]
+            if index.get(value) is player:
+                del index[value]
+        team = self._team_of.pop(id(player))
+        del self._teams[team][id(player)]
+        self._alive.pop(id(player), None)
+
+    def get(self, value, key='userid'):
+        """Gets a player with matching key.
+
+        Args:
+            value: Value of the player's key to look for
+            key: Key to compare the value to
+
+        Returns:
+            Player with matching key or None
+        """
+
+        index = self._indexes.get(key)
+        if index is not None and value not in self.shared_values.get(
+                key, ()):
+            return index.get(value)
+        for player in self:
+            if getattr(player, key) == value:
+                return player
+
+    def set_team(self, player, team):
+        """Moves a player to a team.
+
+        Args:
+            player: Player in the registry
+            team: Number of the team
+        """
+
+        if id(player) not in self._players:
+            return
+        old_team = self._team_of.get(id(player))
+        if old_team is not None:
+            del self._teams[old_team][id(player)]
+        self._team_of[id(player)] = team
+        self._teams.setdefault(team, {})[id(player)] = player
+
+    def set_alive(self, player, alive):
+        """Marks a player alive or dead.
+
+        Args:
+            player: Player in the registry
+            alive: Is the player alive
+        """
+
+        if id(player) not in self._players:
+            return
+        if alive:
+            self._alive[id(player)] = player
+        else:
+            self._alive.pop(id(player), None)
+
+    def is_alive(self, player):
+        """Checks if a player is marked alive."""
+
+        return id(player) in self._alive
+
+    def team_of(self, player):
+        """Gets the team a player was last moved to.
+
+        Returns:
+            Number of the team or None if the player isn't registered
+        """
+
+        return self._team_of.get(id(player))
+
+    def team(self, team, alive=False):
+        """Gets the players of a team.
+
+        Args:
+            team: Number of the team
+            alive: Only get the players alive
+
+        Returns:
+            List of the team's players
+        """
+
+        members = self._teams.get(team, {})
+        if alive:
+            return [player for key, player in members.items()
+                if key in self._alive]
+        return list(members.values())
+
+    def teammates(self, player, alive=False):
+        """Gets the other players of a player's team.
+
+        Args:
+            player: Player whose teammates to get
+            alive: Only get the teammates alive
+
+        Returns:
+            List of the player's teammates
+        """
+
+        return [teammate for teammate in self.team(
+            self.team_of(player), alive) if teammate is not player]
+
+    def enemies(self, player, alive=False):
+        """Gets the players of a player's enemy team.
+
+        Players not on a playing team have no enemies.
+
+        Args:
+            player: Player whose enemies to get
+            alive: Only get the enemies alive
+
+        Returns:
+            List of the player's enemies
+        """
+
+        enemy_team = _ENEMY_TEAMS.get(self.team_of(player))
+        if enemy_team is None:
+            return []
+        return self.team(enemy_team, alive)
@@ -0,0 +1,230 @@
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Hero Wars
+from herowars.transactions import LockStats
+from herowars.transactions import WriteQuota
+from herowars.transactions import apply_pragmas
+from herowars.transactions import write_transaction
+
+from herowars.configs import database_profiles
+from herowars.configs import database_profile
+from herowars.configs import write_batch_rows
+from herowars.configs import write_quota
+
+# Python
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from collections import namedtuple
+
+
+# ======================================================================
+# >> ALL DECLARATION
+# ======================================================================
+
+__all__ = (
+    'ServerResult',
+    'StressReport',
+    'simulate_server',
+    'run_stress',
+    'main'
+)
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Table written by the simulated servers, shaped like the heroes table
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS stress (
+    player_id INTEGER NOT NULL,
+    hero_id INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    exp INTEGER NOT NULL,
+    PRIMARY KEY (player_id, hero_id)
+) WITHOUT ROWID
+"""
+
+_SAVE = "INSERT OR REPLACE INTO stress VALUES (?, ?, ?, ?)"
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+# Results of a simulated server
+# > committed: Dict of player_id -> last round committed for the player
+ServerResult = namedtuple('ServerResult', (
+    'server', 'transactions', 'waits', 'wait_time', 'failures',
+    'rows', 'committed'))
+
+# Results of a stress test
+StressReport = namedtuple('StressReport', (
+    'servers', 'seconds', 'lost_writes', 'rows_per_second'))
+
+
+# ======================================================================
+# >> FUNCTIONS
+# ======================================================================
+
+def simulate_server(
+        database_file, server, players, rounds, profile, batch_rows,
+        quota, results):
+    """Saves players' rows like a server sharing the database does.
+
+    Every round each of the server's players gets saved with the round
+    number as his level, in transactions of at most batch_rows rows.
+
+    Args:
+        database_file: Path to the shared database file
+        server: Number of the server, used to pick its players
+        players: Amount of players on the server
+        rounds: Amount of rounds to save
+        profile: Name of the pragma profile to use
+        batch_rows: Maximum rows per transaction
+        quota: Maximum rows written per second, 0 for no limit
+        results: multiprocessing.Queue to put the ServerResult into
+    """
+
+    stats = LockStats()
+    limiter = WriteQuota(quota)
+    committed = {}
+    rows = 0
+    first = server * players
+    player_ids = range(first, first + players)
+    connection = sqlite3.connect(database_file)
+    try:
+        apply_pragmas(connection, database_profiles[profile])
+        for round_ in range(1, rounds + 1):
+            for start in range(0, players, batch_rows):
+                chunk = [
+                    (player_id, 1, round_, player_id)
+                    for player_id in player_ids[start:start + batch_rows]
+                ]
+                limiter.acquire(len(chunk))
+                try:
+                    write_transaction(
+                        connection,
+                        lambda cursor: cursor.executemany(_SAVE, chunk),
+                        stats=stats)
+                except sqlite3.OperationalError:
+                    continue
+                rows += len(chunk)
+                for player_id, hero_id, level, exp in chunk:
+                    committed[player_id] = level
+    finally:
+        connection.close()
+
+        # The results are always needed, even from a crashed server
+        results.put(ServerResult(
+            server, stats.transactions, stats.waits, stats.wait_time,
+            stats.failures, rows, committed))
+
+
+def run_stress(
+        database_file=None, servers=4, players=64, rounds=50,
+        profile=database_profile, batch_rows=write_batch_rows, quota=0):
+    """Runs simulated servers in processes against one database file.
+
+    Args:
+        database_file: Path to the database file, None for a temporary
+        servers: Amount of simulated servers
+        players: Amount of players per server
+        rounds: Amount of rounds each server saves
+        profile: Name of the pragma profile to use
+        batch_rows: Maximum rows per transaction
+        quota: Maximum rows written per second per server
+
+    Returns:
+        Tuple of a StressReport and a list of ServerResults
+    """
+
+    temporary = database_file is None
+    if temporary:
+        handle, database_file = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+    connection = sqlite3.connect(database_file)
+    apply_pragmas(connection, database_profiles[profile])
+    connection.execute(_CREATE_TABLE)
+    connection.execute('DELETE FROM stress')
+    connection.commit()
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=simulate_server, args=(
+            database_file, server, players, rounds, profile, batch_rows,
+            quota, results))
+        for server in range(servers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    server_results = [results.get() for process in processes]
+    for process in processes:
+        process.join()
+    seconds = time.perf_counter() - start
+
+    # Every committed write must be in the database
+    saved = dict(connection.execute('SELECT player_id, level FROM stress'))
+    connection.close()
+    lost = sum(
+        saved.get(player_id) != level
+        for result in server_results
+        for player_id, level in result.committed.items()
+    )
+    if temporary:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.isfile(database_file + suffix):
+                os.remove(database_file + suffix)
+    rows = sum(result.rows for result in server_results)
+    report = StressReport(servers, seconds, lost, rows / seconds)
+    return report, sorted(server_results)
+
+
+def main(args=None):
+    """Runs the stress test from the command line and prints a report.
+
+    Args:
+        args: Command line arguments, None for sys.argv
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='python -m herowars.stress',
+        description='Run simulated servers against one database file.')
+    parser.add_argument('--database', default=None,
+        help='path to the database file, a temporary one by default')
+    parser.add_argument('--servers', type=int, default=4,
+        help='amount of simulated servers')
+    parser.add_argument('--players', type=int, default=64,
+        help='amount of players per server')
+    parser.add_argument('--rounds', type=int, default=50,
+        help='amount of rounds each server saves')
+    parser.add_argument('--profile', default=database_profile,
+        choices=sorted(database_profiles), help='pragma profile')
+    parser.add_argument('--batch-rows', type=int, default=write_batch_rows,
+        help='maximum rows per transaction')
+    parser.add_argument('--quota', type=int, default=write_quota,
+        help='maximum rows per second per server, 0 for no limit')
+    args = parser.parse_args(args)
+
+    report, results = run_stress(
+        args.database, args.servers, args.players, args.rounds,
+        args.profile, args.batch_rows, args.quota)
+    for result in results:
+        print('Server {0}: {1} transactions, {2} lock waits ({3:.3f} s), '
+            '{4} failed'.format(result.server, result.transactions,
+                result.waits, result.wait_time, result.failures))
+    print('{0} servers in {1:.2f} s, {2:.0f} rows/s, {3} lost writes'
+        .format(report.servers, report.seconds, report.rows_per_second,
+            report.lost_writes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Hero Wars
+from herowars.entities import Hero
+from herowars.entities import Item
+
+# Source.Python
+from events.manager import event_registry
+
+# Python
+from itertools import chain
+
+
+# ======================================================================
+# >> ALL DECLARATION
+# ======================================================================
+
+__all__ = (
+    'EventSubscriptions',
+    'hook_events',
+    'get_enabled_hooks',
+    'update_subscriptions'
+)
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+class EventSubscriptions(object):
+    """Game events subscribed to only while some hook needs them.
+
+    High frequency events such as player_hurt only execute skills'
+    hooks, so there's no point in handling them at all when none of
+    the enabled skills and items has any of their hooks.
+
+    Attributes:
+        subscribed: Names of the events currently subscribed to
+    """
+
+    def __init__(self):
+        """Initializes a new manager without any events."""
+
+        self.subscribed = set()
+
+        # (handler, hook names) tuples keyed by event name
+        self._handlers = {}
+
+    def handler(self, *hooks):
+        """Decorator for adding a handler of the event it's named after.
+
+        Args:
+            hooks: Names of the hooks the handler executes
+
+        Returns:
+            Decorator returning the handler without any modifications
+        """
+
+        def decorator(handler):
+            self._handlers[handler.__name__] = (handler, frozenset(hooks))
+            return handler
+        return decorator
+
+    def update(self, hooks):
+        """Subscribes to the events needed by the hooks.
+
+        Events whose hooks are all missing get unsubscribed from.
+
+        Args:
+            hooks: Names of the hooks in use
+        """
+
+        hooks = set(hooks)
+        for event_name, (handler, needed) in self._handlers.items():
+            if needed & hooks:
+                if event_name not in self.subscribed:
+                    event_registry.register_for_event(event_name, handler)
+                    self.subscribed.add(event_name)
+            elif event_name in self.subscribed:
+                event_registry.unregister_for_event(event_name, handler)
+                self.subscribed.discard(event_name)
+
+    def clear(self):
+        """Unsubscribes from all the events."""
+
+        self.update(())
+
+
+# ======================================================================
+# >> FUNCTIONS
+# ======================================================================
+
+def get_enabled_hooks():
+    """Gets the hooks of the enabled heroes' skills and the items.
+
+    The skills are taken from the heroes' skill and passive sets,
+    since skills of different heroes may share their class ids.
+
+    Returns:
+        Set of the names of the hooks
+    """
+
+    entity_classes = chain(
+        chain.from_iterable(
+            chain(hero_cls.skill_set, hero_cls.passive_set)
+            for hero_cls in Hero.get_subclasses()
+        ),
+        Item.get_subclasses()
+    )
+    return {
+        hook for entity_cls in entity_classes if entity_cls.enabled
+        for hook in entity_cls.get_hooks()
+    }
+
+
+def update_subscriptions():
+    """Subscribes to the events needed by the enabled skills and items.
+
+    Must be called after heroes, skills or items have been reloaded,
+    enabled or disabled.
+
+    Returns:
+        Names of the events currently subscribed to
+    """
+
+    hook_events.update(get_enabled_hooks())
+    return hook_events.subscribed
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Events only needed when some enabled skill or item has their hooks
+hook_events = EventSubscriptions()
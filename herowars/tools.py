@@ -2,16 +2,14 @@
 # >> IMPORTS
 # ======================================================================
 
+# Hero Wars
+from herowars.cooldowns import cooldowns
+
 # Python
 from random import randint
 
 from functools import wraps, WRAPPER_ASSIGNMENTS
 
-# Source.Python
-from listeners.tick.repeat import TickRepeat
-
-from messages import SayText2
-
 
 # ======================================================================
 # >> CLASSES
@@ -52,6 +50,44 @@ class Event(set):
             listener(sender, *args, **kwargs)
 
 
+class WatchedList(list):
+    """List calling a function whenever its contents change."""
+
+    def __init__(self, on_change, iterable=()):
+        """Initializes a new list.
+
+        Args:
+            on_change: Function called without arguments after a change
+            iterable: Initial contents of the list
+        """
+
+        super().__init__(iterable)
+        self.on_change = on_change
+
+    def _changing(method):
+        """Wraps a list method to call on_change after it."""
+
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            result = method(self, *args, **kwargs)
+            self.on_change()
+            return result
+        return wrapper
+
+    append = _changing(list.append)
+    extend = _changing(list.extend)
+    insert = _changing(list.insert)
+    remove = _changing(list.remove)
+    pop = _changing(list.pop)
+    clear = _changing(list.clear)
+    sort = _changing(list.sort)
+    reverse = _changing(list.reverse)
+    __setitem__ = _changing(list.__setitem__)
+    __delitem__ = _changing(list.__delitem__)
+    __iadd__ = _changing(list.__iadd__)
+    del _changing
+
+
 # ======================================================================
 # >> FUNCTIONS
 # ======================================================================
@@ -197,6 +233,9 @@ def cooldownf(fn, message=None):
     (function) into skill's methods. The function gets called when the
     cooldown is needed, and the skill is passed to the function.
 
+    Each skill has its own cooldown, stored in the cooldowns store
+    keyed by the skill and the wrapper method.
+
     Args:   
         fn: Function to determine the cooldown of the method
         message: Optional message sent if there's still cooldown left
@@ -212,11 +251,12 @@ def cooldownf(fn, message=None):
         @wraps(method, assigned=WRAPPER_ASSIGNMENTS+('__dict__',), updated=())
         def method_wrapper(self, **eargs):
             
-            # If the method's cooldown is over
-            if method_wrapper.cooldown.remaining <= 0:
+            # If the skill's cooldown of the method is over
+            remaining = cooldowns.remaining(self, method_wrapper)
+            if remaining <= 0:
 
                 # Restart the cooldown
-                method_wrapper.cooldown.start(1, fn(self, **eargs))
+                cooldowns.start(self, method_wrapper, fn(self, **eargs))
 
                 # And call the function
                 return method(self, **eargs)
@@ -224,11 +264,14 @@ def cooldownf(fn, message=None):
             # If there was cooldown remaining and a message is provided
             if message:
 
+                # Messages need Source.Python, so only import them here
+                from messages import SayText2
+
                 # Format the provided message
                 formatted = message.format(
                     name=self.name,
-                    cd=method_wrapper.cooldown.remaining,
-                    max_cd=method_wrapper.cooldown.limit
+                    cd=remaining,
+                    max_cd=cooldowns.limit(self, method_wrapper)
                 )
 
                 # And send it to the player
@@ -237,10 +280,7 @@ def cooldownf(fn, message=None):
                 # Finally exit with code 3
                 return 3
 
-        # Create the cooldown object for the wrapper
-        method_wrapper.cooldown = TickRepeat(lambda: None)
-
-        # And return the wrapper
+        # Return the wrapper
         return method_wrapper
 
     # Return the decorator
@@ -0,0 +1,217 @@
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Hero Wars
+from herowars.configs import write_retries
+from herowars.configs import write_retry_delay
+
+# Python
+import random
+import sqlite3
+import threading
+import time
+
+
+# ======================================================================
+# >> ALL DECLARATION
+# ======================================================================
+
+__all__ = (
+    'LockStats',
+    'WriteQuota',
+    'apply_pragmas',
+    'is_locked',
+    'write_transaction',
+    'lock_stats'
+)
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+class LockStats(object):
+    """Counters of the write transactions and their lock waits.
+
+    Attributes:
+        transactions: Amount of committed transactions
+        waits: Amount of retries after the database was locked
+        wait_time: Total seconds slept before the retries
+        failures: Amount of transactions given up on
+    """
+
+    def __init__(self):
+        """Initializes new zeroed counters."""
+
+        self.transactions = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def add(self, transactions=0, waits=0, wait_time=0.0, failures=0):
+        """Adds to the counters.
+
+        Args:
+            transactions: Amount of committed transactions to add
+            waits: Amount of retries to add
+            wait_time: Seconds slept to add
+            failures: Amount of transactions given up on to add
+        """
+
+        with self._lock:
+            self.transactions += transactions
+            self.waits += waits
+            self.wait_time += wait_time
+            self.failures += failures
+
+
+class WriteQuota(object):
+    """Token bucket limiting the amount of rows written per second.
+
+    Keeps a single server from holding a shared database's write lock
+    for too long at a time.
+
+    Attributes:
+        rate: Rows allowed per second, 0 for no limit
+        burst: Rows allowed at once after being idle
+    """
+
+    def __init__(self, rate, burst=None):
+        """Initializes a new write quota.
+
+        Args:
+            rate: Rows allowed per second, 0 for no limit
+            burst: Rows allowed at once after being idle, None for rate
+        """
+
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, rows):
+        """Waits until the rows may be written.
+
+        Batches bigger than the burst are let through once the bucket
+        is full, so they never wait forever.
+
+        Args:
+            rows: Amount of rows about to be written
+
+        Returns:
+            Seconds waited
+        """
+
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            needed = min(rows, self.burst)
+            wait = max(0.0, (needed - self._tokens) / self.rate)
+            self._tokens -= needed
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+# ======================================================================
+# >> FUNCTIONS
+# ======================================================================
+
+def apply_pragmas(connection, pragmas):
+    """Applies pragmas to a connection.
+
+    The journal mode is stored in the database file and changing it
+    needs an exclusive lock, so it only gets set if it differs from
+    the current one. Otherwise connecting would fail while another
+    server is writing.
+
+    Args:
+        connection: Connection to apply the pragmas to
+        pragmas: Dict of pragma names and values
+    """
+
+    for name, value in pragmas.items():
+        if name == 'journal_mode':
+            current = connection.execute('PRAGMA journal_mode').fetchone()[0]
+            if current.lower() == str(value).lower():
+                continue
+        connection.execute('PRAGMA {0}={1}'.format(name, value))
+
+
+def is_locked(error):
+    """Checks if an error was caused by another connection's lock.
+
+    Args:
+        error: Exception to check
+
+    Returns:
+        True if the database was locked or busy
+    """
+
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and (
+        'locked' in message or 'busy' in message)
+
+
+def write_transaction(
+        connection, work, retries=write_retries, delay=write_retry_delay,
+        stats=None):
+    """Runs work in a write transaction, retrying if it's locked.
+
+    The transaction takes the write lock right away with BEGIN
+    IMMEDIATE, so it can't deadlock upgrading a read lock. When another
+    connection holds the lock even after the busy timeout, the whole
+    transaction gets rolled back and retried after a random exponential
+    backoff, which keeps competing servers from retrying in lockstep.
+
+    Args:
+        connection: Connection not in a transaction
+        work: Function called with a cursor to do the writes
+        retries: Maximum amount of retries
+        delay: Base delay of the backoff in seconds
+        stats: LockStats to count into, None for lock_stats
+
+    Raises:
+        sqlite3.OperationalError: If still locked after the retries
+
+    Returns:
+        Return value of the work
+    """
+
+    stats = stats or lock_stats
+    for attempt in range(retries + 1):
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                result = work(connection.cursor())
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+        except sqlite3.OperationalError as error:
+            if not is_locked(error):
+                raise
+            if attempt == retries:
+                stats.add(failures=1)
+                raise
+            wait = random.uniform(0, delay * 2 ** attempt)
+            stats.add(waits=1, wait_time=wait)
+            time.sleep(wait)
+            continue
+        stats.add(transactions=1)
+        return result
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Lock waits of all the write transactions of this server
+lock_stats = LockStats()
@@ -0,0 +1,286 @@
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Hero Wars
+from herowars.database import PlayerRecord
+from herowars.database import HeroRecord
+from herowars.database import open_database
+
+# Python
+import gzip
+import itertools
+import json
+
+from collections import namedtuple
+
+
+# ======================================================================
+# >> ALL DECLARATION
+# ======================================================================
+
+__all__ = (
+    'TransferStats',
+    'conflict_policies',
+    'write_players',
+    'read_players',
+    'export_players',
+    'import_players'
+)
+
+
+# ======================================================================
+# >> CLASSES
+# ======================================================================
+
+# Amount of players imported and skipped by an import
+TransferStats = namedtuple('TransferStats', ('imported', 'skipped'))
+
+
+# ======================================================================
+# >> FUNCTIONS
+# ======================================================================
+
+def write_players(path, records):
+    """Writes players' records into a file, one player per line.
+
+    Each line is a JSON object of the player's steamid, gold, current
+    hero and heroes with their levels, exp and skills. The file gets
+    gzipped if the path ends with '.gz'. Archives written by the
+    maintenance tool use the same format.
+
+    Args:
+        path: Path to the file
+        records: Iterable of (PlayerRecord or None, HeroRecords) tuples
+
+    Returns:
+        Amount of players written
+    """
+
+    count = 0
+    with _open(path, 'wt') as f:
+        for player_rec, hero_recs in records:
+            f.write(json.dumps(_to_dict(player_rec, hero_recs)) + '\n')
+            count += 1
+    return count
+
+
+def read_players(path):
+    """Reads players' records from a file written by write_players().
+
+    Args:
+        path: Path to the file
+
+    Yields:
+        Tuples of PlayerRecord (or None) and a list of HeroRecords
+    """
+
+    with _open(path, 'rt') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            player_rec, hero_recs = _from_dict(json.loads(line))
+            if player_rec is not None or hero_recs:
+                yield player_rec, hero_recs
+
+
+def export_players(database_file, path):
+    """Exports every player's records from a database into a file.
+
+    Args:
+        database_file: Path to the database file
+        path: Path to the export file
+
+    Returns:
+        Amount of players exported
+    """
+
+    return write_players(path, open_database(database_file).iter_players())
+
+
+def import_players(
+        database_file, path, policy='keep_higher', batch_size=500,
+        exclude=()):
+    """Imports players' records from a file into a database.
+
+    The records are read lazily and saved in batches, each batch in
+    a single transaction, so memory use doesn't grow with the file.
+    Conflicts with the records already in the database are resolved
+    with one of the conflict_policies.
+
+    Args:
+        database_file: Path to the database file
+        path: Path to the export file
+        policy: Name of the conflict policy
+        batch_size: Amount of players saved per transaction
+        exclude: Set of steamids of players not to import, such as the
+            ones on the server, checked again for every batch so it can
+            grow while importing
+
+    Raises:
+        KeyError: If there's no such conflict policy
+
+    Returns:
+        TransferStats of the players imported and skipped
+    """
+
+    resolve = conflict_policies[policy]
+    storage = open_database(database_file)
+    records = read_players(path)
+    imported = skipped = 0
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            break
+        steamids = [_steamid(*record) for record in batch]
+        excluded = {steamid for steamid in steamids if steamid in exclude}
+        saved = storage.load_players(
+            steamid for steamid in steamids if steamid not in excluded)
+        player_recs = []
+        hero_recs = []
+        for steamid, (player_rec, new_heroes) in zip(steamids, batch):
+            if steamid in excluded:
+                skipped += 1
+                continue
+            old_player, old_heroes = saved[steamid]
+            player_rec, new_heroes = resolve(
+                old_player, {record.cls_id: record for record in old_heroes},
+                player_rec, new_heroes)
+            if player_rec is not None:
+                player_recs.append(player_rec)
+            hero_recs.extend(new_heroes)
+            imported += 1
+        storage.save_records(player_recs, hero_recs)
+        storage.release(steamids)
+    return TransferStats(imported, skipped)
+
+
+def _overwrite(old_player, old_heroes, new_player, new_heroes):
+    """Conflict policy replacing the saved records with imported ones.
+
+    Skills saved for a hero but missing from the imported record are
+    reset, so the hero ends up exactly as imported.
+    """
+
+    return new_player, [
+        _replace_skills(old_heroes.get(record.cls_id), record)
+        for record in new_heroes
+    ]
+
+
+def _keep_higher(old_player, old_heroes, new_player, new_heroes):
+    """Conflict policy keeping the higher level of each hero.
+
+    Heroes are compared by level and then by exp, gold by its amount.
+    The player keeps his saved current hero, if he has one.
+    """
+
+    player_rec = new_player
+    if old_player is not None and new_player is not None:
+        player_rec = _merge_player(
+            old_player, new_player, max(old_player.gold, new_player.gold))
+    return player_rec, _higher_heroes(old_heroes, new_heroes)
+
+
+def _sum_gold(old_player, old_heroes, new_player, new_heroes):
+    """Conflict policy summing gold and keeping the higher heroes.
+
+    The player keeps his saved current hero, if he has one.
+    """
+
+    player_rec = new_player
+    if old_player is not None and new_player is not None:
+        player_rec = _merge_player(
+            old_player, new_player, old_player.gold + new_player.gold)
+    return player_rec, _higher_heroes(old_heroes, new_heroes)
+
+
+def _merge_player(old_player, new_player, gold):
+    """Merges a saved player record with an imported one.
+
+    The saved current hero is kept unless the player had none saved.
+    """
+
+    return old_player._replace(gold=gold, hero_cls_id=(
+        old_player.hero_cls_id or new_player.hero_cls_id))
+
+
+def _higher_heroes(old_heroes, new_heroes):
+    """Gets the imported heroes that are higher than the saved ones."""
+
+    return [
+        _replace_skills(old_heroes.get(record.cls_id), record)
+        for record in new_heroes
+        if record.cls_id not in old_heroes
+        or (record.level, record.exp) > (
+            old_heroes[record.cls_id].level, old_heroes[record.cls_id].exp)
+    ]
+
+
+def _replace_skills(old, new):
+    """Resets the saved skills of a hero missing from a new record."""
+
+    if old is None:
+        return new
+    skills = dict(new.skills)
+    return new._replace(skills=new.skills + tuple(
+        (cls_id, 0) for cls_id, level in old.skills if cls_id not in skills))
+
+
+def _steamid(player_rec, hero_recs):
+    """Gets the steamid of a player's records."""
+
+    if player_rec is not None:
+        return player_rec.steamid
+    return hero_recs[0].steamid
+
+
+def _to_dict(player_rec, hero_recs):
+    """Converts player's records into a dict of the export format."""
+
+    player = dict(steamid=_steamid(player_rec, hero_recs), heroes={})
+    if player_rec is not None:
+        player.update(gold=player_rec.gold, hero=player_rec.hero_cls_id)
+    for record in hero_recs:
+        player['heroes'][record.cls_id] = dict(
+            level=record.level, exp=record.exp, skills=dict(record.skills))
+    return player
+
+
+def _from_dict(player):
+    """Converts a dict of the export format into player's records."""
+
+    steamid = player['steamid']
+    player_rec = None
+    if player.get('gold') is not None:
+        player_rec = PlayerRecord(
+            steamid, player['gold'], player.get('hero'))
+    hero_recs = [
+        HeroRecord(steamid, cls_id, hero['level'], hero['exp'],
+            tuple(hero['skills'].items()))
+        for cls_id, hero in player['heroes'].items()
+    ]
+    return player_rec, hero_recs
+
+
+def _open(path, mode):
+    """Opens a text file, gzipped if the path ends with '.gz'."""
+
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Conflict policies used when importing a player who's already saved
+# > overwrite: Imported records replace the saved ones
+# > keep_higher: Higher level (then exp) of each hero and more gold win
+# > sum_gold: Gold gets summed, higher level of each hero wins
+conflict_policies = dict(
+    overwrite=_overwrite,
+    keep_higher=_keep_higher,
+    sum_gold=_sum_gold,
+)
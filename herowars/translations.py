@@ -135,7 +135,12 @@ _translations = {
                                   "({current_level}/{required_level})."),
             not_enough_skill_points = ("You don't have enough skill points "
                                        "({skill_points}/{cost})."),
-            skill_maxed_out = "Skill has already been maxed out."
+            skill_maxed_out = "Skill has already been maxed out.",
+
+            # Leaderboard values
+            leaderboard_empty = "Nobody has been ranked yet.",
+            leaderboard_loading = ("Loading the leaderboard, "
+                                   "try again in a moment.")
         ),
 
         # Menu options
@@ -150,9 +155,16 @@ _translations = {
             buy_items = "Buy Items",
             item_categories = "Item Categories",
             sell_items = "Sell Items",
+            leaderboards = "Leaderboards",
 
             # Info
             available_skill_points = "Skill Points: {skill_points}",
+            your_rank = "Your rank: #{rank} ({score})",
+
+            # Leaderboards
+            leaderboard_total_level = "Total Level",
+            leaderboard_gold = "Gold",
+            leaderboard_hero = "{name} Level",
 
             # Options
             reset_skill_points = "Reset Skill Points",
@@ -0,0 +1,16 @@
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Python
+import os
+import sys
+
+
+# ======================================================================
+# >> GLOBALS
+# ======================================================================
+
+# Test the plugin package of this repository
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,52 @@
+"""Tests of the entity class registries."""
+
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Python
+import pytest
+
+# Hero Wars
+from herowars.entities import Entity
+from herowars.entities import Hero
+from herowars.entities import Skill
+
+
+# ======================================================================
+# >> FIXTURES
+# ======================================================================
+
+@pytest.fixture
+def module_names():
+    """Names of two hero modules, forgotten after the test."""
+
+    module_names = (__name__ + '.first', __name__ + '.second')
+    yield module_names
+    for module_name in module_names:
+        Entity.forget_module(module_name)
+
+
+# ======================================================================
+# >> TESTS
+# ======================================================================
+
+def test_skills_of_different_modules_share_class_id(module_names):
+    skills = [
+        type('SharedSkill', (Skill, ), dict(__module__=module_name))
+        for module_name in module_names
+    ]
+    assert [subcls for subcls in Skill._registry.values()
+        if subcls.cls_id == 'SharedSkill'] == skills
+    assert Skill.find('SharedSkill') in skills
+
+
+def test_heroes_keyed_by_class_id(module_names):
+    heroes = [
+        type('SharedHero', (Hero, ), dict(__module__=module_name))
+        for module_name in module_names
+    ]
+    assert Hero.find('SharedHero') is heroes[1]
+    assert Hero._registry['SharedHero'] is heroes[1]
+    Entity.forget_module(module_names[1])
+    assert Hero.find('SharedHero') is None
@@ -0,0 +1,86 @@
+"""Tests of leveling up heroes with the exp tables."""
+
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Python
+import random
+
+import pytest
+
+# Hero Wars
+import herowars.configs
+
+from herowars.configs import exp_algorithm
+from herowars.entities import Entity
+from herowars.entities import Hero
+
+
+# ======================================================================
+# >> FIXTURES
+# ======================================================================
+
+@pytest.fixture(scope='module')
+def hero_classes():
+    """Defines disabled heroes of various maximum levels."""
+
+    hero_classes = [
+        type('ExpTableHero{0}'.format(max_level), (Hero, ), dict(
+            enabled=False, max_level=max_level))
+        for max_level in (1, 2, 5, 50, 10000)
+    ]
+    yield hero_classes
+    Entity.forget_module(__name__)
+
+
+def _loop(level, exp, max_level):
+    """Levels up one level at a time like heroes used to."""
+
+    while exp >= exp_algorithm(level) and level < max_level:
+        exp -= exp_algorithm(level)
+        level += 1
+    if level >= max_level:
+        return max_level, 0
+    return level, exp
+
+
+# ======================================================================
+# >> TESTS
+# ======================================================================
+
+@pytest.mark.parametrize('seed', range(5))
+def test_exp_table_matches_loop(hero_classes, seed):
+    rand = random.Random(seed)
+    for case in range(1000):
+        hero_cls = rand.choice(hero_classes)
+        level = rand.randrange(hero_cls.max_level)
+        exp = rand.randrange(exp_algorithm(level))
+        gain = rand.choice((0, 1, rand.randrange(1000),
+            rand.randrange(10 ** rand.randrange(1, 10))))
+        hero = hero_cls(level, exp)
+        gains = []
+        hero.e_level_up += lambda sender, gain: gains.append(gain)
+        hero.exp += gain
+        expected = _loop(level, exp + gain, hero_cls.max_level)
+        expected_gains = [expected[0] - level] if expected[0] > level else []
+        assert (hero.level, hero.exp, gains) == expected + (
+            expected_gains, ), (hero_cls.max_level, level, exp, gain)
+
+
+def test_exp_table_total(hero_classes):
+    hero_cls = hero_classes[-1]
+    hero = hero_cls()
+    hero.exp += hero_cls.get_exp_table().total(hero_cls.max_level)
+    assert (hero.level, hero.exp) == (hero_cls.max_level, 0)
+
+
+
+def test_exp_table_follows_config(hero_classes, monkeypatch):
+    hero_cls = hero_classes[-2]
+    assert hero_cls.get_exp_table().total(2) == (
+        exp_algorithm(0) + exp_algorithm(1))
+    monkeypatch.setattr(herowars.configs, 'exp_algorithm', lambda level: 10)
+    hero = hero_cls()
+    hero.exp += 25
+    assert (hero.level, hero.exp, hero.required_exp) == (2, 5, 10)
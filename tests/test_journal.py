@@ -0,0 +1,55 @@
+"""Tests of the exp and gold journal."""
+
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Python
+import threading
+
+# Hero Wars
+import herowars.journal
+
+from herowars.journal import Journal
+
+
+# ======================================================================
+# >> TESTS
+# ======================================================================
+
+def test_compact_keeps_unsaved_deltas(tmp_path):
+    journal = Journal(str(tmp_path / 'herowars.journal'))
+    journal.open()
+    journal.record('STEAM_0:1:1', 'Hero', exp=5, gold=1)
+    journal.record('STEAM_0:1:1', 'Hero', exp=7)
+    journal.checkpoint((('STEAM_0:1:1', 'Hero', 1), ))
+    journal.compact()
+    assert [(record.seq, record.exp, record.gold)
+        for record in journal.unsaved_deltas()] == [(1, 0, 1), (2, 7, 0)]
+    journal.close()
+
+
+def test_record_while_compacting(tmp_path, monkeypatch):
+    journal = Journal(str(tmp_path / 'herowars.journal'))
+    journal.open()
+    journal.record('STEAM_0:1:1', 'Hero', exp=5)
+    journal.checkpoint((('STEAM_0:1:1', 'Hero', 1), ))
+    unsaved_deltas = herowars.journal._unsaved_deltas
+
+    def record_meanwhile(records):
+        thread = threading.Thread(target=journal.record,
+            args=('STEAM_0:1:2', 'Hero'), kwargs=dict(gold=3))
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive(), 'record() waited for compact()'
+        return unsaved_deltas(records)
+
+    monkeypatch.setattr(
+        herowars.journal, '_unsaved_deltas', record_meanwhile)
+    journal.compact()
+    monkeypatch.undo()
+    assert [(record.steamid, record.gold)
+        for record in journal.unsaved_deltas()] == [('STEAM_0:1:2', 3)]
+    journal.record('STEAM_0:1:2', 'Hero', gold=4)
+    assert len(journal.unsaved_deltas()) == 2
+    journal.close()
@@ -0,0 +1,99 @@
+"""Tests of the offline database maintenance."""
+
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Python
+import sqlite3
+
+import pytest
+
+# Hero Wars
+import herowars.maintenance
+
+from herowars.database import HeroRecord
+from herowars.database import PlayerRecord
+from herowars.database import SQLiteBackend
+from herowars.maintenance import find_class_ids
+from herowars.maintenance import run_maintenance
+
+
+# ======================================================================
+# >> FIXTURES
+# ======================================================================
+
+@pytest.fixture
+def database_file(tmp_path):
+    """Creates a database with a hero that no longer exists."""
+
+    database_file = str(tmp_path / 'herowars.db')
+    storage = SQLiteBackend(database_file)
+    storage.setup()
+    storage.save_player(
+        PlayerRecord('STEAM_0:1:1', 0, 'TestHero1'), (
+            HeroRecord('STEAM_0:1:1', 'TestHero1', 1, 0, (('Damage', 1), )),
+            HeroRecord('STEAM_0:1:1', 'GoneHero', 1, 0, (('GoneSkill', 1), ))
+        ))
+    storage.close()
+    return database_file
+
+
+@pytest.fixture
+def class_ids_file(tmp_path):
+    """Writes a list of class ids like Hero Wars does when it loads."""
+
+    class_ids_file = tmp_path / 'herowars.classes'
+    class_ids_file.write_text('Damage\nExpBoost\nTestHero1\n')
+    return str(class_ids_file)
+
+
+def _count_rows(database_file, table):
+    """Counts the rows of a table in a database file."""
+
+    connection = sqlite3.connect(database_file)
+    try:
+        return connection.execute(
+            'SELECT COUNT(*) FROM ' + table).fetchone()[0]
+    finally:
+        connection.close()
+
+
+# ======================================================================
+# >> TESTS
+# ======================================================================
+
+def test_find_class_ids_imports_heroes(tmp_path):
+    pytest.importorskip('players.entity')
+    cls_ids = find_class_ids(str(tmp_path / 'missing.classes'))
+    assert {'TestHero1', 'Damage', 'ExpBoost'} <= cls_ids
+
+
+def test_find_class_ids_offline(class_ids_file, tmp_path, monkeypatch):
+    def offline(packages):
+        raise ImportError('No module named players')
+
+    monkeypatch.setattr(herowars.maintenance, '_registered_class_ids', offline)
+    assert find_class_ids(class_ids_file) == {
+        'Damage', 'ExpBoost', 'TestHero1'}
+    with pytest.raises(RuntimeError):
+        find_class_ids(str(tmp_path / 'missing.classes'))
+
+
+def test_dry_run_changes_nothing(database_file, class_ids_file, tmp_path):
+    report = run_maintenance(database_file, None, prune=True, dry_run=True,
+        class_ids_file=class_ids_file)
+    assert (report.pruned_heroes, report.pruned_skills) == (1, 1)
+    assert report.backup is None
+    assert _count_rows(database_file, 'heroes') == 2
+    assert _count_rows(database_file, 'skills') == 2
+    assert not (tmp_path / 'herowars.db.bak').exists()
+
+
+def test_backup_before_prune(database_file, class_ids_file):
+    report = run_maintenance(
+        database_file, None, prune=True, class_ids_file=class_ids_file)
+    assert (report.pruned_heroes, report.pruned_skills) == (1, 1)
+    assert report.backup == database_file + '.bak'
+    assert _count_rows(database_file, 'heroes') == 1
+    assert _count_rows(report.backup, 'heroes') == 2
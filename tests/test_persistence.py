@@ -0,0 +1,65 @@
+"""Tests of the save queue."""
+
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Python
+import pytest
+
+# The save queue reports into the server's log
+pytest.importorskip('engines.server')
+
+# Hero Wars
+import herowars.persistence
+
+from herowars.database import HeroRecord
+from herowars.database import PlayerRecord
+from herowars.database import close_database
+from herowars.database import open_database
+from herowars.persistence import SaveQueue
+
+
+# ======================================================================
+# >> FIXTURES
+# ======================================================================
+
+@pytest.fixture
+def save_queue(tmp_path):
+    """Starts a save queue of an empty database."""
+
+    database_file = str(tmp_path / 'herowars.db')
+    open_database(database_file, 'sqlite').setup()
+    save_queue = SaveQueue(
+        database_file, retry_delay=0.01, max_attempts=2, flush_timeout=5)
+    save_queue.start()
+    yield save_queue
+    save_queue.stop()
+    close_database(database_file)
+
+
+# ======================================================================
+# >> TESTS
+# ======================================================================
+
+def test_dropped_records_retried_with_next_save(save_queue, monkeypatch):
+    save_records = herowars.persistence.save_records
+
+    def locked(*args, **kwargs):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(herowars.persistence, 'save_records', locked)
+    stats = save_queue._put([('STEAM_0:1:1',
+        PlayerRecord('STEAM_0:1:1', 5, 'Hero'),
+        [HeroRecord('STEAM_0:1:1', 'Hero', 1, 0, (('Skill', 2), ))], 3)])
+    assert not save_queue.flush()
+    assert save_queue.saved('STEAM_0:1:1', stats.ticket) is False
+
+    monkeypatch.setattr(herowars.persistence, 'save_records', save_records)
+    stats = save_queue._put([('STEAM_0:1:2',
+        PlayerRecord('STEAM_0:1:2', 1, None), [], 1)])
+    assert save_queue.flush()
+    assert save_queue.saved('STEAM_0:1:1', stats.ticket)
+    assert open_database(save_queue.database_file).load_player(
+        'STEAM_0:1:1') == (PlayerRecord('STEAM_0:1:1', 5, 'Hero'),
+            [HeroRecord('STEAM_0:1:1', 'Hero', 1, 0, (('Skill', 2), ))])
@@ -0,0 +1,67 @@
+"""Tests of the players registry."""
+
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Hero Wars
+from herowars.registry import PlayerRegistry
+
+
+# ======================================================================
+# >> HELPERS
+# ======================================================================
+
+class _Player(object):
+    """Player with only the keys the registry reads."""
+
+    def __init__(self, userid, steamid, team=2):
+        self.userid = userid
+        self.index = userid + 100
+        self.steamid = steamid
+        self.team = team
+
+
+def _bot_registry():
+    """Creates a registry not indexing the bots' shared steamid."""
+
+    return PlayerRegistry(shared_values=dict(steamid=('BOT', )))
+
+
+# ======================================================================
+# >> TESTS
+# ======================================================================
+
+def test_several_bots():
+    registry = _bot_registry()
+    bots = [_Player(userid, 'BOT', 2 + userid % 2) for userid in range(4)]
+    for bot in bots:
+        registry.add(bot)
+    assert list(registry) == bots
+    assert [registry.get(bot.userid) for bot in bots] == bots
+    assert [registry.get(bot.index, 'index') for bot in bots] == bots
+    assert registry.team(2) == bots[0::2]
+    assert registry.teammates(bots[1]) == [bots[3]]
+
+
+def test_remove_bot_keeps_other_bots():
+    registry = _bot_registry()
+    bots = [_Player(userid, 'BOT') for userid in range(3)]
+    for bot in bots:
+        registry.add(bot)
+    registry.remove(bots[1])
+    assert list(registry) == [bots[0], bots[2]]
+    assert registry.get(bots[1].userid) is None
+    assert registry.get('BOT', 'steamid') is bots[0]
+
+
+def test_same_steamid_replaces_player():
+    registry = _bot_registry()
+    old = _Player(1, 'STEAM_0:1:1')
+    new = _Player(2, 'STEAM_0:1:1')
+    registry.add(old)
+    registry.add(_Player(3, 'BOT'))
+    registry.add(new)
+    assert old not in registry
+    assert registry.get('STEAM_0:1:1', 'steamid') is new
+    assert len(registry) == 2
@@ -0,0 +1,162 @@
+"""Conformance tests run against every storage backend."""
+
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Python
+import pytest
+
+# Hero Wars
+from herowars.database import DbmBackend
+from herowars.database import HeroRecord
+from herowars.database import MemoryBackend
+from herowars.database import PlayerRecord
+from herowars.database import SQLiteBackend
+from herowars.database import backends
+
+
+# ======================================================================
+# >> FIXTURES
+# ======================================================================
+
+@pytest.fixture(params=sorted(backends))
+def storage(request, tmp_path):
+    """Opens an empty storage of each backend."""
+
+    storage = backends[request.param](str(tmp_path / 'herowars.db'))
+    storage.setup()
+    yield storage
+    storage.close()
+
+
+def _reopen(storage):
+    """Closes a storage and opens its database file again."""
+
+    storage.close()
+    reopened = type(storage)(storage.database_file)
+    reopened.setup()
+    return reopened
+
+
+# ======================================================================
+# >> TESTS
+# ======================================================================
+
+def test_load_missing_player(storage):
+    assert storage.load_player('STEAM_0:1:1') == (None, [])
+    assert storage.load_hero('STEAM_0:1:1', 'Hero') is None
+
+
+def test_save_and_load_player(storage):
+    storage.save_player(
+        PlayerRecord('STEAM_0:1:1', 50, 'Hero'),
+        (HeroRecord('STEAM_0:1:1', 'Hero', 3, 20, (('Skill', 2), )), ))
+    player_rec, hero_recs = storage.load_player('STEAM_0:1:1')
+    assert player_rec == PlayerRecord('STEAM_0:1:1', 50, 'Hero')
+    assert hero_recs == [
+        HeroRecord('STEAM_0:1:1', 'Hero', 3, 20, (('Skill', 2), ))]
+    assert storage.load_hero('STEAM_0:1:1', 'Hero') == hero_recs[0]
+
+
+def test_save_player_without_hero(storage):
+    storage.save_records((PlayerRecord('STEAM_0:1:1', 5, None), ))
+    assert storage.load_player('STEAM_0:1:1') == (
+        PlayerRecord('STEAM_0:1:1', 5, None), [])
+
+
+def test_changed_skills_are_merged(storage):
+    storage.save_hero(HeroRecord(
+        'STEAM_0:1:1', 'Hero', 1, 0, (('First', 1), ('Second', 1))))
+    storage.save_hero(HeroRecord(
+        'STEAM_0:1:1', 'Hero', 2, 5, (('Second', 3), )))
+    record = storage.load_hero('STEAM_0:1:1', 'Hero')
+    assert (record.level, record.exp) == (2, 5)
+    assert dict(record.skills) == {'First': 1, 'Second': 3}
+
+
+def test_load_players(storage):
+    storage.save_records(
+        (PlayerRecord('STEAM_0:1:1', 1, 'Hero'), ),
+        (HeroRecord('STEAM_0:1:2', 'Hero', 1, 0, ()), ))
+    records = storage.load_players(
+        ('STEAM_0:1:1', 'STEAM_0:1:2', 'STEAM_0:1:3'))
+    assert records['STEAM_0:1:1'] == (
+        PlayerRecord('STEAM_0:1:1', 1, 'Hero'), [])
+    assert records['STEAM_0:1:2'] == (
+        None, [HeroRecord('STEAM_0:1:2', 'Hero', 1, 0, ())])
+    assert records['STEAM_0:1:3'] == (None, [])
+
+
+def test_iter_players(storage):
+    for i in range(10):
+        steamid = 'STEAM_0:1:{0}'.format(i)
+        storage.save_player(
+            PlayerRecord(steamid, i, None if i % 3 else 'Hero'),
+            (HeroRecord(steamid, 'Hero', i, 0, (('Skill', 1), )), ))
+    players = {
+        player_rec.steamid: (player_rec, hero_recs)
+        for player_rec, hero_recs in storage.iter_players()
+    }
+    assert players == {
+        'STEAM_0:1:{0}'.format(i): storage.load_player(
+            'STEAM_0:1:{0}'.format(i))
+        for i in range(10)
+    }
+
+
+def test_apply_deltas(storage):
+    storage.save_player(
+        PlayerRecord('STEAM_0:1:1', 10, 'Hero'),
+        (HeroRecord('STEAM_0:1:1', 'Hero', 1, 5, ()), ))
+    storage.apply_deltas(
+        {('STEAM_0:1:1', 'Hero'): 20, ('STEAM_0:1:2', 'Other'): 7},
+        {'STEAM_0:1:1': (3, 'Hero'), 'STEAM_0:1:2': (4, 'Other')})
+    assert storage.load_player('STEAM_0:1:1') == (
+        PlayerRecord('STEAM_0:1:1', 13, 'Hero'),
+        [HeroRecord('STEAM_0:1:1', 'Hero', 1, 25, ())])
+    assert storage.load_player('STEAM_0:1:2') == (
+        PlayerRecord('STEAM_0:1:2', 4, 'Other'),
+        [HeroRecord('STEAM_0:1:2', 'Other', 0, 7, ())])
+
+
+def test_records_persist(storage):
+    if isinstance(storage, MemoryBackend):
+        pytest.skip('The memory backend persists nothing.')
+    storage.save_player(
+        PlayerRecord('STEAM_0:1:1', 50, 'Hero'),
+        (HeroRecord('STEAM_0:1:1', 'Hero', 3, 20, (('Skill', 2), )), ))
+    storage = _reopen(storage)
+    try:
+        assert storage.load_player('STEAM_0:1:1') == (
+            PlayerRecord('STEAM_0:1:1', 50, 'Hero'),
+            [HeroRecord('STEAM_0:1:1', 'Hero', 3, 20, (('Skill', 2), ))])
+    finally:
+        storage.close()
+
+
+def test_dbm_rejects_long_class_ids(tmp_path):
+    storage = DbmBackend(str(tmp_path / 'herowars.db'))
+    storage.setup()
+    try:
+        with pytest.raises(ValueError):
+            storage.save_records(
+                (PlayerRecord('STEAM_0:1:1', 1, 'Hero'), ),
+                (HeroRecord('STEAM_0:1:2', 'H' * 256, 1, 0, ()), ))
+        assert storage.load_player('STEAM_0:1:1') == (None, [])
+    finally:
+        storage.close()
+
+
+def test_sqlite_load_is_read_only(tmp_path):
+    storage = SQLiteBackend(str(tmp_path / 'herowars.db'))
+    storage.setup()
+    try:
+        storage.save_player(PlayerRecord('STEAM_0:1:1', 1, 'Hero'), (
+            HeroRecord('STEAM_0:1:1', 'Hero', 1, 0, (('Skill', 1), )), ))
+        changes = storage.connection.total_changes
+        storage.load_player('STEAM_0:1:1')
+        assert storage.connection.total_changes == changes
+        assert not storage.connection.in_transaction
+    finally:
+        storage.close()
@@ -0,0 +1,63 @@
+"""Tests of subscribing to the events the hooks need."""
+
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Python
+import pytest
+
+# The subscriptions register into Source.Python's events
+pytest.importorskip('events.manager')
+
+# Hero Wars
+from herowars.entities import Entity
+from herowars.entities import Hero
+from herowars.entities import Skill
+from herowars.subscriptions import get_enabled_hooks
+
+
+# ======================================================================
+# >> FIXTURES
+# ======================================================================
+
+@pytest.fixture
+def module_names():
+    """Names of two hero modules, forgotten after the test."""
+
+    module_names = (__name__ + '.first', __name__ + '.second')
+    yield module_names
+    for module_name in module_names:
+        Entity.forget_module(module_name)
+
+
+# ======================================================================
+# >> TESTS
+# ======================================================================
+
+def _hook(self, **eargs):
+    """Hook that does nothing."""
+
+
+def _skill(module_name, hook_name):
+    """Defines a skill named SharedSkill with a hook."""
+
+    return type('SharedSkill', (Skill, ), {
+        '__module__': module_name, hook_name: _hook})
+
+
+def test_hooks_of_same_named_skills(module_names):
+    first, second = module_names
+    type('FirstHero', (Hero, ), dict(
+        __module__=first, skill_set=(_skill(first, 'on_first'), )))
+    type('SecondHero', (Hero, ), dict(
+        __module__=second, passive_set=(_skill(second, 'on_second'), )))
+    type('DisabledHero', (Hero, ), dict(
+        __module__=second, enabled=False,
+        skill_set=(_skill(second, 'on_disabled'), )))
+
+    hooks = get_enabled_hooks()
+    assert {'on_first', 'on_second'} <= hooks
+    assert 'on_disabled' not in hooks
+    Entity.forget_module(second)
+    assert 'on_second' not in get_enabled_hooks()
@@ -0,0 +1,102 @@
+"""Tests of exporting and importing players across storage backends."""
+
+# ======================================================================
+# >> IMPORTS
+# ======================================================================
+
+# Python
+import pytest
+
+# Hero Wars
+from herowars.database import HeroRecord
+from herowars.database import PlayerRecord
+from herowars.database import backends
+from herowars.database import close_database
+from herowars.database import open_database
+from herowars.transfer import conflict_policies
+from herowars.transfer import export_players
+from herowars.transfer import import_players
+from herowars.transfer import read_players
+
+
+# ======================================================================
+# >> FIXTURES
+# ======================================================================
+
+@pytest.fixture(params=sorted(backends))
+def open_storage(request, tmp_path):
+    """Opens empty databases of each backend by their file names."""
+
+    database_files = []
+
+    def open_storage(name):
+        database_file = str(tmp_path / name)
+        storage = open_database(database_file, request.param)
+        storage.setup()
+        database_files.append(database_file)
+        return storage
+
+    yield open_storage
+    for database_file in database_files:
+        close_database(database_file)
+
+
+# ======================================================================
+# >> TESTS
+# ======================================================================
+
+@pytest.mark.parametrize('policy', sorted(conflict_policies))
+def test_round_trip_without_hero(open_storage, tmp_path, policy):
+    source = open_storage('source.db')
+    source.save_player(PlayerRecord('STEAM_0:1:1', 10, None), (
+        HeroRecord('STEAM_0:1:1', 'Hero', 2, 5, (('Skill', 1), )), ))
+    source.save_player(PlayerRecord('STEAM_0:1:2', 20, None), ())
+    path = str(tmp_path / 'players.json.gz')
+    assert export_players(source.database_file, path) == 2
+
+    target = open_storage('target.db')
+    stats = import_players(target.database_file, path, policy)
+    assert (stats.imported, stats.skipped) == (2, 0)
+    assert target.load_player('STEAM_0:1:1') == (
+        PlayerRecord('STEAM_0:1:1', 10, None),
+        [HeroRecord('STEAM_0:1:1', 'Hero', 2, 5, (('Skill', 1), ))])
+    assert target.load_player('STEAM_0:1:2') == (
+        PlayerRecord('STEAM_0:1:2', 20, None), [])
+
+
+def test_keep_higher_adopts_hero(open_storage, tmp_path):
+    source = open_storage('source.db')
+    source.save_player(PlayerRecord('STEAM_0:1:1', 10, 'Hero'), (
+        HeroRecord('STEAM_0:1:1', 'Hero', 2, 5, ()), ))
+    path = str(tmp_path / 'players.json')
+    export_players(source.database_file, path)
+
+    target = open_storage('target.db')
+    target.save_player(PlayerRecord('STEAM_0:1:1', 30, None), ())
+    import_players(target.database_file, path, 'keep_higher')
+    player_rec, hero_recs = target.load_player('STEAM_0:1:1')
+    assert player_rec == PlayerRecord('STEAM_0:1:1', 30, 'Hero')
+
+
+def test_exclude_checked_per_batch(open_storage, tmp_path):
+    source = open_storage('source.db')
+    for i in range(4):
+        steamid = 'STEAM_0:1:{0}'.format(i)
+        source.save_player(PlayerRecord(steamid, i, None), ())
+    path = str(tmp_path / 'players.json')
+    export_players(source.database_file, path)
+    steamids = [player_rec.steamid for player_rec, _ in read_players(path)]
+
+    class Growing(set):
+        """Excludes the last player once the first batch is checked."""
+
+        def __contains__(self, steamid):
+            if steamid == steamids[0]:
+                self.add(steamids[-1])
+            return super().__contains__(steamid)
+
+    target = open_storage('target.db')
+    stats = import_players(
+        target.database_file, path, batch_size=2, exclude=Growing())
+    assert (stats.imported, stats.skipped) == (3, 1)
+    assert target.load_player(steamids[-1]) == (None, [])